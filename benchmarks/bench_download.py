@@ -0,0 +1,294 @@
+"""Offline end-to-end download benchmark.
+
+Starts a local HTTP server with generated media (see `media_server`) and
+downloads it through the real `Downloader` -> ``video_downloader.downloader``
+worker -> `YoutubeDLSlave` path with yt-dlp's generic extractor. A GLib main
+loop replaces the GTK application, no display is needed.
+
+Reported per scenario:
+
+- time to first byte: start of the job until the first media byte is served
+- throughput: bytes served / time from the first media byte until the job
+  finished
+- CPU time of the worker process and its children (ffmpeg), and of this
+  process (the GUI side of the RPC channel)
+- peak RSS of the worker process
+- connection setup: new connections, DNS lookups and TLS handshakes (and
+  how many were avoided by the caches of the worker) with their time
+
+Requires ffmpeg and yt-dlp, but no internet access. Run with
+``python benchmarks/bench_download.py [--scenario NAME] [--json FILE]``.
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from gi.repository import GLib  # noqa: E402
+
+from media_server import MediaServer, generate_media, write_feed  # noqa: E402
+from video_downloader.downloader import (  # noqa: E402
+    DEFAULT_CONCURRENT_FRAGMENTS, MAX_RESOLUTION, Downloader,
+    HandlerInterface)
+
+SCENARIOS = {
+    'progressive': '/progressive.mp4',
+    'hls': '/hls/index.m3u8',
+    'playlist': '/feed.xml',
+}
+RSS_POLL_INTERVAL_MS = 50
+
+
+class BenchmarkHandler(HandlerInterface):
+    """Answers the worker like `Model` does, without user interaction."""
+
+    def __init__(self, url, download_dir, loop):
+        self._url = url
+        self._download_dir = download_dir
+        self._loop = loop
+        self.success = None
+        self.errors = []
+        self.finished_filenames = []
+        self.progress_calls = 0
+        self.pulse_calls = 0
+        self.retries = 0
+        # Summed duration per phase reported by the worker
+        self.phase_durations = {}
+        self.connection_stats = {}
+        self._phase_starts = {}
+
+    def get_download_dir(self):
+        return self._download_dir
+
+    def get_prefer_mpeg(self):
+        return False
+
+    def get_automatic_subtitles(self):
+        return []
+
+    def get_urls(self):
+        return [self._url]
+
+    def get_mode(self):
+        return 'video'
+
+    def get_resolution(self):
+        return MAX_RESOLUTION
+
+    def get_concurrent_fragments(self):
+        return DEFAULT_CONCURRENT_FRAGMENTS
+
+    def get_preview_dir(self):
+        return ''
+
+    def get_session_key(self):
+        return ''
+
+    def get_remember_credentials(self):
+        return False
+
+    def on_playlist_request(self):
+        return True
+
+    def on_login_request(self):
+        return '', ''
+
+    def on_password_request(self):
+        return ''
+
+    def on_error(self, msg):
+        self.errors.append(msg)
+
+    def on_progress(self, filename, progress, bytes_, bytes_total, eta,
+                    speed):
+        self.progress_calls += 1
+
+    def on_download_start(self, playlist_index, playlist_count, title):
+        pass
+
+    def on_download_lock(self, name):
+        return True
+
+    def on_download_thumbnail(self, thumbnail):
+        pass
+
+    def on_download_finished(self, filename):
+        self.finished_filenames.append(filename)
+
+    def on_pulse(self):
+        self.pulse_calls += 1
+
+    def on_retry(self, reason, error_class):
+        self.retries += 1
+
+    def on_connection_stats(self, playlist_index, stats):
+        for name, value in stats.items():
+            self.connection_stats[name] = (
+                self.connection_stats.get(name, 0) + value)
+
+    def on_phase_start(self, playlist_index, phase, timestamp):
+        self._phase_starts[playlist_index, phase] = timestamp
+
+    def on_phase_end(self, playlist_index, phase, timestamp, bytes_):
+        start = self._phase_starts.pop((playlist_index, phase), None)
+        if start is not None:
+            self.phase_durations[phase] = (
+                self.phase_durations.get(phase, 0) + timestamp - start)
+
+    def on_finished(self, success):
+        self.success = success
+        self._loop.quit()
+
+
+def _read_peak_rss(pid):
+    """Peak resident set size of `pid` in bytes (Linux only)."""
+    try:
+        with open('/proc/%d/status' % pid) as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def run_scenario(name, server, timeout):
+    url = server.base_url + SCENARIOS[name]
+    loop = GLib.MainLoop()
+    with tempfile.TemporaryDirectory() as download_dir:
+        handler = BenchmarkHandler(url, download_dir, loop)
+        downloader = Downloader(handler)
+        peak_rss = 0
+
+        def poll_rss():
+            nonlocal peak_rss
+            process = downloader._process
+            if process is not None:
+                peak_rss = max(peak_rss, _read_peak_rss(process.pid) or 0)
+            return True
+
+        def on_timeout():
+            nonlocal timeout_source
+            timeout_source = None
+            handler.errors.append('timeout after %ds' % timeout)
+            loop.quit()
+            return False
+
+        server.reset()
+        children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self_before = time.process_time()
+        start = time.monotonic()
+        downloader.start()
+        poll_source = GLib.timeout_add(RSS_POLL_INTERVAL_MS, poll_rss)
+        timeout_source = GLib.timeout_add_seconds(timeout, on_timeout)
+        loop.run()
+        end = time.monotonic()
+        GLib.source_remove(poll_source)
+        if timeout_source is not None:
+            GLib.source_remove(timeout_source)
+        # Kills the worker if it's still running (timeout)
+        downloader.destroy()
+        self_cpu = time.process_time() - self_before
+        children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        files = len(handler.finished_filenames)
+    first_byte = server.first_byte_time
+    worker_cpu = ((children_after.ru_utime - children_before.ru_utime) +
+                  (children_after.ru_stime - children_before.ru_stime))
+    transfer_time = end - first_byte if first_byte is not None else None
+    return {
+        'scenario': name,
+        'success': bool(handler.success),
+        'errors': handler.errors,
+        'files': files,
+        'duration_s': end - start,
+        'ttfb_s': first_byte - start if first_byte is not None else None,
+        'bytes': server.bytes_served,
+        'throughput_bps': (server.bytes_served / transfer_time
+                           if transfer_time else None),
+        'worker_cpu_s': worker_cpu,
+        'main_cpu_s': self_cpu,
+        'worker_peak_rss_bytes': peak_rss or None,
+        'progress_calls': handler.progress_calls,
+        'pulse_calls': handler.pulse_calls,
+        'retries': handler.retries,
+        'phases_s': handler.phase_durations,
+        'connections': handler.connection_stats,
+    }
+
+
+def _fmt(value, scale=1, unit='', precision=2):
+    if value is None:
+        return '-'
+    return '%.*f%s' % (precision, value / scale, unit)
+
+
+def print_results(results):
+    print('%-12s %-4s %6s %9s %9s %11s %9s %9s %10s' % (
+        'scenario', 'ok', 'files', 'time', 'ttfb', 'throughput',
+        'cpu(wrk)', 'cpu(gui)', 'peak rss'))
+    for r in results:
+        print('%-12s %-4s %6d %9s %9s %11s %9s %9s %10s' % (
+            r['scenario'], 'yes' if r['success'] else 'NO', r['files'],
+            _fmt(r['duration_s'], unit='s'), _fmt(r['ttfb_s'], 1e-3, 'ms', 1),
+            _fmt(r['throughput_bps'], 1e6, 'MB/s', 1),
+            _fmt(r['worker_cpu_s'], unit='s'), _fmt(r['main_cpu_s'], unit='s'),
+            _fmt(r['worker_peak_rss_bytes'], 1e6, 'MB', 1)))
+        if r['phases_s']:
+            print('    phases: %s' % ', '.join(
+                '%s %s' % (phase, _fmt(duration, unit='s'))
+                for phase, duration in r['phases_s'].items()))
+        c = r['connections']
+        if c:
+            print('    connections: %d (setup %s), dns: %d lookups, %d cached '
+                  '(%s), tls: %d handshakes, %d resumed (%s)' % (
+                      c['connections'], _fmt(c['connect_seconds'], unit='s'),
+                      c['dns_lookups'], c['dns_cache_hits'],
+                      _fmt(c['dns_seconds'], unit='s'), c['tls_handshakes'],
+                      c['tls_resumed'], _fmt(c['tls_seconds'], unit='s')))
+        for error in r['errors']:
+            print('    %s' % error.splitlines()[0])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append',
+                        choices=sorted(SCENARIOS),
+                        help='scenario to run (default: all)')
+    parser.add_argument('--media-dir',
+                        help='directory for the generated media '
+                             '(default: temporary directory)')
+    parser.add_argument('--duration', type=int, default=30,
+                        help='length of the progressive/HLS media in seconds')
+    parser.add_argument('--entries', type=int, default=50,
+                        help='number of playlist entries')
+    parser.add_argument('--timeout', type=int, default=600,
+                        help='timeout per scenario in seconds')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        media_dir = generate_media(
+            args.media_dir or temp_dir, duration=args.duration,
+            playlist_entries=args.entries)
+        server = MediaServer(media_dir).start()
+        try:
+            write_feed(media_dir, server.base_url, args.entries)
+            results = [run_scenario(name, server, args.timeout)
+                       for name in args.scenario or list(SCENARIOS)]
+        finally:
+            server.stop()
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(r['success'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Memory of playlist entries waiting to be downloaded.
+
+Compares keeping the info dicts of all entries in memory (like the worker
+did before downloads started while the playlist was extracted) with the
+compact `PlaylistEntry` records that spill the info to disk. The info dicts
+are synthetic, but sized like those of YouTube videos: dozens of formats
+with HTTP headers, thumbnails and automatic captions in ~150 languages.
+Memory is measured with `tracemalloc`. Run with
+``python benchmarks/bench_entries.py [--entries N]``.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from video_downloader.downloader.yt_dlp_slave import (  # noqa: E402
+    PlaylistEntry)
+
+FORMATS = 30
+THUMBNAILS = 40
+CAPTION_LANGUAGES = 150
+CAPTION_FORMATS = ['json3', 'srv1', 'srv2', 'srv3', 'ttml', 'vtt', 'srt']
+
+
+def _token(rng, length):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789-_')
+                   for _ in range(length))
+
+
+def make_info(rng, index):
+    video_id = _token(rng, 11)
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:128.0) '
+                      'Gecko/20100101 Firefox/128.0',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,'
+                  '*/*;q=0.8',
+        'Accept-Language': 'en-us,en;q=0.5',
+        'Sec-Fetch-Mode': 'navigate',
+    }
+    formats = [{
+        'format_id': str(100 + i),
+        'url': 'https://rr1.example.com/videoplayback?id=%s&itag=%d&%s' % (
+            video_id, 100 + i, _token(rng, 600)),
+        'ext': rng.choice(['mp4', 'webm', 'm4a']),
+        'width': rng.choice([256, 640, 1280, 1920]),
+        'height': rng.choice([144, 360, 720, 1080]),
+        'vcodec': 'avc1.4d401e', 'acodec': 'mp4a.40.2',
+        'tbr': rng.random() * 5000, 'filesize': rng.randrange(10**9),
+        'protocol': 'https', 'http_headers': dict(headers),
+        'format_note': '720p', 'dynamic_range': 'SDR',
+    } for i in range(FORMATS)]
+    thumbnails = [{
+        'url': 'https://i.example.com/vi/%s/%d.jpg?%s' % (
+            video_id, i, _token(rng, 80)),
+        'preference': -i, 'id': str(i),
+    } for i in range(THUMBNAILS)]
+    automatic_captions = {
+        'l%03d' % lang: [{
+            'ext': ext,
+            'url': 'https://www.example.com/api/timedtext?v=%s&lang=l%03d&'
+                   'fmt=%s&%s' % (video_id, lang, ext, _token(rng, 200)),
+            'name': 'Language %d' % lang,
+        } for ext in CAPTION_FORMATS]
+        for lang in range(CAPTION_LANGUAGES)}
+    info = {
+        'id': video_id,
+        'title': 'Video %d %s' % (index, _token(rng, 40)),
+        'description': _token(rng, 2000),
+        'webpage_url': 'https://www.example.com/watch?v=%s' % video_id,
+        'duration': rng.randrange(60, 3600),
+        'formats': formats,
+        'thumbnails': thumbnails,
+        'subtitles': {},
+        'automatic_captions': automatic_captions,
+        'http_headers': dict(headers),
+        'playlist_index': index + 1,
+    }
+    # Same object layout as info dicts loaded from info.json files
+    return json.loads(json.dumps(info))
+
+
+def measure(build):
+    """Return ``(traced bytes of the result of build(), seconds)``.
+
+    Timed in a separate run, tracing slows down allocations."""
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    duration = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size, duration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=200)
+    args = parser.parse_args(argv)
+    rng = random.Random(0)
+    # Generated once, the generation itself is not measured
+    infos = [json.dumps(make_info(rng, i)) for i in range(args.entries)]
+
+    def full():
+        return [json.loads(info) for info in infos]
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        def compact():
+            entries = []
+            for i, info in enumerate(infos):
+                entries.append(PlaylistEntry.spill(
+                    json.loads(info), i, args.entries, spill_dir))
+            return entries
+
+        full_size, full_time = measure(full)
+        compact_size, compact_time = measure(compact)
+        disk_size = sum(entry.stat().st_size
+                        for entry in os.scandir(spill_dir))
+    print('%d entries' % args.entries)
+    print('info dicts  %9.1f KiB/entry in memory  (%.1f ms/entry)' % (
+        full_size / args.entries / 1024,
+        full_time / args.entries * 1000))
+    print('records     %9.1f KiB/entry in memory  (%.1f ms/entry, '
+          '%.1f KiB/entry on disk)' % (
+              compact_size / args.entries / 1024,
+              compact_time / args.entries * 1000,
+              disk_size / args.entries / 1024))
+    print('reduction   %9.0fx' % (full_size / max(1, compact_size)))
+
+
+if __name__ == '__main__':
+    main()
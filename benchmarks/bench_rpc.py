@@ -0,0 +1,260 @@
+"""Microbenchmark for the worker -> GUI RPC path.
+
+Feeds synthetic message streams to `Downloader._on_process_stdout` in the
+chunk sizes a pipe read might return, including pathological one-byte
+writes, and dispatches them through `handle_rpc_request` to a recording
+handler. `FakeProcess` stands in for the worker process, so neither the
+worker nor a GLib main loop or GTK is needed.
+
+Reported per stream and chunk size: messages/second and the latency from
+the read that completed a message until its handler ran (percentiles).
+With ``--rate`` messages are fed at a fixed rate and the latency includes
+time spent in backlog.
+
+The framing alone (`LineReader`) is compared with the previous approach of
+appending every read to a `bytes` remainder and splitting all of it again,
+for streams of short lines and for one huge line (e.g. ffmpeg progress
+without line ending). Run with ``python benchmarks/bench_rpc.py``.
+"""
+
+import argparse
+import collections
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from video_downloader.downloader import (  # noqa: E402
+    MAX_REQUEST_SIZE, MAX_STDERR_LINE_SIZE, STDERR_LOG_LINES, Downloader)
+from video_downloader.util.framing import LineReader  # noqa: E402
+
+_SPLITLINES_RE = re.compile(rb'\r\n|\r|\n')
+
+
+class _NullWriter:
+    def write(self, s):
+        return len(s)
+
+    def flush(self):
+        pass
+
+
+class _ChunkReader:
+    def __init__(self):
+        self.chunks = []
+
+    def read(self):
+        # `feed` appends one chunk per wakeup. Never empty, an empty read
+        # means that the pipe was closed.
+        return self.chunks.pop()
+
+
+class _FakeStdout:
+    encoding = 'utf-8'
+
+    def __init__(self):
+        self.buffer = _ChunkReader()
+
+
+class FakeProcess:
+    """The parts of `subprocess.Popen` used by `_on_process_stdout`."""
+
+    def __init__(self):
+        self.stdout = _FakeStdout()
+        self.stdin = _NullWriter()
+        self.stdout_reader = LineReader(MAX_REQUEST_SIZE)
+        self.stderr_reader = LineReader(MAX_STDERR_LINE_SIZE, truncate=True)
+        self.stderr_log = collections.deque(maxlen=STDERR_LOG_LINES)
+        self.log_stderr = self.cancelled = False
+        self.last_pulse = 0
+
+
+class RecordingHandler:
+    """Handler for the worker's notifications that records call times."""
+
+    def __init__(self):
+        self.call_times = []
+
+    def _record(self, *args):
+        self.call_times.append(time.perf_counter())
+
+    on_progress = on_pulse = on_error = on_download_start = _record
+    on_download_finished = on_download_thumbnail = _record
+
+
+def feed(chunks, rate=None):
+    """Deliver `chunks` ([(bytes, messages completed by chunk)]) one per
+       wakeup. Returns ``(handler, per message latencies, elapsed time)``."""
+    handler = RecordingHandler()
+    downloader = Downloader(handler)
+    process = FakeProcess()
+    downloader._process = process
+    arrivals = []
+    start = time.perf_counter()
+    sent = 0
+    for chunk, completed in chunks:
+        if rate is not None:
+            # Messages arrive at a fixed rate, even if we fall behind
+            due = start + sent / rate
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+            arrival = max(due, start)
+        process.stdout.buffer.chunks.append(chunk)
+        if rate is None:
+            arrival = time.perf_counter()
+        arrivals.extend([arrival] * completed)
+        sent += completed
+        downloader._on_process_stdout(None, None, process)
+    elapsed = time.perf_counter() - start
+    downloader._process = None
+    assert len(handler.call_times) == len(arrivals), 'lost messages'
+    latencies = [t - a for t, a in zip(handler.call_times, arrivals)]
+    return handler, latencies, elapsed
+
+
+def make_stream(kind, count, large_size=256 * 1024):
+    if kind == 'progress':
+        return [json.dumps({'method': 'on_progress', 'args': [
+            '/tmp/video.f137.mp4.part', i / count, i * 1000, count * 1000,
+            count - i, 1000000]}).encode() + b'\n' for i in range(count)]
+    if kind == 'pulse':
+        return [b'{"method": "on_pulse", "args": []}\n'] * count
+    if kind == 'large':
+        # A few huge messages, e.g. errors with long output
+        return [json.dumps({'method': 'on_error', 'args': [
+            'x' * large_size]}).encode() + b'\n'] * max(1, count // 1000)
+    raise ValueError(kind)
+
+
+def chunk_stream(messages, chunk_size):
+    """Split the concatenated `messages` into chunks of `chunk_size`."""
+    data = b''.join(messages)
+    ends = []
+    offset = 0
+    for message in messages:
+        offset += len(message)
+        ends.append(offset)
+    chunks = []
+    end_index = 0
+    for pos in range(0, len(data), chunk_size):
+        chunk = data[pos:pos + chunk_size]
+        completed = 0
+        while end_index < len(ends) and ends[end_index] <= pos + len(chunk):
+            completed += 1
+            end_index += 1
+        chunks.append((chunk, completed))
+    return chunks
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(kind, count, chunk_size, rate=None, large_size=256 * 1024):
+    messages = make_stream(kind, count, large_size)
+    wakeups = chunk_stream(messages, chunk_size)
+    _, latencies, elapsed = feed(wakeups, rate)
+    return {
+        'stream': kind,
+        'chunk_size': chunk_size,
+        'messages': len(messages),
+        'wakeups': len(wakeups),
+        'messages_per_s': len(messages) / elapsed,
+        'p50_us': percentile(latencies, 50) * 1e6,
+        'p99_us': percentile(latencies, 99) * 1e6,
+        'max_us': max(latencies) * 1e6,
+        'mean_us': statistics.fmean(latencies) * 1e6,
+    }
+
+
+class SplitRemainderReader:
+    """The framing used before `LineReader`, for comparison."""
+
+    def __init__(self):
+        self.remainder = b''
+
+    def feed(self, data):
+        self.remainder += data
+        *lines, self.remainder = _SPLITLINES_RE.split(self.remainder)
+        return lines
+
+
+def run_framing(kind, size, chunk_size, reader):
+    if kind == 'lines':
+        data = b''.join(make_stream('progress', size // 150 + 1))[:size]
+    else:
+        data = b'x' * size
+    chunks = [data[pos:pos + chunk_size]
+              for pos in range(0, len(data), chunk_size)]
+    start = time.perf_counter()
+    for chunk in chunks:
+        reader.feed(chunk)
+    elapsed = time.perf_counter() - start
+    return {'stream': kind, 'chunk_size': chunk_size,
+            'reader': type(reader).__name__,
+            'mib_per_s': len(data) / elapsed / 2**20}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000,
+                        help='messages per stream')
+    parser.add_argument('--chunk-size', type=int, action='append',
+                        help='bytes per read (default: 1, 64, 4096, 65536)')
+    parser.add_argument('--stream', action='append',
+                        choices=['progress', 'pulse', 'large'],
+                        help='message stream (default: all)')
+    parser.add_argument('--rate', type=float,
+                        help='feed messages at this rate (messages/second)')
+    parser.add_argument('--framing-size', type=int, default=4,
+                        help='MiB per stream of the framing comparison')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+    results = []
+    print('%-9s %8s %8s %9s %12s %10s %10s %10s' % (
+        'stream', 'chunk', 'msgs', 'wakeups', 'msgs/s', 'p50 µs', 'p99 µs',
+        'max µs'))
+    for kind in args.stream or ['progress', 'pulse', 'large']:
+        for chunk_size in args.chunk_size or [1, 64, 4096, 65536]:
+            count = args.messages
+            large_size = 256 * 1024
+            if chunk_size == 1:
+                # One wakeup per byte, keep the run time reasonable
+                count = min(count, 2000)
+                large_size = 16 * 1024
+            r = run(kind, count, chunk_size, args.rate, large_size)
+            results.append(r)
+            print('%-9s %8d %8d %9d %12.0f %10.1f %10.1f %10.1f' % (
+                r['stream'], r['chunk_size'], r['messages'], r['wakeups'],
+                r['messages_per_s'], r['p50_us'], r['p99_us'], r['max_us']))
+    print()
+    print('%-9s %8s %-20s %10s' % ('framing', 'chunk', 'reader', 'MiB/s'))
+    for kind in ['lines', 'huge-line']:
+        for chunk_size in [4096, 65536]:
+            size = args.framing_size * 2**20
+            for reader in [SplitRemainderReader(),
+                           LineReader(MAX_STDERR_LINE_SIZE, truncate=True)]:
+                if (isinstance(reader, SplitRemainderReader) and
+                        kind == 'huge-line' and chunk_size < 65536):
+                    # Quadratic, limit the run time
+                    size = min(size, 2**20)
+                r = run_framing(kind, size, chunk_size, reader)
+                results.append(r)
+                print('%-9s %8d %-20s %10.1f' % (
+                    r['stream'], r['chunk_size'], r['reader'],
+                    r['mib_per_s']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Cold-start benchmark and heavy-import guard for the GTK application.
+
+Imports the modules on the GUI path in fresh interpreters with
+``python -X importtime`` and reports the median import time and the modules
+with the highest self time. Exits with status 1 if any of them imports
+`HEAVY_MODULES` (e.g. yt-dlp, which only belongs in the worker process) or if
+``import video_downloader`` alone is no longer lazy.
+
+With ``--window COMMAND`` the application is started with
+``VIDEO_DOWNLOADER_PROFILE_STARTUP`` (see `video_downloader.util.startup`)
+and the per-phase timings up to the first ``present()`` are reported. That
+needs a display. Run with ``python benchmarks/bench_startup.py``.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Modules that must never be loaded by the GUI process before it needs them
+HEAVY_MODULES = [
+    'yt_dlp',
+    'video_downloader.downloader.yt_dlp_slave',
+    'video_downloader.downloader.yt_dlp_monkey_patch',
+    'PIL',
+    'numpy',
+    'requests',
+    'urllib3',
+    'websockets',
+    'Cryptodome',
+    'mutagen',
+    'brotli',
+    'curl_cffi',
+]
+# Modules that ``import video_downloader`` must not load (lazy `__getattr__`)
+PACKAGE_FORBIDDEN = [
+    'gi',
+    'importlib.metadata',
+    'video_downloader.app',
+    'video_downloader.ui',
+]
+GUI_MODULES = [
+    'video_downloader.main',
+    'video_downloader.app.application',
+    'video_downloader.ui.window',
+]
+
+_IMPORT_SCRIPT = '''\
+import json, sys
+if {gi!r}:
+    import gi
+    gi.require_version('Gdk', '4.0')
+    gi.require_version('Gtk', '4.0')
+    gi.require_version('Adw', '1')
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps(sorted(sys.modules)))
+'''
+
+
+def parse_importtime(stderr):
+    """Parse ``-X importtime`` output.
+
+    Returns ``{module: (self µs, cumulative µs, importer)}``. The importer is
+    the module that was being imported when `module` got imported, or None
+    for top-level imports.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    result = {}
+    # Children are printed before their parent, the importer of an entry is
+    # the next entry with a lower depth
+    pending = []
+    for name, self_us, cumulative_us, depth in entries:
+        while pending and pending[-1][1] > depth:
+            child, _ = pending.pop()
+            result[child] = result[child][:2] + (name,)
+        result[name] = (self_us, cumulative_us, None)
+        pending.append((name, depth))
+    return result
+
+
+def import_chain(times, name):
+    chain = [name]
+    while times.get(chain[-1], (0, 0, None))[2] is not None:
+        chain.append(times[chain[-1]][2])
+    return ' <- '.join(chain)
+
+
+def measure_imports(modules, gi=True):
+    """Import `modules` in a fresh interpreter.
+
+    Returns ``(loaded modules, importtime entries, wall time)``."""
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(
+        filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')]))}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         _IMPORT_SCRIPT.format(gi=gi, modules=modules)],
+        env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError('importing %s failed:\n%s' % (
+            ', '.join(modules), result.stderr[-4000:]))
+    loaded = set(json.loads(result.stdout))
+    return loaded, parse_importtime(result.stderr), wall
+
+
+def check_imports(repeat, top):
+    errors = []
+    loaded, times, _ = measure_imports(['video_downloader'], gi=False)
+    for name in PACKAGE_FORBIDDEN:
+        if name in loaded:
+            errors.append('import video_downloader loads %s' % import_chain(
+                times, name))
+    totals = []
+    walls = []
+    for _ in range(repeat):
+        loaded, times, wall = measure_imports(GUI_MODULES)
+        totals.append(sum(times[m][1] for m in GUI_MODULES if m in times))
+        walls.append(wall)
+    for name in HEAVY_MODULES:
+        if name in loaded:
+            errors.append('GUI path loads %s' % import_chain(times, name))
+    print('GUI imports: %d modules, %.1f ms import time, %.1f ms wall '
+          '(median of %d)' % (len(loaded), statistics.median(totals) / 1000,
+                              statistics.median(walls) * 1000, repeat))
+    print('Highest self time:')
+    for name, (self_us, _, importer) in sorted(
+            times.items(), key=lambda item: -item[1][0])[:top]:
+        via = ' (via %s)' % importer if importer else ''
+        print('  %8.1f ms  %s%s' % (self_us / 1000, name, via))
+    return errors, {'modules': len(loaded),
+                    'import_ms': statistics.median(totals) / 1000,
+                    'wall_ms': statistics.median(walls) * 1000}
+
+
+def profile_window(command, timeout):
+    """Start the application and wait for its startup profile."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        report_path = os.path.join(tmp_dir, 'startup.json')
+        env = {**os.environ, 'VIDEO_DOWNLOADER_PROFILE_STARTUP': report_path}
+        start = time.perf_counter()
+        process = subprocess.Popen(command, shell=True, env=env)
+        try:
+            deadline = start + timeout
+            while not os.path.exists(report_path):
+                if process.poll() is not None:
+                    raise RuntimeError('application exited with status %d' %
+                                       process.returncode)
+                if time.perf_counter() > deadline:
+                    raise RuntimeError('no startup profile after %ds' %
+                                       timeout)
+                time.sleep(0.01)
+            wall = time.perf_counter() - start
+            with open(report_path) as f:
+                report = json.load(f)
+        finally:
+            process.terminate()
+            process.wait()
+    print('Time to first present(): %.1f ms (%.1f ms wall)' % (
+        report['total'] * 1000, wall * 1000))
+    for phase in report['phases']:
+        print('  %-16s %8.1f ms  %4d modules' % (
+            phase['phase'], phase['duration'] * 1000, len(phase['modules'])))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='fresh interpreters per measurement')
+    parser.add_argument('--top', type=int, default=15,
+                        help='number of modules with the highest self time')
+    parser.add_argument('--window', metavar='COMMAND',
+                        help='profile the startup of this command, e.g. '
+                             'video-downloader')
+    parser.add_argument('--timeout', type=int, default=60)
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args(argv)
+    errors, results = check_imports(args.repeat, args.top)
+    if args.window:
+        results['window'] = profile_window(args.window, args.timeout)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    for error in errors:
+        print('ERROR: %s' % error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
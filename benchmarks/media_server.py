@@ -0,0 +1,143 @@
+"""Local HTTP server with generated media for offline benchmarks.
+
+`generate_media` uses ffmpeg to create the test files once:
+
+- ``progressive.mp4``: a single progressive file
+- ``hls/index.m3u8``: an HLS stream split into many short fragments
+- ``feed.xml``: an RSS feed whose entries point to small progressive files,
+  which yt-dlp's generic extractor turns into a playlist
+
+`MediaServer` serves the directory on 127.0.0.1, counts the bytes it
+answered and records when the first byte of a media file was sent.
+"""
+
+import http.server
+import os
+import shutil
+import subprocess
+import threading
+import time
+import urllib.parse
+from xml.sax.saxutils import escape
+
+EXTENSIONS_MAP = {
+    '.mp4': 'video/mp4',
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.xml': 'application/rss+xml',
+}
+# Files that count for `MediaServer.first_byte_time` (not manifests or feeds)
+MEDIA_EXTENSIONS = {'.mp4', '.ts'}
+
+
+def _ffmpeg(*args):
+    subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+         '-f', 'lavfi', '-i', 'testsrc=size=1280x720:rate=25',
+         '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100',
+         '-c:v', 'mpeg4', '-b:v', '4M', '-c:a', 'aac', '-shortest', *args],
+        check=True, stdin=subprocess.DEVNULL)
+
+
+def generate_media(media_dir, duration=30, hls_fragment_duration=0.5,
+                   playlist_entries=50, entry_duration=2):
+    """Create the media files in `media_dir` (skips existing files)."""
+    if shutil.which('ffmpeg') is None:
+        raise RuntimeError('ffmpeg is required to generate media')
+    os.makedirs(media_dir, exist_ok=True)
+    progressive = os.path.join(media_dir, 'progressive.mp4')
+    if not os.path.exists(progressive):
+        _ffmpeg('-t', str(duration), '-movflags', '+faststart', progressive)
+    hls_dir = os.path.join(media_dir, 'hls')
+    if not os.path.exists(os.path.join(hls_dir, 'index.m3u8')):
+        os.makedirs(hls_dir, exist_ok=True)
+        _ffmpeg('-t', str(duration),
+                # Key frame at every fragment boundary
+                '-force_key_frames', 'expr:gte(t,n_forced*%s)' % (
+                    hls_fragment_duration),
+                '-f', 'hls', '-hls_time', str(hls_fragment_duration),
+                '-hls_list_size', '0',
+                '-hls_segment_filename', os.path.join(hls_dir, 'seg%05d.ts'),
+                os.path.join(hls_dir, 'index.m3u8'))
+    entries_dir = os.path.join(media_dir, 'entries')
+    entry = os.path.join(media_dir, 'entry.mp4')
+    if not os.path.exists(entry):
+        _ffmpeg('-t', str(entry_duration), entry)
+    os.makedirs(entries_dir, exist_ok=True)
+    for i in range(playlist_entries):
+        path = os.path.join(entries_dir, 'entry%05d.mp4' % i)
+        if not os.path.exists(path):
+            os.link(entry, path)
+    return media_dir
+
+
+def write_feed(media_dir, base_url, playlist_entries):
+    items = ''.join(
+        '<item><title>Entry %d</title><link>%s/entries/entry%05d.mp4</link>'
+        '<enclosure url="%s/entries/entry%05d.mp4" type="video/mp4"/>'
+        '<guid>entry%05d</guid></item>' % (
+            i, escape(base_url), i, escape(base_url), i, i)
+        for i in range(playlist_entries))
+    with open(os.path.join(media_dir, 'feed.xml'), 'w',
+              encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>'
+                '<rss version="2.0"><channel><title>Benchmark</title>'
+                '<link>%s</link>%s</channel></rss>' % (
+                    escape(base_url), items))
+
+
+class MediaServer:
+    def __init__(self, media_dir):
+        server = self
+
+        class Handler(http.server.SimpleHTTPRequestHandler):
+            extensions_map = {
+                **http.server.SimpleHTTPRequestHandler.extensions_map,
+                **EXTENSIONS_MAP}
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=media_dir, **kwargs)
+
+            def copyfile(self, source, outputfile):
+                media = os.path.splitext(urllib.parse.urlsplit(
+                    self.path).path)[1] in MEDIA_EXTENSIONS
+                while True:
+                    buf = source.read(64 * 1024)
+                    if not buf:
+                        break
+                    outputfile.write(buf)
+                    server._count(len(buf), media)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._lock = threading.Lock()
+        self._httpd = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True)
+        self.reset()
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:%d' % self._httpd.server_address[1]
+
+    def _count(self, n, media):
+        with self._lock:
+            if media and self.first_byte_time is None:
+                self.first_byte_time = time.monotonic()
+            self.bytes_served += n
+
+    def reset(self):
+        with self._lock:
+            self.bytes_served = 0
+            self.first_byte_time = None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
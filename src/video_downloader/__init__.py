@@ -4,19 +4,13 @@ from __future__ import annotations
 """High level helpers for interacting with Video Downloader."""
 
 import sys
-from importlib import import_module, metadata
+from importlib import import_module
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:  # pragma: no cover - imported for static type checkers only
     from .app.application import Application, build_application, run
     from .app.model import HandlerInterface, Model, check_download_dir
 
-try:  # pragma: no cover - executed during runtime
-    __version__ = metadata.version("video-downloader")
-except metadata.PackageNotFoundError:  # pragma: no cover - fallback for src checkout
-    __version__ = "0.0.0"
-
-
 __all__ = [
     "Application",
     "HandlerInterface",
@@ -36,7 +30,23 @@ __all__ = [
 def get_version() -> str:
     """Return the detected package version."""
 
-    return __version__
+    # Detected once, then cached as module attribute by ``__getattr__``
+    version = globals().get("__version__")
+    if version is None:
+        version = __getattr__("__version__")
+    return version
+
+
+def _detect_version() -> str:
+    # ``importlib.metadata`` is slow to import and scans ``sys.path``, only
+    # pay for it when the version is requested (e.g. the about dialog)
+    from importlib import metadata
+
+    try:  # pragma: no cover - executed during runtime
+        return metadata.version("video-downloader")
+    except metadata.PackageNotFoundError:  # pragma: no cover
+        # Fallback for src checkout
+        return "0.0.0"
 
 
 _LAZY_OBJECTS = {
@@ -73,6 +83,10 @@ def __getattr__(name: str):
     loading those modules on demand and caching them in :mod:`sys.modules`.
     """
 
+    if name == "__version__":
+        value = _detect_version()
+        setattr(sys.modules[__name__], name, value)
+        return value
     if name in _LAZY_OBJECTS:
         module_name, attribute = _LAZY_OBJECTS[name]
         module = import_module(f".{module_name}", __name__)
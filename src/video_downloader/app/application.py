@@ -21,10 +21,16 @@ import sys
 from gi.repository import Adw, Gio, GLib
 
 # from video_downloader.ui.window import Window  # Moved to late import to avoid circularity
+from video_downloader.app.download_manager import DownloadManager
+from video_downloader.app.session_keyring import SessionKeyring
+from video_downloader.downloader import sessions
 from video_downloader.util import gobject_log
 from video_downloader.util.connection import (
     CloseStack, SignalConnection, create_action)
 from video_downloader.util.logging import StructuredLogger, setup_excepthook
+from video_downloader.util.startup import startup_profiler
+
+startup_profiler.mark('imports')
 
 N_ = gettext.gettext
 
@@ -35,31 +41,50 @@ class Application(Adw.Application):
                          flags=Gio.ApplicationFlags.FLAGS_NONE)
         self._cs = CloseStack()
         self.add_main_option(
-            'url', ord('u'), GLib.OptionFlags.NONE, GLib.OptionArg.STRING,
-            N_('Prefill URL field'), 'URL')
+            'url', ord('u'), GLib.OptionFlags.NONE,
+            GLib.OptionArg.STRING_ARRAY,
+            N_('Prefill URL field (repeat for multiple URLs)'), 'URL')
         GLib.set_application_name(N_('Video Downloader'))
 
     def do_startup(self):
         setup_excepthook()
         log_file = StructuredLogger.setup_file_logging()
         StructuredLogger.info("Application starting", log_file=log_file)
-        
+        startup_profiler.mark('logging')
         Adw.Application.do_startup(self)
+        startup_profiler.mark('adw-startup')
         self._cs.push(SignalConnection(
             self, 'shutdown', self._on_shutdown, no_args=True))
+        # Shared by the download pages of all windows
+        self.download_manager = self._cs.push(
+            DownloadManager(adaptive=True))
         self.settings = gobject_log(
             Gio.Settings.new(self.props.application_id))
+        startup_profiler.mark('settings')
+        # Key of the cookies and credentials that jobs keep per host
+        self.session_keyring = SessionKeyring()
         # Setup actions
         create_action(self, self._cs, 'new-window',
                       lambda _, param: self._new_window(param.get_string()),
                       parameter_type=GLib.VariantType('s'))
         create_action(self, self._cs, 'quit', self._quit, no_args=True)
+        self.add_action(gobject_log(
+            self.settings.create_action('remember-credentials')))
+        create_action(self, self._cs, 'forget-sessions',
+                      self._forget_sessions, no_args=True)
         self._cs.push(SignalConnection(
             self, 'window-removed', lambda _, win: win.destroy()))
 
     def _on_shutdown(self):
         StructuredLogger.info("Application shutting down")
         self._cs.close()
+        StructuredLogger.shutdown_file_logging()
+
+    def _forget_sessions(self):
+        # Sessions that running jobs save later are encrypted with the
+        # forgotten key, they are deleted when they are loaded
+        self.session_keyring.forget()
+        sessions.forget_all()
 
     def _quit(self):
         for win in self.get_windows():
@@ -67,8 +92,10 @@ class Application(Adw.Application):
 
     def _new_window(self, url=''):
         from video_downloader.ui.window import Window
+        startup_profiler.mark('window-imports')
         StructuredLogger.info("Creating new window")
         win = gobject_log(Window(self))
+        startup_profiler.mark('window-template')
         win.set_default_icon_name(self.props.application_id)
         model = win.model
         model.url = url
@@ -88,16 +115,19 @@ class Application(Adw.Application):
                                   key=lambda x: abs(x - resolution))[0]
         self.settings.bind('resolution', model, 'resolution',
                            Gio.SettingsBindFlags.SET)
+        startup_profiler.mark('window-settings')
         win.present()
+        startup_profiler.finish('present')
 
     def do_activate(self):
         self._new_window()
 
     def do_handle_local_options(self, options):
-        url_variant = options.lookup_value('url', GLib.VariantType('s'))
-        if url_variant:
+        urls_variant = options.lookup_value('url', GLib.VariantType('as'))
+        if urls_variant:
             self.register()
-            self.activate_action('new-window', url_variant)
+            self.activate_action('new-window', GLib.Variant(
+                's', ' '.join(urls_variant.unpack())))
             return 0
         return -1
 
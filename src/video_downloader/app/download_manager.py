@@ -0,0 +1,185 @@
+"""Run the download jobs of all windows with a limited number of workers."""
+
+import collections
+
+from gi.repository import GLib
+
+from video_downloader import downloader
+from video_downloader.app.parallelism import ParallelismController
+from video_downloader.util.connection import Closable
+
+# Worker processes running at the same time, other jobs wait in a queue
+MAX_ACTIVE_JOBS = 4
+
+
+class DownloadJob:
+    """Download of one `Model` with a `Downloader` that is started by the
+       `DownloadManager` when a worker is free.
+
+    Requests of the worker are forwarded to `handler`. `queued_callback` is
+    called with True when `start` has to wait for a free worker and with
+    False when the job leaves the queue.
+    """
+
+    def __init__(self, manager, handler, queued_callback=None):
+        self._manager = manager
+        self._handler = handler
+        self._queued_callback = queued_callback
+        self._downloader = downloader.Downloader(self)
+        self.queued = False
+
+    def __getattr__(self, name):
+        # Requests of the worker (see `downloader.HandlerInterface`)
+        return getattr(self._handler, name)
+
+    def start(self):
+        self._manager._submit(self)
+
+    def cancel(self):
+        if self.queued:
+            self._manager._remove(self)
+            self._set_queued(False)
+            # Like the worker, finish asynchronously and not within the
+            # state transition of the handler that cancels
+            GLib.idle_add(self._finish_cancelled)
+        else:
+            self._downloader.cancel()
+
+    def _finish_cancelled(self):
+        if self._handler is not None:
+            self._handler.on_finished(False)
+        return False
+
+    def destroy(self):
+        self._manager._remove(self, destroy=True)
+        self._downloader.destroy()
+        self._handler = self._queued_callback = None
+
+    def on_finished(self, success):
+        # The worker is free before the handler is notified, it might start
+        # the next download
+        self._manager._remove(self)
+        self._handler.on_finished(success)
+
+    # Requests of the worker that also feed the `ParallelismController`
+
+    def get_concurrent_fragments(self):
+        controller = self._manager.controller
+        if controller is None:
+            return downloader.DEFAULT_CONCURRENT_FRAGMENTS
+        return controller.fragments
+
+    def on_download_start(self, playlist_index, playlist_count, title):
+        if self._manager.controller is not None:
+            self._manager.controller.item_started(self)
+        return self._handler.on_download_start(
+            playlist_index, playlist_count, title)
+
+    def on_progress(self, filename, progress, bytes_, bytes_total, eta,
+                    speed):
+        if self._manager.controller is not None:
+            self._manager.controller.progress(self, speed)
+        return self._handler.on_progress(
+            filename, progress, bytes_, bytes_total, eta, speed)
+
+    def on_download_finished(self, filename):
+        if self._manager.controller is not None:
+            self._manager.controller.item_finished(self)
+        return self._handler.on_download_finished(filename)
+
+    def on_retry(self, reason, error_class):
+        if self._manager.controller is not None:
+            self._manager.controller.error(self, error_class)
+        return self._handler.on_retry(reason, error_class)
+
+    def on_error(self, msg):
+        if self._manager.controller is not None:
+            # Imports `http.server`, which isn't needed at startup
+            from video_downloader.util.metrics import classify_error
+            self._manager.controller.error(self, classify_error(msg))
+        return self._handler.on_error(msg)
+
+    def _set_queued(self, queued):
+        if self.queued == queued:
+            return
+        self.queued = queued
+        if self._queued_callback is not None:
+            self._queued_callback(queued)
+
+    def _run(self):
+        self._set_queued(False)
+        self._downloader.start()
+
+
+class DownloadManager(Closable):
+    """Owner of the download jobs and worker processes of the application.
+
+    At most `max_active_jobs` workers run at the same time (no limit if
+    None), jobs started beyond that wait in FIFO order. Closing the
+    manager kills all workers.
+
+    With `adaptive`, `max_active_jobs` is only the initial limit. The
+    `controller` adjusts it and the fragments per download to the
+    throughput and errors of the active jobs.
+    """
+
+    def __init__(self, max_active_jobs=MAX_ACTIVE_JOBS, adaptive=False):
+        super().__init__()
+        self.max_active_jobs = max_active_jobs
+        self._jobs = set()
+        self._active_jobs = set()
+        self._queue = collections.deque()
+        self.controller = None
+        if adaptive:
+            self.controller = ParallelismController(
+                max_active_jobs, callback=self._on_parallelism_changed,
+                queued_items=lambda: len(self._queue))
+
+        def destroy_jobs():
+            for job in list(self._jobs):
+                job.destroy()
+        self.add_close_callback(destroy_jobs)
+
+    @property
+    def active_jobs(self):
+        return len(self._active_jobs)
+
+    @property
+    def queued_jobs(self):
+        return len(self._queue)
+
+    def create_job(self, handler, queued_callback=None):
+        assert not self.closed, 'closed'
+        job = DownloadJob(self, handler, queued_callback)
+        self._jobs.add(job)
+        return job
+
+    def _submit(self, job):
+        assert job in self._jobs
+        assert job not in self._active_jobs and job not in self._queue
+        self._queue.append(job)
+        self._start_queued_jobs()
+        if job in self._queue:
+            job._set_queued(True)
+
+    def _remove(self, job, destroy=False):
+        if job in self._queue:
+            self._queue.remove(job)
+        self._active_jobs.discard(job)
+        if self.controller is not None:
+            self.controller.discard(job)
+        if destroy:
+            self._jobs.discard(job)
+        self._start_queued_jobs()
+
+    def _start_queued_jobs(self):
+        while self._queue and not self.closed and (
+                self.max_active_jobs is None or
+                len(self._active_jobs) < self.max_active_jobs):
+            job = self._queue.popleft()
+            self._active_jobs.add(job)
+            job._run()
+
+    def _on_parallelism_changed(self):
+        self.max_active_jobs = self.controller.items
+        self._start_queued_jobs()
@@ -17,52 +17,79 @@
 
 import collections
 import gettext
+import json
 import os
+import shutil
+import tempfile
+import time
 import traceback
 import typing
 
 from gi.repository import Gio, GLib, GObject
 
 from video_downloader import downloader
+from video_downloader.app.download_manager import DownloadManager
 from video_downloader.downloader import MAX_RESOLUTION
-from video_downloader.util import g_log, gobject_log, languages_from_locale
+from video_downloader.util import (g_log, gobject_log, languages_from_locale,
+                                   list_model_strings, split_urls)
 from video_downloader.util.connection import (CloseStack, PropertyBinding,
-                                              SignalConnection)
+                                              RateLimit, SignalConnection)
 from video_downloader.util.path import expand_path, open_in_file_manager
 from video_downloader.util.response import AsyncResponse, Response
 
 N_ = gettext.gettext
+# Minimum time between `progress-changed` signals (one frame at 60 Hz)
+PROGRESS_INTERVAL = 1 / 60
+
+
+class DownloadProgress(typing.NamedTuple):
+    filename: str = ''
+    # 0.0 - 1.0 (inclusive), negative if unknown
+    progress: float = -1
+    bytes_: int = -1
+    bytes_total: int = -1
+    eta: int = -1
+    speed: int = -1
+
+
+class StringItem(GObject.Object):
+    """Item of the string lists of `Model` (like `Gtk.StringObject`)."""
+    string = GObject.Property(type=str)
+
+    def __init__(self, string):
+        super().__init__(string=string)
+
+    def get_string(self):
+        return self.string
 
 
 class Model(GObject.GObject, downloader.HandlerInterface):
     __gsignals__ = {
-        'download-pulse': (GObject.SIGNAL_RUN_FIRST, None, ())
+        'download-pulse': (GObject.SIGNAL_RUN_FIRST, None, ()),
+        # Emitted with the latest `DownloadProgress`, progress reported by
+        # the worker in between is dropped (see `PROGRESS_INTERVAL`)
+        'progress-changed': (GObject.SIGNAL_RUN_FIRST, None, (object,)),
     }
     state = GObject.Property(type=str, default='start')
     mode = GObject.Property(type=str, default='audio')
+    # one or more URLs separated by whitespace (see `urls`)
     url = GObject.Property(type=str)
     error = GObject.Property(type=str)
     resolution = GObject.Property(type=GObject.TYPE_UINT, default=1080)
     download_folder = GObject.Property(type=str)
     # absolute path to dir of active/finished download (empty if no download)
     finished_download_dir = GObject.Property(type=str)
-    # TYPE_STRV is None by default, empty list can be None or []
-    finished_download_filenames = GObject.Property(type=GObject.TYPE_STRV)
     automatic_subtitles = GObject.Property(type=GObject.TYPE_STRV)
     prefer_mpeg = GObject.Property(type=bool, default=False)
+    # keep account credentials with the cookies of hosts (see
+    # `get_remember_credentials`)
+    remember_credentials = GObject.Property(type=bool, default=False)
     download_playlist_index = GObject.Property(type=GObject.TYPE_INT64)
     download_playlist_count = GObject.Property(type=GObject.TYPE_INT64)
-    download_filename = GObject.Property(type=str)
     download_title = GObject.Property(type=str)
-    download_titles = GObject.Property(type=GObject.TYPE_STRV)
     download_thumbnail = GObject.Property(type=str)
-    # 0.0 - 1.0 (inclusive), negative if unknown:
-    download_progress = GObject.Property(type=float, default=-1)
-    download_bytes = GObject.Property(type=GObject.TYPE_INT64, default=-1)
-    download_bytes_total = GObject.Property(type=GObject.TYPE_INT64,
-                                            default=-1)
-    download_speed = GObject.Property(type=GObject.TYPE_INT64, default=-1)
-    download_eta = GObject.Property(type=GObject.TYPE_INT64, default=-1)
+    # waiting for a free worker of the `DownloadManager`
+    download_queued = GObject.Property(type=bool, default=False)
     resolutions = collections.OrderedDict([
         (MAX_RESOLUTION, N_('Best')),
         (4320, N_('4320p (8K)')),
@@ -77,14 +104,73 @@ class Model(GObject.GObject, downloader.HandlerInterface):
 
     _global_download_lock = set()
 
-    def __init__(self, handler=None):
+    # Read-only views of `progress`, notified after `progress-changed` if
+    # they changed (GObject skips notifications without handlers)
+    @GObject.Property(type=str)
+    def download_filename(self):
+        return self.progress.filename
+
+    @GObject.Property(type=float, default=-1)
+    def download_progress(self):
+        return self.progress.progress
+
+    @GObject.Property(type=GObject.TYPE_INT64, default=-1)
+    def download_bytes(self):
+        return self.progress.bytes_
+
+    @GObject.Property(type=GObject.TYPE_INT64, default=-1)
+    def download_bytes_total(self):
+        return self.progress.bytes_total
+
+    @GObject.Property(type=GObject.TYPE_INT64, default=-1)
+    def download_eta(self):
+        return self.progress.eta
+
+    @GObject.Property(type=GObject.TYPE_INT64, default=-1)
+    def download_speed(self):
+        return self.progress.speed
+
+    @property
+    def urls(self):
+        return split_urls(self.url)
+
+    @urls.setter
+    def urls(self, urls):
+        self.url = ' '.join(urls)
+
+    def __init__(self, handler=None, download_manager=None,
+                 session_keyring=None):
         super().__init__()
         self._cs = CloseStack()
         self._handler = handler
+        self._session_keyring = session_keyring
         self._cs.add_close_callback(setattr, self, '_handler', None)
-        self._downloader = downloader.Downloader(self)
+        if download_manager is None:
+            download_manager = self._cs.push(
+                DownloadManager(max_active_jobs=None))
+        self._downloader = download_manager.create_job(
+            self, lambda queued: self.set_property('download-queued', queued))
         self._cs.add_close_callback(self._downloader.destroy)
         self._active_download_lock = None
+        # Latest progress of the worker and the last one that was emitted
+        self._pending_progress = self.progress = DownloadProgress()
+        self._progress_rate_limit = self._cs.push(
+            RateLimit(self._emit_progress, PROGRESS_INTERVAL))
+        # Titles of the started downloads and file names of the finished
+        # downloads. Items are appended, views update incrementally with
+        # `items-changed`.
+        self.download_titles = Gio.ListStore(item_type=StringItem)
+        self.finished_download_filenames = Gio.ListStore(
+            item_type=StringItem)
+        # Phases reported by the worker (see `get_download_timings`)
+        self._phase_records = []
+        self._retries = collections.Counter()
+        self._connection_stats = collections.Counter()
+        self._job_start_time = self._job_end_time = None
+        # Preview thumbnails of the current job (see `get_preview_dir`),
+        # deleted by the `ThumbnailLoader` of the GUI after decoding
+        self._preview_dir = None
+        self._cs.add_close_callback(self._remove_preview_dir)
         self.actions = gobject_log(Gio.SimpleActionGroup.new())
         for action_name, callback, *extra_args in [
                 ('download', self.set_property, 'state', 'prepare'),
@@ -100,7 +186,7 @@ class Model(GObject.GObject, downloader.HandlerInterface):
 
         def update_download_action_enabled():
             self.actions.lookup_action('download').set_property(
-                'enabled', bool(self.url) and
+                'enabled', bool(self.urls) and
                 self._is_valid_state_transition(self.state, 'prepare'))
         for name in ['state', 'url']:
             self._cs.push(SignalConnection(
@@ -148,27 +234,30 @@ class Model(GObject.GObject, downloader.HandlerInterface):
             self.error = ''
             self.download_playlist_index = 0
             self.download_playlist_count = 0
-            self.download_filename = ''
             self.download_title = ''
-            self.download_titles = None
+            self.download_titles.remove_all()
             self.download_thumbnail = ''
-            self.download_progress = -1
-            self.download_bytes = -1
-            self.download_bytes_total = -1
-            self.download_speed = -1
-            self.download_eta = -1
-            self.finished_download_filenames = None
+            self._pending_progress = DownloadProgress()
+            self._emit_progress()
+            self.finished_download_filenames.remove_all()
             self.finished_download_dir = ''
+            self._phase_records = []
+            self._retries = collections.Counter()
+            self._connection_stats = collections.Counter()
+            self._job_start_time = self._job_end_time = None
+            self._remove_preview_dir()
             self._try_start_download()
         if state == 'download':
+            self._job_start_time = time.monotonic()
             self._downloader.start()
         if state == 'cancel':
             self._downloader.cancel()
 
     def _open_finished_download_dir(self):
         assert self.finished_download_dir
-        open_in_file_manager(self.finished_download_dir,
-                             self.finished_download_filenames or [])
+        open_in_file_manager(
+            self.finished_download_dir,
+            list_model_strings(self.finished_download_filenames))
 
     def _try_start_download(self):
         path = expand_path(self.download_folder)
@@ -196,6 +285,7 @@ class Model(GObject.GObject, downloader.HandlerInterface):
 
     def on_finished(self, success):
         assert self.state in ['download', 'cancel']
+        self._job_end_time = time.monotonic()
         self._download_unlock()
         if self.state == 'cancel':
             self.state = 'start'
@@ -214,9 +304,9 @@ class Model(GObject.GObject, downloader.HandlerInterface):
         assert self.state in ['download', 'cancel']
         return [*languages_from_locale(), *(self.automatic_subtitles or [])]
 
-    def get_url(self):
+    def get_urls(self):
         assert self.state in ['download', 'cancel']
-        return self.url
+        return self.urls
 
     def get_mode(self):
         assert self.state in ['download', 'cancel']
@@ -226,6 +316,35 @@ class Model(GObject.GObject, downloader.HandlerInterface):
         assert self.state in ['download', 'cancel']
         return self.resolution
 
+    def get_preview_dir(self):
+        assert self.state in ['download', 'cancel']
+        if self._preview_dir is None:
+            previews_dir = os.path.join(
+                GLib.get_user_cache_dir(), 'video-downloader', 'previews')
+            try:
+                os.makedirs(previews_dir, exist_ok=True)
+                self._preview_dir = tempfile.mkdtemp(dir=previews_dir)
+            except OSError:
+                g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                      traceback.format_exc())
+                return ''
+        return self._preview_dir
+
+    def get_session_key(self):
+        assert self.state in ['download', 'cancel']
+        if self._session_keyring is None:
+            return ''
+        return self._session_keyring.get_key()
+
+    def get_remember_credentials(self):
+        assert self.state in ['download', 'cancel']
+        return self.remember_credentials
+
+    def _remove_preview_dir(self):
+        if self._preview_dir is not None:
+            shutil.rmtree(self._preview_dir, ignore_errors=True)
+            self._preview_dir = None
+
     def _forward_response(self, response):
         def callback(response):
             if response.cancelled:
@@ -254,19 +373,27 @@ class Model(GObject.GObject, downloader.HandlerInterface):
 
     def on_progress(self, filename, progress, bytes_, bytes_total, eta, speed):
         assert self.state in ['download', 'cancel']
-        self.download_filename = filename
-        self.download_progress = progress
-        self.download_bytes = bytes_
-        self.download_bytes_total = bytes_total
-        self.download_eta = eta
-        self.download_speed = speed
+        self._pending_progress = DownloadProgress(
+            filename, progress, bytes_, bytes_total, eta, speed)
+        self._progress_rate_limit()
+
+    def _emit_progress(self):
+        old_progress = self.progress
+        if self._pending_progress == old_progress:
+            return
+        self.progress = self._pending_progress
+        self.emit('progress-changed', self.progress)
+        for name, value, old_value in zip(
+                DownloadProgress._fields, self.progress, old_progress):
+            if value != old_value:
+                self.notify('download-' + name.rstrip('_').replace('_', '-'))
 
     def on_download_start(self, playlist_index, playlist_count, title):
         assert self.state in ['download', 'cancel']
         self.download_playlist_index = playlist_index
         self.download_playlist_count = playlist_count
         self.download_title = title
-        self.download_titles = [*(self.download_titles or []), title]
+        self.download_titles.append(StringItem(title))
 
     def _download_unlock(self):
         if self._active_download_lock:
@@ -289,8 +416,74 @@ class Model(GObject.GObject, downloader.HandlerInterface):
     def on_download_finished(self, filename):
         assert self.state in ['download', 'cancel']
         self._download_unlock()
-        self.finished_download_filenames = [
-            *(self.finished_download_filenames or []), filename]
+        self.finished_download_filenames.append(StringItem(filename))
+
+    def on_phase_start(self, playlist_index, phase, timestamp):
+        assert self.state in ['download', 'cancel']
+        self._phase_records.append({
+            'playlist_index': playlist_index, 'phase': phase,
+            'start': timestamp, 'end': None, 'bytes': -1})
+
+    def on_phase_end(self, playlist_index, phase, timestamp, bytes_):
+        assert self.state in ['download', 'cancel']
+        for record in reversed(self._phase_records):
+            if (record['playlist_index'] == playlist_index and
+                    record['phase'] == phase and record['end'] is None):
+                record['end'] = timestamp
+                record['bytes'] = bytes_
+                break
+
+    def on_retry(self, reason, error_class):
+        assert self.state in ['download', 'cancel']
+        self._retries[reason] += 1
+
+    def on_connection_stats(self, playlist_index, stats):
+        assert self.state in ['download', 'cancel']
+        self._connection_stats.update(stats)
+
+    def get_download_timings(self):
+        """Timing breakdown of the current or last download job.
+
+        Times are in seconds relative to the start of the job. Phases that
+        didn't end (e.g. the job was cancelled) have no duration.
+        """
+        start = self._job_start_time
+        if start is None:
+            return None
+        end = self._job_end_time
+        titles = self.download_titles
+        phases = []
+        totals = {}
+        for record in self._phase_records:
+            index = record['playlist_index']
+            duration = (record['end'] - record['start']
+                        if record['end'] is not None else None)
+            phases.append({
+                'playlist_index': index,
+                'title': (titles.get_item(index).get_string()
+                          if 0 <= index < titles.get_n_items() else None),
+                'phase': record['phase'],
+                'start': record['start'] - start,
+                'duration': duration,
+                'bytes': record['bytes']})
+            total = totals.setdefault(record['phase'], {
+                'count': 0, 'duration': 0.0, 'bytes': 0})
+            total['count'] += 1
+            total['duration'] += duration or 0.0
+            total['bytes'] += max(0, record['bytes'])
+        return {
+            'urls': self.urls,
+            'mode': self.mode,
+            'state': self.state,
+            'duration': end - start if end is not None else None,
+            'phases': phases,
+            'totals': totals,
+            'retries': dict(self._retries),
+            'connections': dict(self._connection_stats)}
+
+    def export_download_timings(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.get_download_timings(), f, indent=2)
 
 
 def check_download_dir(path: str, create: bool = False
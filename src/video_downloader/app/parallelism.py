@@ -0,0 +1,177 @@
+"""Adapt the number of parallel downloads to the measured throughput."""
+
+import collections
+import statistics
+import time
+import typing
+
+from video_downloader.util.logging import StructuredLogger
+
+# Seconds of progress that are compared with the previous interval
+CONTROL_INTERVAL = 5
+# Downloads (items) of all jobs that run at the same time
+MIN_ITEMS = 1
+MAX_ITEMS = 8
+# Fragments of one download (HLS, DASH) that are loaded at the same time
+MIN_FRAGMENTS = 1
+MAX_FRAGMENTS = 16
+ADDITIVE_INCREASE = 1
+MULTIPLICATIVE_DECREASE = 0.5
+# Relative improvement of the total throughput that allows an increase
+THROUGHPUT_GAIN = 0.1
+# Start latency of downloads that counts as congestion, relative to the
+# lowest of the last `LATENCY_SAMPLES`
+LATENCY_FACTOR = 2
+LATENCY_SAMPLES = 20
+# Error classes (see `video_downloader.util.metrics.classify_error`) of
+# overloaded servers or connections
+CONGESTION_ERRORS = {'http_429', 'network'}
+# Decisions kept in `ParallelismController.decisions`
+DECISION_HISTORY = 100
+
+
+def is_congestion_error(error_class):
+    return error_class in CONGESTION_ERRORS or (
+        error_class.startswith('http_5') and len(error_class) == 8)
+
+
+class Decision(typing.NamedTuple):
+    timestamp: float
+    items: int
+    fragments: int
+    # "increase", "latency" or the error class that caused a decrease
+    reason: str
+    # Mean total throughput of the interval in bytes/s (-1 if unknown)
+    throughput: float = -1
+    # Mean start latency of the downloads in the interval (-1 if unknown)
+    latency: float = -1
+
+
+class ParallelismController:
+    """Additive-increase/multiplicative-decrease of the downloads (`items`)
+       and of the fragments per download (`fragments`) that run at once.
+
+    Fed with the progress and errors of all active jobs. Every `interval`
+    seconds with progress, the mean total throughput is compared with the
+    previous interval. While it improves by `THROUGHPUT_GAIN`, one more item
+    (if `queued_items()` are waiting for a worker) or fragment is allowed.
+    HTTP 429, 5xx and network errors, or a mean start latency of downloads
+    above `LATENCY_FACTOR` times the lowest recent one, halve both limits (at
+    most once per interval). `callback` is called after every change.
+    Changes are logged and kept in `decisions`.
+
+    Jobs are identified by any hashable `key`.
+    """
+
+    def __init__(self, items=MIN_ITEMS, fragments=MIN_FRAGMENTS,
+                 callback=None, queued_items=None, interval=CONTROL_INTERVAL,
+                 clock=time.monotonic):
+        self.items = items
+        self.fragments = fragments
+        self.interval = interval
+        self.decisions = collections.deque(maxlen=DECISION_HISTORY)
+        self._callback = callback
+        self._queued_items = queued_items
+        self._clock = clock
+        self._speeds = {}  # key -> latest speed in bytes/s
+        self._item_starts = {}  # key -> start of download without progress
+        self._latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._prev_throughput = None
+        self._last_decrease = None
+        self._reset_interval(clock())
+
+    def _reset_interval(self, now):
+        self._interval_start = self._last_sample = now
+        self._interval_bytes = 0
+        self._interval_latencies = []
+
+    def item_started(self, key):
+        self._item_starts[key] = self._clock()
+
+    def item_finished(self, key):
+        self._item_starts.pop(key, None)
+
+    def progress(self, key, speed):
+        """`speed` in bytes/s, negative if unknown."""
+        now = self._clock()
+        # Total throughput since the last sample, weighted by time
+        self._interval_bytes += (
+            sum(self._speeds.values()) * (now - self._last_sample))
+        self._last_sample = now
+        if speed < 0:
+            return
+        self._speeds[key] = speed
+        start = self._item_starts.pop(key, None)
+        if start is not None:
+            self._interval_latencies.append(now - start)
+        if now - self._interval_start >= self.interval:
+            self._end_interval(now)
+
+    def error(self, key, error_class):
+        if is_congestion_error(error_class):
+            self._decrease(self._clock(), error_class)
+
+    def discard(self, key):
+        """Forget the job `key` (e.g. when it finished)."""
+        self._speeds.pop(key, None)
+        self._item_starts.pop(key, None)
+        if not self._speeds:
+            # Idle time doesn't count as low throughput
+            self._reset_interval(self._clock())
+
+    def _end_interval(self, now):
+        throughput = self._interval_bytes / (now - self._interval_start)
+        latency = (statistics.fmean(self._interval_latencies)
+                   if self._interval_latencies else -1)
+        base_latency = min(self._latencies, default=None)
+        self._latencies.extend(self._interval_latencies)
+        prev_throughput = self._prev_throughput
+        self._prev_throughput = throughput
+        self._reset_interval(now)
+        if (latency >= 0 and base_latency is not None and
+                latency > base_latency * LATENCY_FACTOR):
+            self._decrease(now, 'latency', throughput, latency)
+        elif throughput > 0 and (
+                prev_throughput is None or
+                throughput >= prev_throughput * (1 + THROUGHPUT_GAIN)):
+            self._increase(now, throughput, latency)
+
+    def _increase(self, now, throughput, latency):
+        queued_items = self._queued_items() if self._queued_items else 0
+        if queued_items > 0 and self.items < MAX_ITEMS:
+            self.items = min(MAX_ITEMS, self.items + ADDITIVE_INCREASE)
+        elif self.fragments < MAX_FRAGMENTS:
+            self.fragments = min(MAX_FRAGMENTS,
+                                 self.fragments + ADDITIVE_INCREASE)
+        else:
+            return
+        self._decide(now, 'increase', throughput, latency)
+
+    def _decrease(self, now, reason, throughput=-1, latency=-1):
+        # One decrease per interval, errors of the same congestion come in
+        # bursts
+        if (self._last_decrease is not None and
+                now - self._last_decrease < self.interval):
+            return
+        items = max(MIN_ITEMS, int(self.items * MULTIPLICATIVE_DECREASE))
+        fragments = max(MIN_FRAGMENTS,
+                        int(self.fragments * MULTIPLICATIVE_DECREASE))
+        if (items, fragments) == (self.items, self.fragments):
+            return
+        self._last_decrease = now
+        self.items, self.fragments = items, fragments
+        # Throughput of the new limits is compared from scratch
+        self._prev_throughput = None
+        self._reset_interval(now)
+        self._decide(now, reason, throughput, latency)
+
+    def _decide(self, now, reason, throughput, latency):
+        decision = Decision(now, self.items, self.fragments, reason,
+                            throughput, latency)
+        self.decisions.append(decision)
+        StructuredLogger.info(
+            'Parallelism changed', items=self.items,
+            fragments=self.fragments, reason=reason,
+            throughput='%.0f' % throughput, latency='%.3f' % latency)
+        if self._callback is not None:
+            self._callback()
@@ -0,0 +1,105 @@
+"""Key of the session store of the worker, kept in the Secret Service.
+
+The sessions (see `video_downloader.downloader.sessions`) are encrypted
+files, their key is stored with libsecret and handed to the worker by
+`Model.get_session_key`. Without libsecret the store is disabled.
+"""
+
+import base64
+import gettext
+import secrets
+import traceback
+
+import gi
+from gi.repository import GLib
+
+from video_downloader.downloader.sessions import KEY_SIZE
+from video_downloader.util import g_log
+from video_downloader.util.response import AsyncResponse
+
+try:
+    gi.require_version('Secret', '1')
+    from gi.repository import Secret
+except (ImportError, ValueError):
+    Secret = None
+
+N_ = gettext.gettext
+_ATTRIBUTES = {'purpose': 'sessions'}
+
+
+def _get_schema():
+    return Secret.Schema.new(
+        'com.github.unrud.VideoDownloader.SessionKey',
+        Secret.SchemaFlags.NONE,
+        {'purpose': Secret.SchemaAttributeType.STRING})
+
+
+class SessionKeyring:
+    """Looks up the key (base64 encoded) once and creates it if it's
+       missing. Requests that arrive during the lookup wait for it."""
+
+    def __init__(self):
+        self._key = None
+        self._pending = []
+
+    def get_key(self):
+        """Returns the key or an `AsyncResponse` of it, empty if the
+           Secret Service is unavailable."""
+        if Secret is None:
+            return ''
+        if self._key is not None:
+            return self._key
+        response = AsyncResponse()
+        self._pending.append(response)
+        if len(self._pending) == 1:
+            Secret.password_lookup(_get_schema(), _ATTRIBUTES, None,
+                                   self._on_lookup)
+        return response
+
+    def _on_lookup(self, source, result):
+        try:
+            key = Secret.password_lookup_finish(result)
+        except GLib.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                  traceback.format_exc())
+            self._finish('')
+            return
+        if key:
+            self._finish(key)
+            return
+        key = base64.b64encode(secrets.token_bytes(KEY_SIZE)).decode()
+        Secret.password_store(
+            _get_schema(), _ATTRIBUTES, Secret.COLLECTION_DEFAULT,
+            N_('Video Downloader sessions'), key, None, self._on_store, key)
+
+    def _on_store(self, source, result, key):
+        try:
+            Secret.password_store_finish(result)
+        except GLib.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                  traceback.format_exc())
+            key = ''
+        self._finish(key)
+
+    def _finish(self, key):
+        if key:
+            # Failures are tried again by later requests
+            self._key = key
+        pending, self._pending = self._pending, []
+        for response in pending:
+            if not response.done:
+                response.set_result(key)
+
+    def forget(self):
+        """Delete the key, the sessions can't be decrypted anymore."""
+        self._key = None
+        if Secret is None:
+            return
+
+        def on_clear(source, result):
+            try:
+                Secret.password_clear_finish(result)
+            except GLib.Error:
+                g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                      traceback.format_exc())
+        Secret.password_clear(_get_schema(), _ATTRIBUTES, None, on_clear)
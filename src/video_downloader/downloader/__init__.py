@@ -15,28 +15,40 @@
 # You should have received a copy of the GNU General Public License
 # along with Video Downloader.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import contextlib
 import fcntl
 import functools
+import json
 import os
-import re
 import signal
 import subprocess
 import sys
+import time
 import traceback
 import typing
 
 from gi.repository import GLib
 
 from video_downloader.util import g_log
+from video_downloader.util.framing import LineReader
 from video_downloader.util.response import AsyncResponse, Response
 from video_downloader.util.rpc import handle_rpc_request, rpc_response
+from video_downloader.util.trace import (
+    TRACEPARENT_ENV, monotonic_us, new_trace_id, parse_traceparent,
+    process_tracer)
 
 MAX_RESOLUTION = 2**16-1
-
-# RegEx for splitting lines because `bytes.splitlines` transforms
-# `b'abc\n'` to `[b'abc']` instead of `[b'abc', b'']`
-_SPLITLINES_RE = re.compile(rb'\r\n|\r|\n')
+# Fragments of one download that are loaded at once (same as yt-dlp)
+DEFAULT_CONCURRENT_FRAGMENTS = 1
+# Longer requests of the worker are a protocol error
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+# Longer lines on stderr are truncated in the log
+MAX_STDERR_LINE_SIZE = 64 * 1024
+# Lines of stderr kept per job, logged when the job fails
+STDERR_LOG_LINES = 500
+# Minimum seconds between pulses caused by output on stderr
+PULSE_INTERVAL = 0.1
 
 
 class Downloader:
@@ -44,6 +56,29 @@ class Downloader:
         self._handler = handler
         self._process = None
         self._pending_response = None
+        self._tracer = process_tracer('gui')
+        self._job_span = None
+        self._stderr_log = collections.deque(maxlen=STDERR_LOG_LINES)
+
+    @property
+    def trace_id(self):
+        """Trace id of the current or last job (see `util.trace`)."""
+        return self._job_span.trace_id if self._job_span else None
+
+    @property
+    def stderr_log(self):
+        """Last lines of stderr of the current or last job."""
+        return list(self._stderr_log)
+
+    def dump_stderr_log(self, level=GLib.LogLevelFlags.LEVEL_WARNING):
+        trace_id = self.trace_id or ''
+        g_log('yt-dlp', level, '[%s] Last %d lines of stderr:\n%s',
+              trace_id[:8], len(self._stderr_log),
+              '\n'.join(self._stderr_log))
+
+    def _end_job_span(self, **args):
+        if self._job_span:
+            self._job_span.end(**args)
 
     def destroy(self):
         self._handler = None
@@ -52,13 +87,17 @@ class Downloader:
 
     def cancel(self):
         assert self._process
+        self._process.cancelled = True
         self._process.terminate()
         if self._pending_response:
             self._pending_response.cancel()
 
     def start(self):
         assert not self._process
-        extra_env = {'PYTHONPATH': os.pathsep.join(sys.path)}
+        self._job_span = self._tracer.start_span(
+            'job', trace_id=new_trace_id())
+        extra_env = {'PYTHONPATH': os.pathsep.join(sys.path),
+                     TRACEPARENT_ENV: self._job_span.traceparent}
         # Start child process in its own process group to shield it from
         # signals by terminals (e.g. SIGINT) and to identify remaning children.
         # yt-dlp doesn't kill ffmpeg and other subprocesses on error.
@@ -79,7 +118,18 @@ class Downloader:
         # directly. The line ending `b'\r\n'` will be transformed to `'\n\n'`.
         fcntl.fcntl(self._process.stdout, fcntl.F_SETFL, os.O_NONBLOCK)
         fcntl.fcntl(self._process.stderr, fcntl.F_SETFL, os.O_NONBLOCK)
-        self._process.stdout_remainder = self._process.stderr_remainder = b''
+        self._process.stdout_reader = LineReader(MAX_REQUEST_SIZE)
+        self._process.stderr_reader = LineReader(MAX_STDERR_LINE_SIZE,
+                                                 truncate=True)
+        self._process.trace_id = self._job_span.trace_id
+        self._process.cancelled = False
+        self._process.last_pulse = 0
+        # Formatting every line for the log is expensive, the lines are only
+        # kept in `stderr_log` unless debug messages are shown
+        self._process.log_stderr = not GLib.log_writer_default_would_drop(
+            GLib.LogLevelFlags.LEVEL_DEBUG, 'yt-dlp')
+        self._process.stderr_log = self._stderr_log = collections.deque(
+            maxlen=STDERR_LOG_LINES)
         GLib.unix_fd_add_full(
             GLib.PRIORITY_DEFAULT_IDLE, self._process.stdout.fileno(),
             GLib.IOCondition.IN, self._on_process_stdout, self._process)
@@ -101,6 +151,7 @@ class Downloader:
             # Kill remaining children identified by process group
             with contextlib.suppress(OSError):
                 os.killpg(process.pid, signal.SIGKILL)
+            self._end_job_span(returncode=process.returncode)
         return process.returncode
 
     def _pending_response_callback(self, process, request_line, response):
@@ -111,6 +162,19 @@ class Downloader:
         else:
             self._send_response(process, request_line, response.result)
 
+    def _record_request_span(self, request_line, start, response):
+        if not self._tracer.enabled:
+            return
+        request = json.loads(request_line)
+        context = parse_traceparent(request.get('trace'))
+        if context is None and self._job_span:
+            context = self._job_span.trace_id, self._job_span.span_id
+        trace_id, parent_id = context or (None, None)
+        self._tracer.record(request['method'], start, monotonic_us(),
+                            category='request', trace_id=trace_id,
+                            parent_id=parent_id,
+                            cancelled=response.cancelled)
+
     @staticmethod
     def _send_response(process, request_line, result):
         try:
@@ -125,9 +189,7 @@ class Downloader:
         # Don't use `process.stdout.read` because of O_NONBLOCK (see `start`)
         s = process.stdout.buffer.read()
         pipe_closed = not s
-        process.stdout_remainder += s
-        *lines, process.stdout_remainder = _SPLITLINES_RE.split(
-            process.stdout_remainder)
+        lines = process.stdout_reader.feed(s)
         if self._process is not process:
             return not pipe_closed
         failure = False
@@ -148,36 +210,63 @@ class Downloader:
                 self._pending_response = result
                 self._pending_response.add_done_callback(functools.partial(
                     self._pending_response_callback, self._process, line))
+                # Requests that wait for the user show up in the trace
+                self._pending_response.add_done_callback(functools.partial(
+                    self._record_request_span, line, monotonic_us()))
             else:
                 self._send_response(self._process, line, result)
-        if pipe_closed and process.stdout_remainder:
+        if process.stdout_reader.dropped_lines and not failure:
             g_log(None, GLib.LogLevelFlags.LEVEL_CRITICAL,
-                  'incomplete request %r', process.stdout_remainder)
+                  'request larger than %d bytes', MAX_REQUEST_SIZE)
+            failure = True
+        if pipe_closed and process.stdout_reader.pending and not failure:
+            g_log(None, GLib.LogLevelFlags.LEVEL_CRITICAL,
+                  'incomplete request %r', process.stdout_reader.pending)
             failure = True
         if pipe_closed or failure:
             returncode = self._finish_process_and_kill_pgrp()
             if self._pending_response:
                 self._pending_response.cancel()
-            self._handler.on_finished(returncode == 0 and not failure)
+            success = returncode == 0 and not failure
+            if not success and not process.cancelled and (
+                    not process.log_stderr):
+                # Output that is still in the pipe belongs to the error
+                while self._read_stderr(process) is False:
+                    pass
+                self.dump_stderr_log()
+            self._handler.on_finished(success)
         return not pipe_closed
 
     def _on_process_stderr(self, fd, condition, process):
+        return not self._read_stderr(process)
+
+    def _read_stderr(self, process):
+        """Returns whether the pipe is closed or None if there was nothing
+           to read."""
         # Don't use `process.stderr.read` because of O_NONBLOCK (see `start`)
         s = process.stderr.buffer.read()
+        if s is None:
+            return None
         pipe_closed = not s
-        process.stderr_remainder += s
+        lines = process.stderr_reader.feed(s)
         if pipe_closed:
-            process.stderr_remainder += b'\n'
-        *lines, process.stderr_remainder = _SPLITLINES_RE.split(
-            process.stderr_remainder)
-        for line in filter(None, lines):  # Filter empty lines
-            # Don't use `errors='strict'` because programs might write garbage
-            # to stderr
-            line = line.decode(process.stderr.encoding, errors='replace')
-            g_log('yt-dlp', GLib.LogLevelFlags.LEVEL_DEBUG, '%s', line)
-            if self._process is process:
-                self._handler.on_pulse()
-        return not pipe_closed
+            lines.extend(process.stderr_reader.flush())
+        # Don't use `errors='strict'` because programs might write garbage
+        # to stderr
+        lines = [line.decode(process.stderr.encoding, errors='replace')
+                 for line in lines if line]  # Filter empty lines
+        process.stderr_log.extend(lines)
+        if process.log_stderr:
+            for line in lines:
+                # Tagged to tell apart the output of concurrent jobs
+                g_log('yt-dlp', GLib.LogLevelFlags.LEVEL_DEBUG, '[%s] %s',
+                      process.trace_id[:8], line)
+        now = time.monotonic()
+        if (lines and self._process is process and
+                now - process.last_pulse >= PULSE_INTERVAL):
+            process.last_pulse = now
+            self._handler.on_pulse()
+        return pipe_closed
 
 
 class HandlerInterface:
@@ -190,7 +279,9 @@ class HandlerInterface:
     def get_automatic_subtitles(self) -> Response[typing.List[str]]:
         raise NotImplementedError
 
-    def get_url(self) -> Response[str]:
+    def get_urls(self) -> Response[typing.List[str]]:
+        """Downloaded one after another by the same worker, their entries
+           are numbered as one playlist."""
         raise NotImplementedError
 
     def get_mode(self) -> Response[str]:
@@ -199,6 +290,26 @@ class HandlerInterface:
     def get_resolution(self) -> Response[int]:
         raise NotImplementedError
 
+    def get_preview_dir(self) -> Response[str]:
+        """Directory for the previews of `on_download_thumbnail`, owned by
+           the handler. Empty to keep them in the temporary directory of
+           the worker, which is deleted when the job ends."""
+        raise NotImplementedError
+
+    def get_session_key(self) -> Response[str]:
+        """Key of the session store (see `downloader.sessions`), base64
+           encoded. Empty to keep cookies only for the job."""
+        raise NotImplementedError
+
+    def get_remember_credentials(self) -> Response[bool]:
+        """Whether account credentials are kept in the session store
+           together with the cookies."""
+        raise NotImplementedError
+
+    def get_concurrent_fragments(self) -> Response[int]:
+        """Asked before every download, e.g. for HLS and DASH."""
+        raise NotImplementedError
+
     def on_playlist_request(self) -> Response[bool]:
         raise NotImplementedError
 
@@ -219,6 +330,8 @@ class HandlerInterface:
 
     def on_download_start(self, playlist_index: int, playlist_count: int,
                           title: str) -> Response[None]:
+        """`playlist_count` is -1 if the playlist is still being extracted
+           and its size is unknown."""
         raise NotImplementedError
 
     #                                                 lock acquired
@@ -228,6 +341,10 @@ class HandlerInterface:
         raise NotImplementedError
 
     def on_download_thumbnail(self, thumbnail: str) -> Response[None]:
+        """`thumbnail` is a JPEG preview that fits into the size of the
+           thumbnail in the GUI (`PREVIEW_THUMBNAIL_HEIGHT` pixels high).
+           Unless `get_preview_dir` is empty, deleting it is up to the
+           handler."""
         raise NotImplementedError
 
     def on_download_finished(self, filename: str) -> Response[None]:
@@ -236,5 +353,30 @@ class HandlerInterface:
     def on_pulse(self) -> Response[None]:
         raise NotImplementedError
 
+    # Timestamps are from `time.monotonic` (shared by all processes).
+    # The playlist index is -1 for phases that don't belong to a download
+    # (e.g. probing a URL).
+    def on_phase_start(self, playlist_index: int, phase: str,
+                       timestamp: float) -> Response[None]:
+        raise NotImplementedError
+
+    #                                                          -1 if unknown
+    def on_phase_end(self, playlist_index: int, phase: str, timestamp: float,
+                     bytes_: int) -> Response[None]:
+        raise NotImplementedError
+
+    #                      "request", "fragment" or "authentication"
+    def on_retry(self, reason: str, error_class: str) -> Response[None]:
+        """`error_class` of the message that caused the retry (see
+           `video_downloader.util.metrics.classify_error`)."""
+        raise NotImplementedError
+
+    def on_connection_stats(self, playlist_index: int,
+                            stats: typing.Dict[str, float]) -> Response[None]:
+        """Connections set up since the last call, for the download
+           `playlist_index` (-1 for probing and extracting URLs). See
+           `video_downloader.downloader.network.ConnectionStats`."""
+        raise NotImplementedError
+
     def on_finished(self, success: bool) -> Response[None]:
         raise NotImplementedError
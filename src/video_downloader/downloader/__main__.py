@@ -20,6 +20,7 @@ import signal
 import sys
 
 from video_downloader.util.rpc import RpcClient
+from video_downloader.util.trace import process_tracer
 
 
 if __name__ == '__main__':
@@ -38,7 +39,9 @@ if __name__ == '__main__':
     with open(os.devnull, 'r+') as devnull:
         os.dup2(devnull.fileno(), sys.stdin.fileno(), inheritable=True)
         os.dup2(devnull.fileno(), sys.stdout.fileno(), inheritable=True)
-    handler = RpcClient(output_file, input_file)
+    # Requests carry the trace context of the current phase
+    handler = RpcClient(output_file, input_file,
+                        process_tracer('worker').current_traceparent)
     try:
         from video_downloader.downloader.yt_dlp_monkey_patch import (
             install_monkey_patches)
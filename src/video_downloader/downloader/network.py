@@ -0,0 +1,272 @@
+"""Reuse DNS results, TLS sessions and connections in the worker.
+
+yt-dlp creates new request handlers (with new TLS contexts and connection
+pools) for every `YoutubeDL`, and the worker creates a `YoutubeDL` for every
+phase of every URL and download. `install_connection_reuse` shares them
+across all `YoutubeDL` objects of the process and counts the time spent
+setting up connections in `stats`.
+"""
+
+import collections
+import socket
+import ssl
+import threading
+import time
+import weakref
+
+# `getaddrinfo` doesn't report the TTL of records
+DNS_TTL = 60
+DNS_CACHE_SIZE = 256
+# Hosts per TLS context with a session to resume
+TLS_SESSION_CACHE_SIZE = 256
+# Connection pools of the requests handler (one per host), connections per
+# host (see `video_downloader.app.parallelism.MAX_FRAGMENTS`)
+POOL_COUNT = 32
+POOL_MAXSIZE = 16
+
+
+class ConnectionStats:
+    """Thread-safe counters of connection setups, see `take`."""
+
+    FIELDS = ['dns_lookups', 'dns_cache_hits', 'dns_seconds',
+              'connections', 'connect_seconds',
+              'tls_handshakes', 'tls_resumed', 'tls_seconds']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **values):
+        with self._lock:
+            for name, value in values.items():
+                self._values[name] += value
+
+    def take(self):
+        """Return the counters since the last call and reset them."""
+        with self._lock:
+            values = self._values
+            self._values = dict.fromkeys(self.FIELDS, 0)
+        return values
+
+
+class DnsCache:
+    """Cache the results of `resolve` (`socket.getaddrinfo`) for `ttl`
+       seconds. Failed lookups are not cached."""
+
+    def __init__(self, resolve, ttl=DNS_TTL, max_size=DNS_CACHE_SIZE,
+                 stats=None, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._resolve = resolve
+        self._stats = stats or ConnectionStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def getaddrinfo(self, *args, **kwargs):
+        key = (args, tuple(sorted(kwargs.items())))
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats.add(dns_cache_hits=1)
+                return list(entry[1])
+        # Not locked, lookups of other hosts don't wait for this one
+        result = self._resolve(*args, **kwargs)
+        end = self._clock()
+        self._stats.add(dns_lookups=1, dns_seconds=end - now)
+        with self._lock:
+            self._entries[key] = (end + self.ttl, list(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return result
+
+
+class TlsSessionCache:
+    """Latest TLS session per context and host.
+
+    The session is read from the last socket when the next one is created:
+    TLS 1.3 session tickets only arrive after the handshake.
+    """
+
+    def __init__(self, max_size=TLS_SESSION_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # context -> {host: [weak reference to socket, session]}
+        self._contexts = weakref.WeakKeyDictionary()
+
+    def get(self, context, host):
+        with self._lock:
+            entry = self._contexts.get(context, {}).get(host)
+            if entry is None:
+                return None
+            sock = entry[0]()
+            if sock is not None:
+                try:
+                    session = sock.session
+                except (OSError, ValueError):
+                    session = None
+                if session is not None:
+                    entry[1] = session
+            return entry[1]
+
+    def put(self, context, host, sock):
+        with self._lock:
+            hosts = self._contexts.setdefault(
+                context, collections.OrderedDict())
+            hosts[host] = [weakref.ref(sock), sock.session]
+            hosts.move_to_end(host)
+            while len(hosts) > self.max_size:
+                hosts.popitem(last=False)
+
+
+stats = ConnectionStats()
+_dns_cache = None
+_tls_sessions = TlsSessionCache()
+_ssl_contexts = {}  # settings -> shared `ssl.SSLContext`
+_ssl_contexts_lock = threading.Lock()
+_installed = False
+
+# Private attributes of yt-dlp that the patches depend on. A patch is
+# skipped when they are missing (e.g. renamed by an update of yt-dlp), the
+# tests fail on them.
+REQUEST_HANDLER_METHODS = ['_make_sslcontext']
+REQUEST_HANDLER_ATTRIBUTES = ['verify', 'legacy_ssl_support',
+                              'prefer_system_certs', '_client_cert',
+                              'source_address']
+REQUESTS_HANDLER_METHODS = ['_create_instance']
+REQUESTS_ADAPTER_ATTRIBUTES = ['_pm_args', 'poolmanager']
+
+
+def _missing(obj, names):
+    return [name for name in names if not hasattr(obj, name)]
+
+
+def _patch_socket():
+    global _dns_cache
+    _dns_cache = DnsCache(socket.getaddrinfo, stats=stats)
+    socket.getaddrinfo = _dns_cache.getaddrinfo
+    connect = socket.socket.connect
+
+    def patched_connect(self, address):
+        if self.family not in (socket.AF_INET, socket.AF_INET6) or (
+                self.gettimeout() == 0):
+            return connect(self, address)
+        start = time.monotonic()
+        connect(self, address)
+        stats.add(connections=1, connect_seconds=time.monotonic() - start)
+    socket.socket.connect = patched_connect
+
+
+def _patch_ssl():
+    wrap_socket = ssl.SSLContext.wrap_socket
+
+    def patched_wrap_socket(self, sock, server_side=False, *args,
+                            server_hostname=None, session=None, **kwargs):
+        if server_side or not server_hostname:
+            return wrap_socket(self, sock, server_side, *args,
+                               server_hostname=server_hostname,
+                               session=session, **kwargs)
+        if session is None:
+            # Cached by context, sessions of other contexts are rejected
+            session = _tls_sessions.get(self, server_hostname)
+        start = time.monotonic()
+        ssl_sock = wrap_socket(self, sock, server_side, *args,
+                               server_hostname=server_hostname,
+                               session=session, **kwargs)
+        stats.add(tls_handshakes=1, tls_resumed=int(ssl_sock.session_reused),
+                  tls_seconds=time.monotonic() - start)
+        _tls_sessions.put(self, server_hostname, ssl_sock)
+        return ssl_sock
+    ssl.SSLContext.wrap_socket = patched_wrap_socket
+
+
+def _share_ssl_contexts():
+    """Every request handler creates a new `ssl.SSLContext` (and loads the
+       CA certificates again). TLS sessions can only be resumed with the
+       context that created them."""
+    from yt_dlp.networking.common import RequestHandler
+
+    if _missing(RequestHandler, REQUEST_HANDLER_METHODS):
+        return
+    make_sslcontext = RequestHandler._make_sslcontext
+
+    def patched_make_sslcontext(self, legacy_ssl_support=None, *args,
+                                **kwargs):
+        try:
+            if args or kwargs:
+                raise TypeError('unknown arguments')
+            if legacy_ssl_support is None:
+                legacy_ssl_support = self.legacy_ssl_support
+            key = (self.verify, legacy_ssl_support, self.prefer_system_certs,
+                   tuple(sorted(self._client_cert.items())))
+            hash(key)
+        except (AttributeError, TypeError):
+            # Unknown version of yt-dlp, not shared
+            return make_sslcontext(self, legacy_ssl_support, *args, **kwargs)
+        with _ssl_contexts_lock:
+            context = _ssl_contexts.get(key)
+            if context is None:
+                context = _ssl_contexts[key] = make_sslcontext(
+                    self, legacy_ssl_support)
+        return context
+    RequestHandler._make_sslcontext = patched_make_sslcontext
+
+
+def _share_connection_pools():
+    """Keep-alive connections of the requests handler outlive the
+       `YoutubeDL` that opened them."""
+    try:
+        from yt_dlp.networking import _requests
+    except ImportError:
+        # requests or urllib3 is missing, yt-dlp uses urllib without
+        # keep-alive
+        return
+    import urllib3
+
+    class SharedPoolManager(urllib3.PoolManager):
+        def clear(self):
+            # Called when a `YoutubeDL` is closed
+            pass
+
+    pool_managers = {}  # settings -> `SharedPoolManager`
+    lock = threading.Lock()
+    if _missing(getattr(_requests, 'RequestsRH', None),
+                REQUESTS_HANDLER_METHODS):
+        return
+    create_instance = _requests.RequestsRH._create_instance
+
+    def patched_create_instance(self, *args, **kwargs):
+        session = create_instance(self, *args, **kwargs)
+        try:
+            adapter = session.get_adapter('https://')
+            if _missing(adapter, REQUESTS_ADAPTER_ATTRIBUTES):
+                return session
+            # Contexts are shared by settings (see `_share_ssl_contexts`)
+            key = (adapter._pm_args.get('ssl_context'), self.source_address)
+            with lock:
+                pool_manager = pool_managers.get(key)
+                if pool_manager is None:
+                    pool_manager = pool_managers[key] = SharedPoolManager(
+                        num_pools=POOL_COUNT, maxsize=POOL_MAXSIZE,
+                        **adapter._pm_args)
+        except (AttributeError, KeyError, TypeError):
+            # Unknown version of yt-dlp or requests, not shared
+            return session
+        adapter.poolmanager.clear()
+        adapter.poolmanager = pool_manager
+        return session
+    _requests.RequestsRH._create_instance = patched_create_instance
+
+
+def install_connection_reuse():
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    _patch_socket()
+    _patch_ssl()
+    _share_ssl_contexts()
+    _share_connection_pools()
@@ -0,0 +1,169 @@
+"""Encrypted cookies and credentials of hosts, kept across jobs.
+
+Every job starts with the cookies (e.g. of a login) and, if the user
+allows it, the account credentials that a previous job collected for the
+same host, sites don't ask for the login again.
+
+The files are encrypted with AES-GCM. The key isn't stored with them, the
+GUI keeps it in the Secret Service (see
+`video_downloader.app.session_keyring`) and hands it to the worker.
+Requires pycryptodomex, `open_default_store` returns None without it.
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import shutil
+import tempfile
+import time
+import typing
+
+try:
+    from Cryptodome.Cipher import AES
+except ImportError:
+    AES = None
+
+# Sessions that weren't used for this long (in seconds) are discarded
+SESSION_MAX_AGE = 90 * 24 * 60 * 60
+KEY_SIZE = 32
+NONCE_SIZE = 12
+TAG_SIZE = 16
+FORMAT_VERSION = 1
+
+
+class Session(typing.NamedTuple):
+    # Cookie file in the Netscape format (see `YoutubeDL` option `cookiefile`)
+    cookies: str = ''
+    username: typing.Optional[str] = None
+    password: typing.Optional[str] = None
+
+    def is_empty(self):
+        if self.username is not None:
+            return False
+        # Cookies of the HttpOnly flag are prefixed like comments
+        return not any(
+            line.strip() and (not line.startswith('#') or
+                              line.startswith('#HttpOnly_'))
+            for line in self.cookies.splitlines())
+
+
+def session_host(url_host):
+    """Key of the session of URLs with the hostname `url_host` or None."""
+    if not url_host:
+        return None
+    host = url_host.lower().rstrip('.')
+    if host.startswith('www.'):
+        host = host[len('www.'):]
+    return host
+
+
+def get_default_directory():
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(
+        os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(data_home, 'video-downloader', 'sessions')
+
+
+def _write_atomic(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                     prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class SessionStore:
+    """Sessions by host (see `session_host`) in `directory`, encrypted
+       with `key` (`KEY_SIZE` bytes).
+
+    The host is authenticated as associated data, files can't be swapped
+    between hosts. Files that can't be decrypted (e.g. truncated or written
+    with a lost key) are deleted. Writes are atomic, when jobs of the same
+    host run in parallel the last one wins.
+    """
+
+    def __init__(self, directory, key, max_age=SESSION_MAX_AGE,
+                 clock=time.time):
+        assert AES is not None, 'pycryptodomex is missing'
+        if len(key) != KEY_SIZE:
+            raise ValueError('invalid key size: %d' % len(key))
+        self.directory = directory
+        self.max_age = max_age
+        self._clock = clock
+        self._key = key
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def _get_path(self, host):
+        # Keyed, the visited hosts can't be guessed from the file names
+        digest = hashlib.blake2b(host.encode(), key=self._key,
+                                 digest_size=16).hexdigest()
+        return os.path.join(self.directory, '%s.session' % digest)
+
+    def load(self, host):
+        """Returns the `Session` of `host` or None."""
+        path = self._get_path(host)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        session = None
+        if len(data) >= NONCE_SIZE + TAG_SIZE:
+            nonce, ciphertext, tag = (data[:NONCE_SIZE],
+                                      data[NONCE_SIZE:-TAG_SIZE],
+                                      data[-TAG_SIZE:])
+            try:
+                cipher = AES.new(self._key, AES.MODE_GCM, nonce=nonce,
+                                 mac_len=TAG_SIZE)
+                cipher.update(host.encode())
+                content = json.loads(
+                    cipher.decrypt_and_verify(ciphertext, tag))
+                saved = content.get('saved')
+                if (content.get('version') == FORMAT_VERSION and
+                        isinstance(saved, (int, float)) and
+                        self._clock() - saved <= self.max_age):
+                    session = Session(*content['session'])
+            except (ValueError, TypeError, KeyError, AttributeError):
+                pass
+        if session is None:
+            # Truncated, of another key or host, or expired
+            self.forget(host)
+        return session
+
+    def save(self, host, session):
+        """Empty sessions are removed instead."""
+        if session.is_empty():
+            self.forget(host)
+            return
+        content = json.dumps({'version': FORMAT_VERSION,
+                              'saved': self._clock(),
+                              'session': list(session)})
+        nonce = secrets.token_bytes(NONCE_SIZE)
+        cipher = AES.new(self._key, AES.MODE_GCM, nonce=nonce,
+                         mac_len=TAG_SIZE)
+        cipher.update(host.encode())
+        ciphertext, tag = cipher.encrypt_and_digest(content.encode())
+        _write_atomic(self._get_path(host), nonce + ciphertext + tag)
+
+    def forget(self, host):
+        try:
+            os.unlink(self._get_path(host))
+        except FileNotFoundError:
+            pass
+
+
+def open_default_store(key):
+    """`SessionStore` in the data directory of the user or None if
+       pycryptodomex or the key is missing."""
+    if AES is None or not key:
+        return None
+    return SessionStore(get_default_directory(), key)
+
+
+def forget_all(directory=None):
+    """Delete the sessions of all hosts."""
+    shutil.rmtree(directory or get_default_directory(), ignore_errors=True)
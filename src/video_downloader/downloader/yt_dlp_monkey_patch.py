@@ -21,6 +21,9 @@ import subprocess
 import sys
 import threading
 
+from video_downloader.downloader.network import install_connection_reuse
+from video_downloader.util.trace import monotonic_us, process_tracer
+
 
 def _tee(fin, *fouts):
     '''Read from `fin` and write to all `fouts`'''
@@ -34,6 +37,39 @@ def _tee(fin, *fouts):
 
 class PatchedPopen(subprocess.Popen):
 
+    def __init__(self, args, *pargs, **kwargs):
+        self._trace_start = monotonic_us()
+        self._trace_recorded = False
+        super().__init__(args, *pargs, **kwargs)
+
+    def _record_trace_span(self):
+        '''Record the lifetime of the process in the trace (ffmpeg etc.)'''
+        if self._trace_recorded or self.returncode is None:
+            return
+        self._trace_recorded = True
+        tracer = process_tracer('worker')
+        if not tracer.enabled:
+            return
+        args = [self.args] if isinstance(self.args, (str, bytes)) else (
+            self.args)
+        name = os.path.basename(os.fsdecode(args[0]))
+        tracer.name_process(self.pid, name)
+        tracer.record(name, self._trace_start, monotonic_us(),
+                      category='subprocess', pid=self.pid,
+                      returncode=self.returncode)
+
+    def wait(self, *args, **kwargs):
+        try:
+            return super().wait(*args, **kwargs)
+        finally:
+            self._record_trace_span()
+
+    def poll(self):
+        try:
+            return super().poll()
+        finally:
+            self._record_trace_span()
+
     def communicate(self, *args, **kwargs):
         '''When processe's stderr gets redirected by `subprocess.PIPE`
            duplicate it to `sys.stderr`
@@ -78,3 +114,5 @@ def install_monkey_patches():
     # getcwd is broken inside of xdg-desktop-portal FUSE for documents
     if os.name == 'posix':
         patch_getcwd()
+    # Every `YoutubeDL` would resolve hosts and connect to them again
+    install_connection_reuse()
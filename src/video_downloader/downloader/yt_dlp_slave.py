@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with Video Downloader.  If not, see <http://www.gnu.org/licenses/>.
 
+import base64
 import contextlib
 import glob
 import json
@@ -25,6 +26,7 @@ import sys
 import tempfile
 import time
 import traceback
+import urllib.parse
 
 import yt_dlp
 from yt_dlp.postprocessor.common import PostProcessor
@@ -32,12 +34,33 @@ from yt_dlp.postprocessor.ffmpeg import (FFmpegPostProcessor,
                                          FFmpegPostProcessorError)
 from yt_dlp.utils import dfxp2srt, sanitize_filename
 
+from video_downloader.downloader import network, sessions
+from video_downloader.util.masking import SecretMasker
+from video_downloader.util.metrics import classify_error
 from video_downloader.util.path import encode_filesystem_path
+from video_downloader.util.trace import process_tracer
 
 # File names are typically limited to 255 bytes
 MAX_OUTPUT_TITLE_LENGTH = 200
 MAX_ID_LENGTH = 200
 MAX_THUMBNAIL_RESOLUTION = 1024
+# Thumbnail shown by the GUI (see `DOWNLOAD_IMAGE_SIZE` and `MAX_ASPECT_RATIO`
+# in `video_downloader.ui.download_page`)
+PREVIEW_THUMBNAIL_HEIGHT = 128
+PREVIEW_THUMBNAIL_MAX_WIDTH = 306
+# Options with values that must not appear in the log
+SECRET_OPTIONS = ['username', 'password', 'videopassword', 'apikey',
+                  'access_token']
+# Phase names for post processors (by `PostProcessor.pp_key`), others are
+# reported as "postprocess"
+POSTPROCESSOR_PHASES = {
+    'ThumbnailConverter': 'thumbnail',
+    'SubtitlesConverter': 'subtitles',
+}
+# Post processors that only collect information
+IGNORED_POSTPROCESSORS = ['GetFilepath', 'PlaylistEntry']
+# Retry messages of yt-dlp, e.g. "... Retrying fragment 3 (1/10)..."
+_RETRY_RE = re.compile(r'\bRetrying( fragments?\b)?[^(]*\(\d+/\d+\)')
 
 
 def log(format_string, *args):
@@ -57,6 +80,30 @@ def _short_filename(name, length):
     raise ValueError('can\'t shorten filename %r to %r bytes' % (name, length))
 
 
+def _select_automatic_captions(info, requested_langs):
+    """Return the automatic captions of `info` in `requested_langs` that
+       are not available as subtitles"""
+    automatic_captions = info.get('automatic_captions') or {}
+    skip_captions = {*(info.get('subtitles') or {})}
+    new_automatic_captions = {}
+    for lang, subs in automatic_captions.items():
+        if lang in skip_captions:
+            continue
+        for requested_lang in requested_langs:
+            if requested_lang == 'all' or requested_lang == lang:
+                break
+            # Translated subtitles
+            if (lang.startswith(requested_lang+'-')
+                    and requested_lang not in skip_captions
+                    and requested_lang not in automatic_captions):
+                skip_captions.add(requested_lang)
+                break
+        else:
+            continue
+        new_automatic_captions[lang] = subs
+    return new_automatic_captions
+
+
 def _convert_filepath(info, files_to_delete, filepath, new_ext, type_='conv'):
     prefix = '.%s.%s' % (type_, new_ext)
     files_to_delete.append(filepath)
@@ -65,7 +112,16 @@ def _convert_filepath(info, files_to_delete, filepath, new_ext, type_='conv'):
     return filepath + prefix
 
 
-class SubtitlesConverterPP(FFmpegPostProcessor):
+class ReusableFFmpegPostProcessor(FFmpegPostProcessor):
+    """Post processor that is added to multiple `YoutubeDL` objects"""
+
+    def add_progress_hook(self, ph):
+        # Every `YoutubeDL` object adds its hooks again
+        if ph not in self._progress_hooks:
+            super().add_progress_hook(ph)
+
+
+class SubtitlesConverterPP(ReusableFFmpegPostProcessor):
     """A more robust subtitles converter"""
 
     def run(self, info):
@@ -124,12 +180,25 @@ class SubtitlesConverterPP(FFmpegPostProcessor):
         return files_to_delete, info
 
 
-class ThumbnailConverterPP(FFmpegPostProcessor):
-    """Convert thumbnail to JPEG and if required decrease resolution"""
+class ThumbnailConverterPP(ReusableFFmpegPostProcessor):
+    """Convert thumbnail to JPEG and if required decrease resolution.
+
+    A small preview for the GUI is created by the same ffmpeg invocation
+    and passed to `thumbnail_callback`. Previews are written to
+    `preview_dir` (next to the thumbnail if None), they are not part of the
+    download."""
 
     def __init__(self, thumbnail_callback=None):
         super().__init__()
         self._thumbnail_callback = thumbnail_callback
+        self.preview_dir = None
+        self._preview_count = 0
+
+    def _preview_filepath(self, filepath):
+        if self.preview_dir is None:
+            return filepath + '.preview.jpg'
+        self._preview_count += 1
+        return os.path.join(self.preview_dir, '%d.jpg' % self._preview_count)
 
     def run(self, info):
         files_to_delete = []
@@ -149,35 +218,134 @@ class ThumbnailConverterPP(FFmpegPostProcessor):
             # Try to convert thumbnail with ffmpeg
             new_filepath = _convert_filepath(info, files_to_delete, filepath,
                                              'jpg')
+            outputs = [(new_filepath, MAX_THUMBNAIL_RESOLUTION,
+                        MAX_THUMBNAIL_RESOLUTION)]
+            if self._thumbnail_callback is not None:
+                preview_filepath = self._preview_filepath(new_filepath)
+                outputs.append((preview_filepath, PREVIEW_THUMBNAIL_MAX_WIDTH,
+                                PREVIEW_THUMBNAIL_HEIGHT))
             try:
                 # FFmpeg uses % pattern for image input and output files
                 self.real_run_ffmpeg(
                     # Disable pattern matching for input file
                     [(filepath, ['-f', 'image2', '-pattern_type', 'none'])],
-                    # Escape % for output file
-                    [(new_filepath.replace('%', '%%'), [
-                        '-vf', ('scale=\'min({0},iw):min({0},ih):'
+                    # Escape % for output files, the input is decoded once
+                    # and scaled separately for every output
+                    [(path.replace('%', '%%'), [
+                        '-vf', ('scale=\'min({},iw):min({},ih):'
                                 'force_original_aspect_ratio=decrease\''
-                                ).format(MAX_THUMBNAIL_RESOLUTION)])])
+                                ).format(width, height)])
+                     for path, width, height in outputs])
             except FFmpegPostProcessorError:
                 files_to_delete.append(new_filepath)
                 continue
             filepath = new_filepath
             new_thumbnails.insert(0, {**thumb, 'filepath': filepath})
             if self._thumbnail_callback is not None:
-                self._thumbnail_callback(os.path.abspath(filepath))
+                self._thumbnail_callback(os.path.abspath(preview_filepath))
         info['thumbnails'] = new_thumbnails
         return files_to_delete, info
 
 
+class PlaylistEntryPP(PostProcessor):
+    """Pass the info of every video to `callback` while the playlist is
+       still being extracted"""
+
+    def __init__(self, callback):
+        super().__init__()
+        self._callback = callback
+
+    def run(self, info):
+        # Same as the content of info.json files
+        self._callback(yt_dlp.YoutubeDL.sanitize_info(info, True))
+        return [], info
+
+
+class PlaylistEntry:
+    """Video waiting to be downloaded.
+
+    Only what's needed for scheduling is kept in memory. The info (with all
+    formats, thumbnails and subtitles) is spilled to `info_path` and loaded
+    again by yt-dlp when the download starts.
+    """
+
+    __slots__ = ('playlist_index', 'playlist_count', 'title', 'info_path')
+
+    def __init__(self, playlist_index, playlist_count, title, info_path):
+        self.playlist_index = playlist_index
+        self.playlist_count = playlist_count
+        self.title = title
+        self.info_path = info_path
+
+    @classmethod
+    def spill(cls, info, playlist_index, playlist_count, spill_dir):
+        info_path = os.path.join(spill_dir, '%d.info.json' % playlist_index)
+        with open(info_path, 'w', encoding='utf-8') as f:
+            # Faster than `json.dump`, which writes many small chunks
+            f.write(json.dumps(info))
+        return cls(playlist_index, playlist_count,
+                   info.get('title') or info.get('id') or 'video', info_path)
+
+
 class RetryException(BaseException):
     pass
 
 
 class YoutubeDLSlave:
+    def _phase_start(self, phase, playlist_index=None):
+        """Report the start of `phase` of the current playlist entry (or of
+           the whole job before the first entry). Nested calls for a phase
+           that is already running are ignored."""
+        if playlist_index is None:
+            playlist_index = self._playlist_index
+        key = (playlist_index, phase)
+        if key in self._running_phases:
+            return
+        self._running_phases[key] = self._tracer.start_span(
+            phase, 'phase', playlist_index=playlist_index)
+        self._handler.on_phase_start(playlist_index, phase, time.monotonic())
+
+    def _phase_end(self, phase, bytes_=-1, playlist_index=None):
+        if playlist_index is None:
+            playlist_index = self._playlist_index
+        key = (playlist_index, phase)
+        if key not in self._running_phases:
+            return
+        self._running_phases.pop(key).end(bytes=bytes_)
+        self._handler.on_phase_end(playlist_index, phase, time.monotonic(),
+                                   bytes_)
+
+    @contextlib.contextmanager
+    def _phase(self, phase, playlist_index=None):
+        self._phase_start(phase, playlist_index)
+        yield
+        # Not ended on exceptions (e.g. `SystemExit` from SIGTERM), the GUI
+        # might be waiting for this process to exit and won't answer
+        self._phase_end(phase, playlist_index=playlist_index)
+
+    def _on_postprocessor_progress(self, d):
+        key = d.get('postprocessor')
+        if key in IGNORED_POSTPROCESSORS:
+            return
+        phase = POSTPROCESSOR_PHASES.get(key, 'postprocess')
+        if d['status'] == 'started':
+            self._phase_start(phase)
+        elif d['status'] == 'finished':
+            filepath = (d.get('info_dict') or {}).get('filepath')
+            try:
+                bytes_ = os.path.getsize(filepath) if filepath else -1
+            except OSError:
+                bytes_ = -1
+            self._phase_end(phase, bytes_)
+
     def _on_progress(self, d):
         if d['status'] not in ['downloading', 'finished']:
             return
+        if d['status'] == 'downloading':
+            self._phase_start('download')
+        else:
+            self._phase_end('download', d.get('downloaded_bytes') or
+                            d.get('total_bytes') or -1)
         filename = d['filename']
         bytes_ = d.get('downloaded_bytes')
         if bytes_ is None:
@@ -245,6 +413,38 @@ class YoutubeDLSlave:
                         info_dicts.append(json.load(f))
         return info_dicts, self._skipped_count - saved_skipped_count
 
+    def _stream_playlist(self, url, callback):
+        '''Call `callback` with the info of every video available on URL.
+
+        Videos are passed on as soon as they are extracted, while the rest
+        of the playlist is still pending. Neither the entries nor their
+        info are kept, memory usage doesn't depend on the playlist size.
+        '''
+        def on_entry(info):
+            # Downloads have started, the playlist can't be retried
+            self._allow_authentication_request = False
+            callback(info)
+            # The download changes the working directory and deletes it
+            os.chdir(temp_dir)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            os.chdir(temp_dir)
+            while True:
+                ydl_opts = {**self.ydl_opts,
+                            'skip_download': True,
+                            'writesubtitles': False,
+                            'writeautomaticsub': False,
+                            'writethumbnail': False,
+                            'lazy_playlist': True,
+                            'extract_flat': 'discard_in_playlist'}
+                try:
+                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                        ydl.add_post_processor(PlaylistEntryPP(on_entry),
+                                               'before_dl')
+                        ydl.download([url])
+                except RetryException:
+                    continue
+                break
+
     def _load_video(self, dir_, info_path):
         class GetFilepathPP(PostProcessor):
             def run(self, info):
@@ -265,24 +465,30 @@ class YoutubeDLSlave:
             break
         return os.path.abspath(filepath)
 
+    def _update_secrets(self):
+        self._masker.set_secrets(
+            self.ydl_opts.get(key) for key in SECRET_OPTIONS)
+
     def _mask(self, msg):
         if not isinstance(msg, str):
             return msg
-        secrets = []
-        for key in ['username', 'password', 'videopassword', 'apikey', 'access_token']:
-            val = self.ydl_opts.get(key)
-            if val and isinstance(val, str) and len(val) > 3:
-                secrets.append(val)
-        
-        for secret in secrets:
-            msg = msg.replace(secret, '***')
-        return msg
+        return self._masker.mask(msg)
+
+    def _check_retry(self, msg):
+        if isinstance(msg, str) and 'Retrying' in msg:
+            match = _RETRY_RE.search(msg)
+            if match:
+                self._handler.on_retry(
+                    'fragment' if match.group(1) else 'request',
+                    classify_error(msg))
 
     def debug(self, msg):
         print(self._mask(msg), file=sys.stderr, flush=True)
+        self._check_retry(msg)
 
     def warning(self, msg):
         print(self._mask(msg), file=sys.stderr, flush=True)
+        self._check_retry(msg)
 
     def error(self, msg):
         msg = self._mask(msg)
@@ -302,7 +508,9 @@ class YoutubeDLSlave:
                 return
             self.ydl_opts['username'] = user
             self.ydl_opts['password'] = password
+            self._update_secrets()
             self._allow_authentication_request = False
+            self._handler.on_retry('authentication', 'authentication')
             raise RetryException(msg)
         if self._allow_authentication_request and '--video-password' in msg:
             if self._skip_authentication:
@@ -314,7 +522,9 @@ class YoutubeDLSlave:
                 self._skipped_count += 1
                 return
             self.ydl_opts['videopassword'] = password
+            self._update_secrets()
             self._allow_authentication_request = False
+            self._handler.on_retry('authentication', 'authentication')
             raise RetryException(msg)
         # Skip unavailable videos
         if 'Video unavailable.' in msg:
@@ -341,14 +551,30 @@ class YoutubeDLSlave:
 
     def __init__(self, handler):
         self._handler = handler
+        self._masker = SecretMasker(keywords=False)
         self._allow_authentication_request = True
         self._skip_authentication = False
         self._skipped_count = 0
+        # Host of the URL that the credentials in `ydl_opts` were given for
+        self._login_host = None
+        self._remember_credentials = (
+            self._handler.get_remember_credentials())
+        try:
+            self._sessions = sessions.open_default_store(
+                base64.b64decode(self._handler.get_session_key()))
+        except (OSError, ValueError) as e:
+            log('Session store unavailable: %s', e)
+            self._sessions = None
+        # Index of the current playlist entry, -1 before the first entry
+        self._playlist_index = -1
+        self._running_phases = {}  # (playlist index, phase) -> trace span
+        self._tracer = process_tracer('worker')
         self.ydl_opts = {
             'logger': self,
             'logtostderr': True,
             'no_color': True,
             'progress_hooks': [self._on_progress],
+            'postprocessor_hooks': [self._on_postprocessor_progress],
             'fixup': 'detect_or_warn',
             'ignoreerrors': True,  # handled via logger error callback
             'retries': 10,
@@ -364,9 +590,10 @@ class YoutubeDLSlave:
                 {'key': 'FFmpegMetadata'},
                 {'key': 'FFmpegEmbedSubtitle'},
                 {'key': 'XAttrMetadata'}]}
+        self._thumbnail_converter = ThumbnailConverterPP(
+            self._handler.on_download_thumbnail)
         self.extra_postprocessors = [
-            (ThumbnailConverterPP(self._handler.on_download_thumbnail),
-             'before_dl'),
+            (self._thumbnail_converter, 'before_dl'),
             (SubtitlesConverterPP(), 'before_dl')]
         mode = self._handler.get_mode()
         if mode == 'audio':
@@ -383,111 +610,216 @@ class YoutubeDLSlave:
                 'res~%d' % self._handler.get_resolution()]
             if self._handler.get_prefer_mpeg():
                 self.ydl_opts['format_sort'].append('+codec:avc:m4a')
-        url = self._handler.get_url()
+        urls = self._handler.get_urls()
         download_dir = os.path.abspath(self._handler.get_download_dir())
         requested_automatic_subtitles = set(
             self._handler.get_automatic_subtitles())
+        # Cookies (see `_session`) and the imported extractors are shared by
+        # all URLs
         with tempfile.TemporaryDirectory() as temp_dir:
             self.ydl_opts['cookiefile'] = os.path.join(temp_dir, 'cookies')
-            self.ydl_opts['playlistend'] = 2
-            # Test playlist
-            info_testplaylist, skipped_testplaylist = self._load_playlist(url)
+            self._spill_dir = os.path.join(temp_dir, 'entries')
+            os.mkdir(self._spill_dir)
+            # Previews must outlive the download directory of their video and
+            # the worker, the GUI loads them asynchronously
+            preview_dir = self._handler.get_preview_dir()
+            if not preview_dir:
+                preview_dir = os.path.join(temp_dir, 'previews')
+                os.mkdir(preview_dir)
+            self._thumbnail_converter.preview_dir = preview_dir
+            for i, url in enumerate(urls):
+                with self._session(url):
+                    self._download_url(url, download_dir, mode,
+                                       requested_automatic_subtitles,
+                                       last=i == len(urls) - 1)
+
+    @contextlib.contextmanager
+    def _session(self, url):
+        """Use the cookies and credentials of the host of `url` and keep
+           them in the session store for later jobs. Credentials only with
+           `get_remember_credentials`."""
+        # Credentials belong to the site they were entered for
+        host = urllib.parse.urlsplit(url).hostname
+        if host != self._login_host:
+            for key in ['username', 'password', 'videopassword']:
+                self.ydl_opts.pop(key, None)
+            self._login_host = host
+        session_host = sessions.session_host(host)
+        if self._sessions is None or session_host is None:
+            # Cookies are shared with the previous URLs of the job
+            yield
+            return
+        cookiefile = self.ydl_opts['cookiefile']
+        session = self._sessions.load(session_host) or sessions.Session()
+        if session.cookies:
+            with open(cookiefile, 'w', encoding='utf-8') as f:
+                f.write(session.cookies)
+        elif os.path.exists(cookiefile):
+            os.remove(cookiefile)
+        if (self._remember_credentials and session.username is not None and
+                'username' not in self.ydl_opts):
+            self.ydl_opts['username'] = session.username
+            self.ydl_opts['password'] = session.password
+            self._update_secrets()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            try:
+                with open(cookiefile, encoding='utf-8') as f:
+                    cookies = f.read()
+            except FileNotFoundError:
+                cookies = ''
+            # Credentials are kept when they worked, failed downloads might
+            # have been caused by them. Saving without them removes the
+            # ones kept before the user disallowed it.
+            if success and self._remember_credentials:
+                session = sessions.Session(
+                    cookies, self.ydl_opts.get('username'),
+                    self.ydl_opts.get('password'))
+            else:
+                session = sessions.Session(cookies)
+            try:
+                self._sessions.save(session_host, session)
+            except OSError as e:
+                log('Saving session failed: %s', e)
+
+    def _download_url(self, url, download_dir, mode,
+                      requested_automatic_subtitles, last):
+        """Download the video or playlist of `url`.
+
+        The entries of all URLs are numbered as one playlist, its size is
+        unknown until the `last` URL is extracted.
+        """
+        # Index of the first entry of this URL
+        offset = self._playlist_index + 1
+
+        def playlist_count(count):
+            return offset + count if last and count >= 0 else -1
+        self._allow_authentication_request = True
+        for key in ['writesubtitles', 'writeautomaticsub', 'writethumbnail',
+                    'noplaylist']:
+            self.ydl_opts.pop(key, None)
+        self.ydl_opts['playlistend'] = 2
+        # Test playlist
+        with self._phase('probe', playlist_index=-1):
+            info_testplaylist, skipped_testplaylist = (
+                self._load_playlist(url))
             self.ydl_opts['noplaylist'] = True
             if len(info_testplaylist) + skipped_testplaylist > 1:
-                info_noplaylist, skipped_noplaylist = self._load_playlist(url)
+                info_noplaylist, skipped_noplaylist = (
+                    self._load_playlist(url))
             else:
                 info_noplaylist = info_testplaylist
                 skipped_noplaylist = skipped_testplaylist
-            del self.ydl_opts['noplaylist']
-            del self.ydl_opts['playlistend']
-            if (len(info_testplaylist) + skipped_testplaylist >
-                    len(info_noplaylist) + skipped_noplaylist):
-                self.ydl_opts['noplaylist'] = (
-                    not self._handler.on_playlist_request())
-                if not self.ydl_opts['noplaylist']:
-                    info_playlist, _ = self._load_playlist(url)
-                else:
-                    info_playlist = info_noplaylist
-            elif len(info_testplaylist) + skipped_testplaylist > 1:
-                info_playlist, _ = self._load_playlist(url)
-            else:
-                info_playlist = info_testplaylist
-            # Download videos
+        self._report_connection_stats(-1)
+        del self.ydl_opts['noplaylist']
+        del self.ydl_opts['playlistend']
+        info_playlist = None  # Extracted while downloading
+        if (len(info_testplaylist) + skipped_testplaylist >
+                len(info_noplaylist) + skipped_noplaylist):
+            self.ydl_opts['noplaylist'] = (
+                not self._handler.on_playlist_request())
+            if self.ydl_opts['noplaylist']:
+                info_playlist = info_noplaylist
+        elif len(info_testplaylist) + skipped_testplaylist <= 1:
+            info_playlist = info_testplaylist
+        del info_testplaylist, info_noplaylist
+        # Download videos
+        self.ydl_opts['writesubtitles'] = True
+        self.ydl_opts['writeautomaticsub'] = True
+        self.ydl_opts['writethumbnail'] = True
+        if info_playlist is not None:
             self._allow_authentication_request = False
-            self.ydl_opts['writesubtitles'] = True
-            self.ydl_opts['writeautomaticsub'] = True
-            self.ydl_opts['writethumbnail'] = True
-            for i, info in enumerate(info_playlist):
-                title = info.get('title') or info.get('id') or 'video'
-                output_title = _short_filename(title, MAX_OUTPUT_TITLE_LENGTH)
-                self._handler.on_download_start(i, len(info_playlist), title)
-                # Lock download name to prevent other instances from
-                # writing to the same files
-                while not self._handler.on_download_lock(output_title):
-                    time.sleep(1)
-                automatic_captions = info.get('automatic_captions') or {}
-                skip_captions = {*(info.get('subtitles') or {})}
-                new_automatic_captions = {}
-                for lang, subs in automatic_captions.items():
-                    if lang in skip_captions:
-                        continue
-                    for requested_lang in requested_automatic_subtitles:
-                        if requested_lang == 'all' or requested_lang == lang:
-                            break
-                        # Translated subtitles
-                        if (lang.startswith(requested_lang+'-')
-                                and requested_lang not in skip_captions
-                                and requested_lang not in automatic_captions):
-                            skip_captions.add(requested_lang)
-                            break
-                    else:
-                        continue
-                    new_automatic_captions[lang] = subs
-                if automatic_captions != new_automatic_captions:
-                    info['_backup_automatic_captions'] = automatic_captions
-                    info['automatic_captions'] = new_automatic_captions
-                # Check if we already got the file
-                existing_filename = self._find_existing_download(
-                    download_dir, output_title, mode)
-                if existing_filename is not None:
-                    self._handler.on_download_finished(existing_filename)
-                    continue
-                # Download into separate directory because yt-dlp generates
-                # many temporary files
-                temp_download_dir = os.path.join(
-                    download_dir, output_title + '.part')
-                try:
-                    with contextlib.suppress(FileExistsError):
-                        os.mkdir(temp_download_dir)
-                except OSError as e:
-                    traceback.print_exc(file=sys.stderr)
-                    sys.stderr.flush()
-                    self._handler.on_error(
-                        'ERROR: Failed to create download folder: %s' % e)
-                    sys.exit(1)
-                if len(info.get('id', '')) > MAX_ID_LENGTH:
-                    info['id'] = info.get(
-                        'id', '')[:max(0, MAX_ID_LENGTH - 1)] + '…'
-                info_path = os.path.join(
-                    temp_download_dir,
-                    sanitize_filename((info.get('id') or '') + '.info.json'))
-                with open(info_path, 'w', encoding='utf-8') as f:
-                    json.dump(info, f)
-                temp_filepath = self._load_video(temp_download_dir, info_path)
-                _, filename_ext = os.path.splitext(temp_filepath)
-                filename = output_title + filename_ext
-                # Move finished download from download to target dir
-                try:
-                    os.replace(temp_filepath,
-                               os.path.join(download_dir, filename))
-                except OSError as e:
-                    traceback.print_exc(file=sys.stderr)
-                    sys.stderr.flush()
-                    self._handler.on_error((
-                        'ERROR: Falied to move finished download to '
-                        'download folder: %s') % e)
-                    sys.exit(1)
-                # Delete download directory
-                with contextlib.suppress(OSError):
-                    shutil.rmtree(temp_download_dir)
-                self._handler.on_download_finished(filename)
+            entries = [self._spill_entry(
+                info, offset + i, playlist_count(len(info_playlist)),
+                requested_automatic_subtitles)
+                for i, info in enumerate(info_playlist)]
+            del info_playlist
+            for entry in entries:
+                self._download_video(entry, download_dir, mode)
+        else:
+            def on_entry(info):
+                # Time between videos is spent extracting the playlist
+                self._phase_end('extract', playlist_index=-1)
+                count = info.get('playlist_count')
+                entry = self._spill_entry(
+                    info, self._playlist_index + 1,
+                    playlist_count(count if isinstance(count, int) else -1),
+                    requested_automatic_subtitles)
+                del info
+                self._download_video(entry, download_dir, mode)
+                self._phase_start('extract', playlist_index=-1)
+            with self._phase('extract', playlist_index=-1):
+                self._stream_playlist(url, on_entry)
+        self._report_connection_stats(-1)
+
+    def _report_connection_stats(self, playlist_index):
+        stats = network.stats.take()
+        if any(stats.values()):
+            self._handler.on_connection_stats(playlist_index, stats)
+
+    def _spill_entry(self, info, playlist_index, playlist_count,
+                     requested_automatic_subtitles):
+        info['automatic_captions'] = _select_automatic_captions(
+            info, requested_automatic_subtitles)
+        if len(info.get('id', '')) > MAX_ID_LENGTH:
+            info['id'] = info.get('id', '')[:max(0, MAX_ID_LENGTH - 1)] + '…'
+        return PlaylistEntry.spill(info, playlist_index, playlist_count,
+                                   self._spill_dir)
+
+    def _download_video(self, entry, download_dir, mode):
+        output_title = _short_filename(entry.title, MAX_OUTPUT_TITLE_LENGTH)
+        self._playlist_index = entry.playlist_index
+        self._handler.on_download_start(
+            entry.playlist_index, entry.playlist_count, entry.title)
+        # Lock download name to prevent other instances from writing to the
+        # same files
+        with self._phase('lock'):
+            while not self._handler.on_download_lock(output_title):
+                time.sleep(1)
+        # Check if we already got the file
+        existing_filename = self._find_existing_download(
+            download_dir, output_title, mode)
+        if existing_filename is not None:
+            os.remove(entry.info_path)
+            self._handler.on_download_finished(existing_filename)
+            return
+        # Download into separate directory because yt-dlp generates many
+        # temporary files
+        temp_download_dir = os.path.join(download_dir, output_title + '.part')
+        try:
+            with contextlib.suppress(FileExistsError):
+                os.mkdir(temp_download_dir)
+        except OSError as e:
+            traceback.print_exc(file=sys.stderr)
+            sys.stderr.flush()
+            self._handler.on_error(
+                'ERROR: Failed to create download folder: %s' % e)
+            sys.exit(1)
+        # Adjusted by the GUI to the throughput of all downloads
+        self.ydl_opts['concurrent_fragment_downloads'] = (
+            self._handler.get_concurrent_fragments())
+        temp_filepath = self._load_video(temp_download_dir, entry.info_path)
+        os.remove(entry.info_path)
+        _, filename_ext = os.path.splitext(temp_filepath)
+        filename = output_title + filename_ext
+        # Move finished download from download to target dir
+        self._phase_start('move')
+        try:
+            bytes_ = os.path.getsize(temp_filepath)
+            os.replace(temp_filepath, os.path.join(download_dir, filename))
+        except OSError as e:
+            traceback.print_exc(file=sys.stderr)
+            sys.stderr.flush()
+            self._handler.on_error((
+                'ERROR: Falied to move finished download to '
+                'download folder: %s') % e)
+            sys.exit(1)
+        self._phase_end('move', bytes_)
+        # Delete download directory
+        with contextlib.suppress(OSError):
+            shutil.rmtree(temp_download_dir)
+        self._report_connection_stats(entry.playlist_index)
+        self._handler.on_download_finished(filename)
@@ -9,12 +9,12 @@ import os
 import uuid
 from typing import Optional
 
-from gi.repository import Adw, GdkPixbuf, Gio, GLib, Gtk
+from gi.repository import Adw, Gio, GLib, Gtk, Pango
 
 from video_downloader.app.model import HandlerInterface, Model, check_download_dir
 from video_downloader.ui.authentication import LoginDialog, PasswordDialog
 from video_downloader.ui.playlist import PlaylistDialog
-from video_downloader.util import gobject_log
+from video_downloader.util import gobject_log, list_model_strings
 from video_downloader.util.connection import (
     CloseStack,
     PropertyBinding,
@@ -24,6 +24,7 @@ from video_downloader.util.connection import (
 )
 from video_downloader.util.path import expand_path, open_in_file_manager
 from video_downloader.util.response import AsyncResponse
+from video_downloader.util.thumbnail import ThumbnailLoader
 
 DOWNLOAD_IMAGE_SIZE = 128
 MAX_ASPECT_RATIO = 2.39
@@ -63,10 +64,27 @@ class DownloadPage(Gtk.Box, HandlerInterface):
         self._window = window
         self._window_group = window_group
         self._cs = CloseStack()
-        self.model = gobject_log(Model(self))
+        self.model = gobject_log(
+            Model(
+                self, application.download_manager, application.session_keyring
+            )
+        )
+        # Off unless the user allowed it in the menu
+        application.settings.bind(
+            "remember-credentials",
+            self.model,
+            "remember-credentials",
+            Gio.SettingsBindFlags.GET,
+        )
         self._cs.add_close_callback(self.model.destroy)
         self._notification_uuid = str(uuid.uuid4())
         self._tab_page: Optional[Adw.TabPage] = None
+        self._thumbnail_loader = self._cs.push(
+            ThumbnailLoader(
+                math.ceil(DOWNLOAD_IMAGE_SIZE * MAX_ASPECT_RATIO),
+                DOWNLOAD_IMAGE_SIZE,
+            )
+        )
 
         # expose model actions under the "session" prefix
         self.insert_action_group("session", self.model.actions)
@@ -185,25 +203,25 @@ class DownloadPage(Gtk.Box, HandlerInterface):
         update_download_msg_rate_limited = self._cs.push(
             RateLimit(self._update_download_msg, 1)
         )
-        for name in [
-            "download-bytes",
-            "download-bytes-total",
-            "download-speed",
-            "download-eta",
-        ]:
-            self._cs.push(
-                SignalConnection(
-                    self.model,
-                    "notify::" + name,
-                    update_download_msg_rate_limited,
-                    no_args=True,
-                )
-            )
+
         self._cs.push(
             PropertyBinding(
                 self.model,
-                "download-progress",
-                func_a_to_b=lambda _: self._update_download_progress(),
+                "download-queued",
+                func_a_to_b=lambda _: self._update_download_msg(),
+            )
+        )
+
+        def on_progress_changed():
+            self._update_download_progress()
+            update_download_msg_rate_limited()
+
+        self._cs.push(
+            SignalConnection(
+                self.model,
+                "progress-changed",
+                on_progress_changed,
+                no_args=True,
             )
         )
         self._cs.push(
@@ -245,39 +263,28 @@ class DownloadPage(Gtk.Box, HandlerInterface):
                 func_a_to_b=lambda b: b or self._clean_thumbnails(),
             )
         )
-        self._cs.push(
-            PropertyBinding(
-                self.model,
-                "download-titles",
-                self.finished_download_titles_wdg,
-                "label",
-                func_a_to_b=lambda titles: " | ".join(titles or []),
+        # Virtualized lists, rows are only created for visible items and
+        # appended items don't rebuild the existing rows
+        self.finished_download_titles_wdg.set_factory(
+            self._create_list_factory(
+                self._setup_title_row, self._bind_title_row
             )
         )
-        self._cs.push(
-            PropertyBinding(
-                self.model,
-                "finished-download-filenames",
-                self.success_detail_wdg,
-                "label",
-                func_a_to_b=lambda filenames: "\n".join(
-                    (
-                        f'<span baseline_shift="{-22 * 1024}">'
-                        f'<a href="{s}">{s}</a>'
-                        f"</span>"
-                    )
-                    for s in map(GLib.markup_escape_text, filenames or [])
-                ),
+        self.finished_download_titles_wdg.set_model(
+            Gtk.NoSelection.new(self.model.download_titles)
+        )
+        # Connections of the rows that exist, by list item
+        self._filename_row_connections = {}
+        self._cs.add_close_callback(self._close_filename_row_connections)
+        self.success_detail_wdg.set_factory(
+            self._create_list_factory(
+                self._setup_filename_row,
+                self._bind_filename_row,
+                self._teardown_filename_row,
             )
         )
-        self._cs.push(
-            SignalConnection(
-                self.success_detail_wdg,
-                "activate_link",
-                lambda sender, filename: open_in_file_manager(
-                    self.model.finished_download_dir, [filename]
-                ),
-            )
+        self.success_detail_wdg.set_model(
+            Gtk.NoSelection.new(self.model.finished_download_filenames)
         )
         self._cs.push(
             SignalConnection(
@@ -325,7 +332,7 @@ class DownloadPage(Gtk.Box, HandlerInterface):
     # Internal helpers -----------------------------------------------------------
 
     def _update_download_progress(self):
-        progress = self.model.download_progress
+        progress = self.model.progress.progress
         if progress < 0:
             self.download_progress_wdg.pulse()
         else:
@@ -337,9 +344,16 @@ class DownloadPage(Gtk.Box, HandlerInterface):
         s = N_("Downloading")
         if playlist_count > 1:
             s += " (" + N_("{} of {}").format(playlist_index + 1, playlist_count) + ")"
+        elif playlist_count < 0:
+            # Size of the playlist is unknown while it's being extracted
+            s += " (" + N_("{} of {}").format(playlist_index + 1, "…") + ")"
         self.download_page_title_wdg.set_text(s)
 
     def _update_download_msg(self):
+        if self.model.download_queued:
+            self.download_info_wdg.set_text(N_("Waiting for other downloads…"))
+            return
+
         def filesize_fmt(num, suffix="B"):
             for unit in ["", "k", "M", "G", "T", "P", "E", "Z", "Y"]:
                 if abs(num) < 1000:
@@ -347,10 +361,11 @@ class DownloadPage(Gtk.Box, HandlerInterface):
                 num /= 1000
             return locale.format_string("%.1f\u00A0%s%s", (num, unit, suffix))
 
-        bytes_ = self.model.download_bytes
-        bytes_total = self.model.download_bytes_total
-        speed = self.model.download_speed
-        eta = self.model.download_eta
+        progress = self.model.progress
+        bytes_ = progress.bytes_
+        bytes_total = progress.bytes_total
+        speed = progress.speed
+        eta = progress.eta
         eta_h = eta // 60 // 60
         eta_m = eta // 60 % 60
         eta_s = eta % 60
@@ -372,19 +387,17 @@ class DownloadPage(Gtk.Box, HandlerInterface):
         )
 
     def _add_thumbnail(self, thumbnail):
-        try:
-            pixbuf = gobject_log(
-                GdkPixbuf.Pixbuf.new_from_file_at_size(
-                    thumbnail,
-                    math.ceil(DOWNLOAD_IMAGE_SIZE * MAX_ASPECT_RATIO),
-                    DOWNLOAD_IMAGE_SIZE,
-                )
-            )
-        except GLib.Error:
+        # Previews are owned by the model, they are only needed once
+        self._thumbnail_loader.load(
+            thumbnail, self._show_thumbnail, delete=True
+        )
+
+    def _show_thumbnail(self, texture):
+        if texture is None:
             img_wdg = gobject_log(Gtk.Image.new_from_icon_name("video-x-generic"))
             img_wdg.set_pixel_size(DOWNLOAD_IMAGE_SIZE)
         else:
-            img_wdg = gobject_log(Gtk.Picture.new_for_pixbuf(pixbuf))
+            img_wdg = gobject_log(Gtk.Picture.new_for_paintable(texture))
         img_wdg.set_size_request(-1, DOWNLOAD_IMAGE_SIZE)
         self.download_images_wdg.add_child(img_wdg)
         self.download_images_wdg.set_visible_child(img_wdg)
@@ -396,6 +409,54 @@ class DownloadPage(Gtk.Box, HandlerInterface):
             if child_wdg is not visible_child_wdg:
                 self.download_images_wdg.remove(child_wdg)
 
+    def _create_list_factory(self, setup, bind, teardown=None):
+        factory = Gtk.SignalListItemFactory()
+        self._cs.push(SignalConnection(factory, "setup", setup))
+        self._cs.push(SignalConnection(factory, "bind", bind))
+        if teardown is not None:
+            self._cs.push(SignalConnection(factory, "teardown", teardown))
+        return factory
+
+    def _setup_title_row(self, factory, list_item):
+        list_item.set_child(Gtk.Label(ellipsize=Pango.EllipsizeMode.MIDDLE))
+
+    def _bind_title_row(self, factory, list_item):
+        list_item.get_child().set_label(list_item.get_item().get_string())
+
+    def _setup_filename_row(self, factory, list_item):
+        label_wdg = Gtk.Label(
+            selectable=True,
+            xalign=0,
+            wrap=True,
+            wrap_mode=Pango.WrapMode.WORD_CHAR,
+        )
+        label_wdg.add_css_class("link")
+        self._filename_row_connections[list_item] = SignalConnection(
+            label_wdg, "activate_link", self._on_filename_activated
+        )
+        list_item.set_child(label_wdg)
+
+    def _teardown_filename_row(self, factory, list_item):
+        connection = self._filename_row_connections.pop(list_item, None)
+        if connection is not None:
+            connection.close()
+
+    def _close_filename_row_connections(self):
+        while self._filename_row_connections:
+            self._filename_row_connections.popitem()[1].close()
+
+    def _on_filename_activated(self, label_wdg, filename):
+        # Returns immediately, the file manager is opened asynchronously
+        open_in_file_manager(self.model.finished_download_dir, [filename])
+        # Handled, GTK must not open the file name as URI
+        return True
+
+    def _bind_filename_row(self, factory, list_item):
+        filename = GLib.markup_escape_text(list_item.get_item().get_string())
+        list_item.get_child().set_markup(
+            f'<a href="{filename}">{filename}</a>'
+        )
+
     def _update_finished_download_dir_wdg_tooltip(self, download_dir):
         if download_dir:
             home_dir = os.path.expanduser("~")
@@ -440,8 +501,9 @@ class DownloadPage(Gtk.Box, HandlerInterface):
             )
         elif state == "success":
             notification.set_title(N_("Download finished"))
-            if self.model.download_titles:
-                notification.set_body(" | ".join(self.model.download_titles))
+            titles = list_model_strings(self.model.download_titles)
+            if titles:
+                notification.set_body(" | ".join(titles))
             notification.set_default_action(
                 "app.notification-success--" + self._notification_uuid
             )
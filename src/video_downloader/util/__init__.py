@@ -38,6 +38,18 @@ def g_log(domain, log_level, format_string, *args):
     GLib.log_variant(domain, log_level, fields)
 
 
+def split_urls(text):
+    """URLs in `text`, separated by whitespace (e.g. pasted lines)."""
+    return text.split()
+
+
+def list_model_strings(list_model):
+    """Return the strings of a list model of items with `get_string`
+       (e.g. `Gtk.StringList` or the lists of `Model`)."""
+    return [list_model.get_item(i).get_string()
+            for i in range(list_model.get_n_items())]
+
+
 def languages_from_locale():
     locale_languages = []
     for envar in ['LANGUAGE', 'LC_ALL', 'LC_MESSAGES', 'LANG']:
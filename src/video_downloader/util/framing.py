@@ -0,0 +1,93 @@
+"""Split byte streams from pipes into lines."""
+
+import re
+
+# Same line endings as `bytes.splitlines` for ASCII, but
+# `b'abc\n'` is `[b'abc', b'']` like with `re.split`
+_LINE_END_RE = re.compile(rb'\r\n|\r|\n')
+
+
+class LineReader:
+    """Incrementally split a byte stream at ``\\r\\n``, ``\\r`` and ``\\n``.
+
+    Only the bytes passed to `feed` are scanned, the unterminated rest of
+    the stream is kept in a `bytearray`. ``\\r\\n`` split between two reads
+    is one line ending. The result is the same as splitting the whole
+    stream with `re.split`, independent of how it was read.
+
+    Lines longer than `max_line_size` bytes are not buffered beyond that
+    size. With `truncate` they are cut to `max_line_size`, otherwise they
+    are dropped and counted in `dropped_lines`.
+    """
+
+    def __init__(self, max_line_size=None, truncate=False):
+        self.max_line_size = max_line_size
+        self.truncate = truncate
+        self.dropped_lines = 0
+        self._buffer = bytearray()
+        self._overflow = False
+        self._skip_lf = False
+
+    @property
+    def pending(self):
+        """The buffered start of an unterminated line."""
+        return bytes(self._buffer)
+
+    def feed(self, data):
+        """Return the lines completed by `data` (without line endings)."""
+        if self._skip_lf and data:
+            self._skip_lf = False
+            if data[0] == ord('\n'):
+                data = data[1:]
+        if not data:
+            return []
+        # Only the new data is split, this stays linear with huge lines
+        *lines, rest = _LINE_END_RE.split(data)
+        if lines:
+            if self._buffer or self._overflow:
+                self._append(lines[0])
+                first = []
+                self._end_line(first)
+                lines[0:1] = first
+            if (self.max_line_size is not None and lines and
+                    max(map(len, lines)) > self.max_line_size):
+                lines = self._limit(lines)
+            self._skip_lf = data[-1] == ord('\r')
+        self._append(rest)
+        return lines
+
+    def flush(self):
+        """End the stream, return the unterminated last line (if any)."""
+        lines = []
+        if self._buffer or self._overflow:
+            self._end_line(lines)
+        self._skip_lf = False
+        return lines
+
+    def _append(self, data):
+        if self._overflow or not data:
+            return
+        if (self.max_line_size is not None and
+                len(self._buffer) + len(data) > self.max_line_size):
+            data = data[:self.max_line_size - len(self._buffer)]
+            self._overflow = True
+        self._buffer += data
+
+    def _end_line(self, lines):
+        if not self._overflow or self.truncate:
+            lines.append(bytes(self._buffer))
+        else:
+            self.dropped_lines += 1
+        self._buffer.clear()
+        self._overflow = False
+
+    def _limit(self, lines):
+        limited = []
+        for line in lines:
+            if len(line) <= self.max_line_size:
+                limited.append(line)
+            elif self.truncate:
+                limited.append(line[:self.max_line_size])
+            else:
+                self.dropped_lines += 1
+        return limited
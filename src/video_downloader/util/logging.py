@@ -1,17 +1,132 @@
 import logging
 import os
+import queue
 import sys
+import threading
 from gi.repository import GLib
 
+from video_downloader.util.masking import SecretMasker
+
+# Rotate session.log when it grows beyond this size (in bytes)
+MAX_LOG_FILE_SIZE = 4 * 1024 * 1024
+# Number of rotated files kept next to session.log (session.log.1, ...)
+LOG_FILE_BACKUP_COUNT = 2
+# Messages that can be pending before new messages get dropped
+LOG_QUEUE_SIZE = 10000
+
+
+class AsyncFileSink:
+    """Append lines to a file from a background thread.
+
+    ``write`` never blocks: lines are put into a bounded queue and a worker
+    thread writes everything pending in one batch, followed by a single
+    flush. The file is kept open and rotated when it exceeds ``max_bytes``.
+    When the queue is full, lines are dropped and the number of dropped lines
+    is written to the file once the worker catches up.
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, path, max_bytes=MAX_LOG_FILE_SIZE,
+                 backup_count=LOG_FILE_BACKUP_COUNT,
+                 queue_size=LOG_QUEUE_SIZE):
+        self.path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._queue = queue.Queue(queue_size)
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name='log-file-sink', daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+
+    def close(self):
+        """Write all pending lines and stop the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._CLOSE)
+        self._thread.join()
+
+    def _take_dropped(self):
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        return dropped
+
+    def _rotate(self, f):
+        """Returns the open file to continue with, `f` when the rotation
+           fails."""
+        try:
+            # The open file is renamed, it's only closed when the new one
+            # is open
+            for i in range(self._backup_count - 1, 0, -1):
+                src = '%s.%d' % (self.path, i)
+                if os.path.exists(src):
+                    os.replace(src, '%s.%d' % (self.path, i + 1))
+            if self._backup_count > 0:
+                os.replace(self.path, self.path + '.1')
+            else:
+                os.remove(self.path)
+            new_f = open(self.path, 'a', encoding='utf-8', errors='replace')
+        except OSError as e:
+            print('Failed to rotate log file: %s' % e, file=sys.stderr)
+            return f
+        f.close()
+        return new_f
+
+    def _run(self):
+        f = open(self.path, 'a', encoding='utf-8', errors='replace')
+        try:
+            closing = False
+            while not closing:
+                batch = [self._queue.get()]
+                while True:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if self._CLOSE in batch:
+                    closing = True
+                    batch.remove(self._CLOSE)
+                dropped = self._take_dropped()
+                if dropped:
+                    batch.append('[WARNING] %s: %d log messages dropped\n' % (
+                        StructuredLogger.DOMAIN, dropped))
+                try:
+                    f.write(''.join(batch))
+                    f.flush()
+                    if f.tell() >= self._max_bytes:
+                        f = self._rotate(f)
+                except OSError as e:
+                    print('Failed to write log file: %s' % e, file=sys.stderr)
+        finally:
+            f.close()
+
+
 class StructuredLogger:
     DOMAIN = 'video-downloader'
 
-    @staticmethod
-    def setup_file_logging():
+    _file_sink = None
+
+    @classmethod
+    def setup_file_logging(cls):
         log_dir = GLib.get_user_cache_dir() + '/video-downloader'
         os.makedirs(log_dir, exist_ok=True)
         log_file = log_dir + '/session.log'
-        
+        if cls._file_sink is None:
+            cls._file_sink = AsyncFileSink(log_file)
+        sink = cls._file_sink
+
         # We also want to integrate with GLib logging
         def log_handler(domain, level, message, user_data):
             level_str = {
@@ -22,13 +137,19 @@ class StructuredLogger:
                 GLib.LogLevelFlags.LEVEL_CRITICAL: "CRITICAL",
                 GLib.LogLevelFlags.LEVEL_ERROR: "ERROR",
             }.get(level, "UNKNOWN")
-            
-            with open(log_file, 'a') as f:
-                f.write(f"[{level_str}] {domain}: {message}\n")
+
+            sink.write(f"[{level_str}] {domain}: {message}\n")
 
         GLib.log_set_handler(None, GLib.LogLevelFlags.LEVEL_MASK, log_handler, None)
         return log_file
 
+    @classmethod
+    def shutdown_file_logging(cls):
+        """Flush and close the log file opened by `setup_file_logging`."""
+        if cls._file_sink is not None:
+            cls._file_sink.close()
+            cls._file_sink = None
+
     @classmethod
     def info(cls, message, **kwargs):
         cls._log(GLib.LogLevelFlags.LEVEL_INFO, message, **kwargs)
@@ -57,11 +178,13 @@ class StructuredLogger:
 
     @staticmethod
     def _mask_sensitive(text):
-        import re
         # Mask things that look like authorization headers or common tokens
         # Handles "password: value", "password=value", "password value", "password is value"
-        text = re.sub(r'(?i)(password|token|secret)(?::|=| is| )?\s*[^\s,]+', r'\1: ***', text)
-        return text
+        return _sensitive_masker.mask(text)
+
+
+_sensitive_masker = SecretMasker()
+
 
 def setup_excepthook():
     def excepthook(type, value, tb):
@@ -0,0 +1,54 @@
+"""Masking of credentials in log output."""
+
+import re
+import typing
+
+# Values following these words are masked, e.g. "password: hunter2"
+_KEYWORDS_PATTERN = (r'(?i:(?P<keyword>password|token|secret)'
+                     r'(?::|=| is| )?\s*[^\s,]+)')
+# Shorter values would mask unrelated text
+MIN_SECRET_LENGTH = 4
+MASK = '***'
+
+
+class SecretMasker:
+    """Mask known secrets and keyword/value pairs in one pass per line.
+
+    All secrets and the keyword pattern are combined into a single regular
+    expression that is compiled once and recompiled only by `set_secrets`
+    (e.g. when the user enters new credentials).
+    """
+
+    def __init__(self, secrets: typing.Iterable[str] = (),
+                 keywords: bool = True) -> None:
+        self._keywords = keywords
+        self._pattern: typing.Optional[typing.Pattern[str]] = None
+        self.set_secrets(secrets)
+
+    def set_secrets(self, secrets: typing.Iterable[typing.Any]) -> None:
+        secrets = {s for s in secrets
+                   if isinstance(s, str) and len(s) >= MIN_SECRET_LENGTH}
+        alternatives = []
+        if secrets:
+            # Longest first, a secret might contain another one
+            alternatives.append('(?P<secret>%s)' % '|'.join(
+                map(re.escape, sorted(secrets, key=len, reverse=True))))
+        if self._keywords:
+            alternatives.append(_KEYWORDS_PATTERN)
+        # Replace the compiled pattern atomically, `mask` might run in
+        # another thread
+        self._pattern = (re.compile('|'.join(alternatives))
+                         if alternatives else None)
+
+    @staticmethod
+    def _replace(match: typing.Match[str]) -> str:
+        if match.lastgroup == 'keyword':
+            return '%s: %s' % (match.group('keyword'), MASK)
+        return MASK
+
+    def mask(self, text: str) -> str:
+        pattern = self._pattern
+        if pattern is None:
+            return text
+        # A plain replacement string avoids calling back into Python
+        return pattern.sub(self._replace if self._keywords else MASK, text)
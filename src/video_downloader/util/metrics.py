@@ -0,0 +1,234 @@
+"""Counters, gauges and histograms exposed in the OpenMetrics text format."""
+
+import http.server
+import math
+import re
+import threading
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+# Upper bounds in seconds, from instant phases to long downloads
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+_ERROR_CLASSES = [
+    ('http_%s', re.compile(r'HTTP Error (\d{3})')),
+    ('unsupported_url', re.compile(r'Unsupported URL')),
+    ('unavailable', re.compile(r'unavailable|private video', re.I)),
+    ('authentication', re.compile(r'\b[Ss]ign in\b|--username|password')),
+    ('ffmpeg', re.compile(r'ffmpeg|ffprobe', re.I)),
+    ('filesystem', re.compile(r'download folder|No space left|'
+                              r'Permission denied', re.I)),
+    ('network', re.compile(r'Connection refused|timed out|Name or service|'
+                           r'Temporary failure in name resolution|'
+                           r'Unable to download webpage|urlopen error',
+                           re.I)),
+]
+
+
+def classify_error(message):
+    """Map an error message of yt-dlp or the worker to a short class name
+       with a small, fixed set of values (usable as a label)."""
+    for name, pattern in _ERROR_CLASSES:
+        match = pattern.search(message)
+        if match:
+            return name % match.groups() if '%s' in name else name
+    return 'other'
+
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (name, str(value).replace('\\', r'\\')
+                     .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels)
+
+
+class _Metric:
+    type_ = None
+
+    def __init__(self, name, help_, labels=(), unit=None):
+        self.name = name
+        self.help = help_
+        self.label_names = tuple(labels)
+        self.unit = unit
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError('expected labels %r, got %r' % (
+                self.label_names, tuple(labels)))
+        return tuple((name, labels[name]) for name in self.label_names)
+
+    def samples(self):
+        """Return ``[(suffix, labels, value)]``."""
+        raise NotImplementedError
+
+    def render(self):
+        lines = ['# TYPE %s %s' % (self.name, self.type_)]
+        if self.unit:
+            lines.append('# UNIT %s %s' % (self.name, self.unit))
+        lines.append('# HELP %s %s' % (self.name, self.help))
+        for suffix, labels, value in self.samples():
+            lines.append('%s%s%s %s' % (self.name, suffix,
+                                        _format_labels(labels),
+                                        _format_value(value)))
+        return lines
+
+
+class Counter(_Metric):
+    type_ = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError('counters only increase')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [('_total', key, value)
+                    for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Gauge that is either set directly or read from `callback` (returns
+       ``{label values tuple: value}``) whenever the metrics are rendered."""
+
+    type_ = 'gauge'
+
+    def __init__(self, name, help_, labels=(), unit=None, callback=None):
+        super().__init__(name, help_, labels, unit)
+        self._callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self._callback is not None:
+            values = {tuple(zip(self.label_names, key)): value
+                      for key, value in self._callback().items()}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [('', key, value) for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    type_ = 'histogram'
+
+    def __init__(self, name, help_, labels=(), unit=None,
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_, labels, unit)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * len(self.buckets), 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    samples.append(('_bucket', key + (('le', bound),),
+                                    count))
+                samples.append(('_count', key, counts[-1]))
+                samples.append(('_sum', key, total))
+        return [(suffix, tuple((name, _format_value(float(value))
+                                if name == 'le' else value)
+                               for name, value in labels), value)
+                for suffix, labels, value in samples]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Serve `registry` on ``http://<host>:<port>/metrics`` from a thread.
+
+    Binds to localhost by default, the metrics are not meant to be public.
+    Port 0 picks a free port (see `port`).
+    """
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        self._server = http.server.ThreadingHTTPServer(
+            (host, port), _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self._server.registry = registry
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='metrics-server',
+            daemon=True)
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -16,6 +16,7 @@
 # along with Video Downloader.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import re
 import subprocess
 import sys
 import traceback
@@ -23,6 +24,117 @@ import traceback
 from gi.repository import Gio, GLib
 
 from video_downloader.util import g_log, gobject_log
+from video_downloader.util.connection import SignalConnection
+
+
+class XdgUserDirs:
+    """Resolve XDG user directories (e.g. ``DOWNLOAD``) without `xdg-user-dir`.
+
+    ``user-dirs.dirs`` is parsed in-process and the result is cached until a
+    `Gio.FileMonitor` reports a change of the file. `xdg-user-dir` only runs
+    when the file contains something the parser doesn't understand (e.g.
+    shell expansions other than ``$HOME``).
+    """
+
+    _LINE_RE = re.compile(
+        r'\s*XDG_([A-Z0-9_]+)_DIR\s*=\s*"((?:[^"\\]|\\.)*)"\s*')
+
+    def __init__(self):
+        self._config_path = None
+        self._dirs = None
+        self._monitor = None
+        self._monitor_connection = None
+
+    @staticmethod
+    def get_config_path():
+        config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.join(
+            os.path.expanduser('~'), '.config')
+        return os.path.join(config_home, 'user-dirs.dirs')
+
+    @classmethod
+    def parse(cls, content, home_dir):
+        """Returns ``{name: path}`` or ``None`` if the content isn't
+           supported."""
+        dirs = {}
+        for line in content.splitlines():
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            match = cls._LINE_RE.fullmatch(line)
+            if not match:
+                return None
+            name, value = match.groups()
+            value = re.sub(r'\\(.)', r'\1', value)
+            if value == '$HOME' or value.startswith('$HOME/'):
+                value = home_dir + value[len('$HOME'):]
+            elif value and not value.startswith('/'):
+                return None
+            if '$' in value or '`' in value:
+                return None
+            dirs[name] = value
+        return dirs
+
+    def invalidate(self):
+        self._dirs = None
+
+    def _watch(self, config_path):
+        if self._monitor_connection is not None:
+            self._monitor_connection.close()
+            self._monitor_connection = None
+        try:
+            self._monitor = gobject_log(
+                Gio.File.new_for_path(config_path).monitor_file(
+                    Gio.FileMonitorFlags.NONE, None), config_path)
+        except GLib.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                  traceback.format_exc())
+            self._monitor = None
+            return
+        self._monitor_connection = SignalConnection(
+            self._monitor, 'changed', self.invalidate, no_args=True)
+
+    def _load(self):
+        config_path = self.get_config_path()
+        if config_path != self._config_path:
+            self._config_path = config_path
+            self._dirs = None
+            self._watch(config_path)
+        if self._dirs is None:
+            try:
+                with open(config_path, encoding='utf-8') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                content = ''
+            except (OSError, UnicodeDecodeError):
+                g_log(None, GLib.LogLevelFlags.LEVEL_DEBUG, '%s',
+                      traceback.format_exc())
+                return None
+            self._dirs = self.parse(content, os.path.expanduser('~'))
+        return self._dirs
+
+    def lookup(self, name):
+        dirs = self._load()
+        if dirs is None:
+            return _run_xdg_user_dir(name)
+        # Same fallbacks as `xdg-user-dir`
+        path = dirs.get(name, os.environ.get('XDG_%s_DIR' % name))
+        if path:
+            return path
+        home_dir = os.path.expanduser('~')
+        if name == 'DESKTOP':
+            return os.path.join(home_dir, 'Desktop')
+        return home_dir
+
+
+def _run_xdg_user_dir(name):
+    try:
+        return subprocess.check_output(
+            ['xdg-user-dir', name], universal_newlines=True,
+            stdin=subprocess.DEVNULL).splitlines()[0]
+    except FileNotFoundError:
+        return os.path.expanduser('~')
+
+
+_xdg_user_dirs = XdgUserDirs()
 
 
 def expand_path(path):
@@ -32,12 +144,7 @@ def expand_path(path):
         parts[0] = home_dir
     elif parts[0].startswith('xdg-'):
         name = parts[0][len('xdg-'):].replace('-', '').upper()
-        try:
-            parts[0] = subprocess.check_output(
-                ['xdg-user-dir', name], universal_newlines=True,
-                stdin=subprocess.DEVNULL).splitlines()[0]
-        except FileNotFoundError:
-            parts[0] = home_dir
+        parts[0] = _xdg_user_dirs.lookup(name)
     return os.path.normpath(os.path.join(os.sep, *parts))
 
 
@@ -51,94 +158,173 @@ def decode_filesystem_path(path):
                        sys.getfilesystemencodeerrors())
 
 
-def open_in_file_manager(directory, filenames):
-    # org.freedesktop.portal.Documents
-    portal_documents_proxy = gobject_log(Gio.DBusProxy.new_for_bus_sync(
-        Gio.BusType.SESSION, Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES |
-        Gio.DBusProxyFlags.DO_NOT_CONNECT_SIGNALS |
-        Gio.DBusProxyFlags.DO_NOT_AUTO_START_AT_CONSTRUCTION, None,
-        'org.freedesktop.portal.Documents',
-        '/org/freedesktop/portal/documents',
-        'org.freedesktop.portal.Documents'))
-    try:
-        documents_mount_point = decode_filesystem_path(
-            portal_documents_proxy.call_sync(
-                'GetMountPoint', None, Gio.DBusCallFlags.NONE, -1
-            ).get_child_value(0).get_bytestring())
-    except GLib.Error:
-        g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
-              traceback.format_exc())
-    else:
-        directory_in_documents_portal = os.path.normpath(directory).startswith(
-            os.path.normpath(documents_mount_point)+os.sep)
-        if directory_in_documents_portal:
-            # WORAROUND: Subpaths in the documents portal are not translated
-            filenames = []
-
-    # org.freedesktop.portal.OpenURI
-    portal_open_uri_proxy = gobject_log(Gio.DBusProxy.new_for_bus_sync(
-        Gio.BusType.SESSION, Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES |
-        Gio.DBusProxyFlags.DO_NOT_CONNECT_SIGNALS |
-        Gio.DBusProxyFlags.DO_NOT_AUTO_START_AT_CONSTRUCTION, None,
-        'org.freedesktop.portal.Desktop',
-        '/org/freedesktop/portal/desktop',
-        'org.freedesktop.portal.OpenURI'))
-    fdlist = gobject_log(Gio.UnixFDList())
-    for filename in filenames:
-        path = os.path.join(directory, filename)
+# Timeout of D-Bus calls to the portals and the file manager (milliseconds)
+DBUS_TIMEOUT = 5000
+
+_PORTAL_DOCUMENTS = ('org.freedesktop.portal.Documents',
+                     '/org/freedesktop/portal/documents',
+                     'org.freedesktop.portal.Documents')
+_PORTAL_OPEN_URI = ('org.freedesktop.portal.Desktop',
+                    '/org/freedesktop/portal/desktop',
+                    'org.freedesktop.portal.OpenURI')
+_FILE_MANAGER = ('org.freedesktop.FileManager1',
+                 '/org/freedesktop/FileManager1',
+                 'org.freedesktop.FileManager1')
+_dbus_proxies = {}
+
+
+def _get_dbus_proxy(name, object_path, interface_name, callback):
+    """Call `callback` with a `Gio.DBusProxy` (or None on failure).
+
+    Proxies are created asynchronously and reused by later calls."""
+    key = name, object_path, interface_name
+    proxy = _dbus_proxies.get(key)
+    if proxy is not None:
+        callback(proxy)
+        return
+
+    def on_proxy(source, result):
+        try:
+            proxy = Gio.DBusProxy.new_for_bus_finish(result)
+        except GLib.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                  traceback.format_exc())
+            callback(None)
+            return
+        _dbus_proxies[key] = gobject_log(proxy, interface_name)
+        callback(proxy)
+    # Not at module level, the Tauri sidecar imports this module through
+    # the worker with a stand-in for gi
+    flags = (Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES |
+             Gio.DBusProxyFlags.DO_NOT_CONNECT_SIGNALS |
+             Gio.DBusProxyFlags.DO_NOT_AUTO_START_AT_CONSTRUCTION)
+    Gio.DBusProxy.new_for_bus(
+        Gio.BusType.SESSION, flags, None, name, object_path,
+        interface_name, None, on_proxy)
+
+
+class _FileManagerRequest:
+    """Try the documents portal, the OpenURI portal, the FileManager1
+       interface and `xdg-open` one after another, without blocking."""
+
+    def __init__(self, directory, filenames):
+        self.directory = directory
+        self.filenames = filenames
+        self.path = directory
+
+    def start(self):
+        _get_dbus_proxy(*_PORTAL_DOCUMENTS, self._on_documents_proxy)
+
+    def _on_documents_proxy(self, proxy):
+        if proxy is None:
+            self._open_with_portal()
+            return
+        proxy.call('GetMountPoint', None, Gio.DBusCallFlags.NONE,
+                   DBUS_TIMEOUT, None, self._on_mount_point)
+
+    def _on_mount_point(self, proxy, result):
+        try:
+            documents_mount_point = decode_filesystem_path(
+                proxy.call_finish(result).get_child_value(0).get_bytestring())
+        except GLib.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                  traceback.format_exc())
+        else:
+            directory_in_documents_portal = os.path.normpath(
+                self.directory).startswith(
+                    os.path.normpath(documents_mount_point)+os.sep)
+            if directory_in_documents_portal:
+                # WORAROUND: Subpaths in the documents portal are not
+                # translated
+                self.filenames = []
+        self._open_with_portal()
+
+    def _open_with_portal(self):
+        for filename in self.filenames:
+            path = os.path.join(self.directory, filename)
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                g_log(None, GLib.LogLevelFlags.LEVEL_DEBUG, '%s',
+                      traceback.format_exc())
+                continue
+            break
+        else:
+            path = self.directory
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                      traceback.format_exc())
+                return
+        self.path = path
+        fdlist = gobject_log(Gio.UnixFDList())
+        try:
+            handle = fdlist.append(fd)
+        finally:
+            os.close(fd)
+
+        def on_proxy(proxy):
+            if proxy is None:
+                self._open_with_file_manager()
+                return
+            parameters = GLib.Variant('(sha{sv})', ('', handle, {}))
+            proxy.call_with_unix_fd_list(
+                'OpenDirectory', parameters, Gio.DBusCallFlags.NONE,
+                DBUS_TIMEOUT, fdlist, None, self._on_portal_result)
+        _get_dbus_proxy(*_PORTAL_OPEN_URI, on_proxy)
+
+    def _on_portal_result(self, proxy, result):
+        try:
+            proxy.call_with_unix_fd_list_finish(result)
+        except GLib.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                  traceback.format_exc())
+            self._open_with_file_manager()
+
+    def _open_with_file_manager(self):
+        def on_proxy(proxy):
+            if proxy is None:
+                self._open_with_xdg_open()
+                return
+            method = ('ShowFolders' if self.path == self.directory else
+                      'ShowItems')
+            parameters = GLib.Variant(
+                '(ass)', ([Gio.File.new_for_path(self.path).get_uri()], ''))
+            proxy.call(method, parameters, Gio.DBusCallFlags.NONE,
+                       DBUS_TIMEOUT, None, self._on_file_manager_result)
+        _get_dbus_proxy(*_FILE_MANAGER, on_proxy)
+
+    def _on_file_manager_result(self, proxy, result):
         try:
-            fd = os.open(path, os.O_RDONLY)
-        except OSError:
-            g_log(None, GLib.LogLevelFlags.LEVEL_DEBUG, '%s',
+            proxy.call_finish(result)
+        except GLib.Error:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
                   traceback.format_exc())
-            continue
-        break
-    else:
-        path = directory
+            self._open_with_xdg_open()
+
+    def _open_with_xdg_open(self):
         try:
-            fd = os.open(path, os.O_RDONLY)
-        except OSError:
+            process = Gio.Subprocess.new(['xdg-open', self.directory],
+                                         Gio.SubprocessFlags.NONE)
+        except GLib.Error:
             g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
                   traceback.format_exc())
             return
-    try:
-        handle = fdlist.append(fd)
-    finally:
-        os.close(fd)
-    try:
-        parameters = GLib.Variant('(sha{sv})', ('', handle, {}))
-        portal_open_uri_proxy.call_with_unix_fd_list_sync(
-            'OpenDirectory', parameters, Gio.DBusCallFlags.NONE, -1, fdlist)
-    except GLib.Error:
-        g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
-              traceback.format_exc())
-    else:
-        return
 
-    # org.freedesktop.FileManager1
-    filemanager_proxy = gobject_log(Gio.DBusProxy.new_for_bus_sync(
-        Gio.BusType.SESSION, Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES |
-        Gio.DBusProxyFlags.DO_NOT_CONNECT_SIGNALS |
-        Gio.DBusProxyFlags.DO_NOT_AUTO_START_AT_CONSTRUCTION, None,
-        'org.freedesktop.FileManager1', '/org/freedesktop/FileManager1',
-        'org.freedesktop.FileManager1'))
-    method = 'ShowFolders' if path == directory else 'ShowItems'
-    parameters = GLib.Variant(
-        '(ass)', ([Gio.File.new_for_path(path).get_uri()], ''))
-    try:
-        filemanager_proxy.call_sync(
-            method, parameters, Gio.DBusCallFlags.NONE, -1)
-    except GLib.Error:
-        g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
-              traceback.format_exc())
-    else:
-        return
+        def on_exit(process, result):
+            try:
+                process.wait_check_finish(result)
+            except GLib.Error:
+                g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
+                      traceback.format_exc())
+        process.wait_check_async(None, on_exit)
 
-    # xdg-open
-    try:
-        subprocess.run(['xdg-open', directory], check=True)
-    except subprocess.SubprocessError:
-        g_log(None, GLib.LogLevelFlags.LEVEL_WARNING, '%s',
-              traceback.format_exc())
-    else:
-        return
+
+def open_in_file_manager(directory, filenames):
+    """Show `directory` in the file manager and select the first existing
+       file of `filenames`.
+
+    Returns immediately, the D-Bus calls and `xdg-open` run in the
+    background of the main loop."""
+    _FileManagerRequest(directory, filenames).start()
@@ -20,13 +20,19 @@ import json
 
 
 class RpcClient:
-    def __init__(self, output_file, input_file=None):
+    def __init__(self, output_file, input_file=None, trace_context=None):
         self._output_file = output_file
         self._input_file = input_file
+        # Returns the trace context sent with requests (see `util.trace`)
+        self._trace_context = trace_context
 
     def _rpc(self, name, *args):
-        print(json.dumps({'method': name, 'args': args}),
-              file=self._output_file, flush=True)
+        request = {'method': name, 'args': args}
+        if self._trace_context is not None:
+            trace = self._trace_context()
+            if trace:
+                request['trace'] = trace
+        print(json.dumps(request), file=self._output_file, flush=True)
         if self._input_file is None:
             return None
         answer = json.loads(self._input_file.readline())
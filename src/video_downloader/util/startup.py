@@ -0,0 +1,99 @@
+"""Startup profiling of the GTK application.
+
+Enabled with the environment variable ``VIDEO_DOWNLOADER_PROFILE_STARTUP``.
+Phases from process start to the first ``present()`` of a window are timed
+and the modules imported during each phase are recorded. The report is
+logged and, unless the variable is ``1``, written as JSON to the path in the
+variable.
+"""
+
+import json
+import os
+import sys
+import time
+
+PROFILE_STARTUP_ENV = 'VIDEO_DOWNLOADER_PROFILE_STARTUP'
+
+
+def _process_age():
+    """Seconds since the process was started or None if unknown."""
+    try:
+        with open('/proc/self/stat') as f:
+            stat = f.read()
+        # The command name in parentheses may contain spaces
+        start_ticks = int(stat.rsplit(')', 1)[1].split()[19])
+        start = start_ticks / os.sysconf('SC_CLK_TCK')
+        return max(0.0, time.clock_gettime(time.CLOCK_BOOTTIME) - start)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupProfiler:
+    """Record the duration of named startup phases.
+
+    Every `mark` ends the current phase. The first phase starts with the
+    process (the interpreter and the imports up to this module), or with the
+    creation of the profiler when the process start time is unknown.
+    """
+
+    def __init__(self, enabled=False, output_path=None):
+        self.enabled = enabled
+        self.output_path = output_path
+        self.phases = []
+        self.finished = False
+        self._process_age = _process_age() if enabled else None
+        self._last_time = time.perf_counter()
+        self._last_modules = set(sys.modules) if enabled else set()
+
+    @classmethod
+    def from_environment(cls):
+        value = os.environ.get(PROFILE_STARTUP_ENV, '')
+        return cls(enabled=bool(value),
+                   output_path=value if value not in ('', '1') else None)
+
+    def mark(self, phase):
+        if not self.enabled or self.finished:
+            return
+        now = time.perf_counter()
+        modules = set(sys.modules)
+        duration = now - self._last_time
+        if not self.phases and self._process_age is not None:
+            duration += self._process_age
+        self.phases.append({
+            'phase': phase,
+            'duration': duration,
+            'modules': sorted(modules - self._last_modules),
+        })
+        self._last_time = now
+        self._last_modules = modules
+
+    def finish(self, phase):
+        """End the last phase and report the result (only once)."""
+        if not self.enabled or self.finished:
+            return
+        self.mark(phase)
+        self.finished = True
+        # Imported late, the logger should not be part of the first phase
+        from video_downloader.util.logging import StructuredLogger
+        report = self.report()
+        StructuredLogger.info(
+            'Startup profile', total=round(report['total'], 4),
+            **{p['phase']: round(p['duration'], 4) for p in report['phases']})
+        if self.output_path:
+            # Replaced atomically, benchmarks wait for the file to appear
+            tmp_path = self.output_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            os.replace(tmp_path, self.output_path)
+
+    def report(self):
+        return {
+            'total': sum(p['duration'] for p in self.phases),
+            'process_start_known': self._process_age is not None,
+            'imported_modules': len(sys.modules),
+            'phases': self.phases,
+        }
+
+
+startup_profiler = StartupProfiler.from_environment()
+startup_profiler.mark('interpreter')
@@ -0,0 +1,85 @@
+"""Decode thumbnails off the main thread."""
+
+import concurrent.futures
+import os
+import traceback
+
+from gi.repository import Gdk, GdkPixbuf, GLib
+
+from video_downloader.util import g_log
+from video_downloader.util.connection import Closable
+
+
+def _delete_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_decode_executor = None
+
+
+def _get_decode_executor():
+    global _decode_executor
+    if _decode_executor is None:
+        _decode_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='thumbnail-decoder')
+    return _decode_executor
+
+
+class ThumbnailLoader(Closable):
+    """Load thumbnails scaled to fit into `width` x `height`.
+
+    `load` calls back with a `Gdk.Texture` (or None if the file can't be
+    decoded) on the main thread. Only the most recent request is delivered,
+    older requests that aren't decoded yet are skipped and the results of
+    the others are dropped. With `delete`, the file is deleted once it was
+    decoded or skipped. Nothing is cached, the previews of the worker are
+    temporary files that are never shown twice.
+    """
+
+    def __init__(self, width, height):
+        super().__init__()
+        self.width = width
+        self.height = height
+        self._generation = 0
+
+        def invalidate():
+            self._generation += 1
+        self.add_close_callback(invalidate)
+
+    def load(self, path, callback, delete=False):
+        assert not self.closed, 'closed'
+        self._generation += 1
+        _get_decode_executor().submit(
+            self._decode, self._generation, path, callback, delete)
+
+    def _decode(self, generation, path, callback, delete):
+        # Runs in the decoder thread
+        try:
+            if generation != self._generation:
+                return
+            texture = self._decode_file(path)
+        finally:
+            if delete:
+                _delete_file(path)
+        GLib.idle_add(self._deliver, generation, texture, callback)
+
+    def _decode_file(self, path):
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_size(
+                path, self.width, self.height)
+            # Textures are immutable and can be passed between threads
+            return Gdk.Texture.new_for_pixbuf(pixbuf)
+        except GLib.Error:
+            return None
+        except Exception:
+            g_log(None, GLib.LogLevelFlags.LEVEL_WARNING,
+                  '%s', traceback.format_exc())
+            return None
+
+    def _deliver(self, generation, texture, callback):
+        if generation == self._generation and not self.closed:
+            callback(texture)
+        return False
@@ -0,0 +1,193 @@
+"""Trace spans of download jobs across processes.
+
+A job gets a trace id in the GUI process. The id is passed to the worker
+(and from there to ffmpeg and other children) with the environment variable
+``VIDEO_DOWNLOADER_TRACEPARENT`` in the W3C ``traceparent`` format, and the
+worker sends the context of its current span with every RPC request.
+
+When ``VIDEO_DOWNLOADER_TRACE_FILE`` is set, every process appends its spans
+to that file in the Chrome trace event format (JSON array, the closing
+bracket is optional), which can be opened in Perfetto or ``chrome://tracing``
+to see the job as one timeline. Timestamps come from the monotonic clock,
+which is shared by all processes.
+"""
+
+import functools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+TRACE_FILE_ENV = 'VIDEO_DOWNLOADER_TRACE_FILE'
+TRACEPARENT_ENV = 'VIDEO_DOWNLOADER_TRACEPARENT'
+
+_TRACEPARENT_RE = re.compile(r'00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}')
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def new_span_id():
+    return os.urandom(8).hex()
+
+
+def format_traceparent(trace_id, span_id):
+    return '00-%s-%s-01' % (trace_id, span_id)
+
+
+def parse_traceparent(value):
+    """Return ``(trace id, span id)`` or None if `value` is invalid."""
+    match = _TRACEPARENT_RE.fullmatch((value or '').strip())
+    return match.groups() if match else None
+
+
+def monotonic_us():
+    return time.monotonic() * 1e6
+
+
+class TraceFile:
+    """Append trace events to a JSON array shared by multiple processes.
+
+    Each event is written with a single ``write`` to a file opened with
+    ``O_APPEND``, so events of different processes don't get mixed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            os.write(fd, b'[\n')
+            os.close(fd)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+
+    def write(self, event):
+        os.write(self._fd, (json.dumps(event) + ',\n').encode())
+
+    def close(self):
+        os.close(self._fd)
+
+
+class Span:
+    def __init__(self, tracer, name, category, trace_id, parent_id, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.trace_id = trace_id
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.args = args
+        self.start = monotonic_us()
+        self.ended = False
+
+    @property
+    def traceparent(self):
+        return format_traceparent(self.trace_id, self.span_id)
+
+    def end(self, **args):
+        if not self.ended:
+            self.ended = True
+            self.tracer._end_span(self, args)
+
+
+class Tracer:
+    """Record spans of this process.
+
+    Without a `trace_file` only the ids are tracked (cheap enough to be
+    always on). Spans started without an explicit trace id and parent are
+    children of the innermost open span, or of `parent` (the context this
+    process was started with).
+    """
+
+    def __init__(self, process_name, trace_file=None, parent=None):
+        self.process_name = process_name
+        self.trace_file = trace_file
+        self.parent = parent  # (trace id, span id) or None
+        self._lock = threading.Lock()
+        self._open_spans = []
+        if trace_file is not None:
+            trace_file.write({'name': 'process_name', 'ph': 'M',
+                              'pid': os.getpid(),
+                              'args': {'name': process_name}})
+
+    @classmethod
+    def from_environment(cls, process_name):
+        path = os.environ.get(TRACE_FILE_ENV)
+        trace_file = None
+        if path:
+            try:
+                trace_file = TraceFile(path)
+            except OSError:
+                trace_file = None
+        return cls(process_name, trace_file,
+                   parse_traceparent(os.environ.get(TRACEPARENT_ENV)))
+
+    @property
+    def enabled(self):
+        return self.trace_file is not None
+
+    def start_span(self, name, category='job', trace_id=None, parent_id=None,
+                   **args):
+        with self._lock:
+            if trace_id is None:
+                if self._open_spans:
+                    trace_id = self._open_spans[-1].trace_id
+                    parent_id = self._open_spans[-1].span_id
+                elif self.parent is not None:
+                    trace_id, parent_id = self.parent
+                else:
+                    trace_id = new_trace_id()
+            span = Span(self, name, category, trace_id, parent_id, args)
+            self._open_spans.append(span)
+        return span
+
+    def current_traceparent(self):
+        """Context of the innermost open span (or of this process)."""
+        with self._lock:
+            if self._open_spans:
+                return self._open_spans[-1].traceparent
+        if self.parent is not None:
+            return format_traceparent(*self.parent)
+        return None
+
+    def _end_span(self, span, args):
+        with self._lock:
+            self._open_spans.remove(span)
+        self.record(span.name, span.start, monotonic_us(),
+                    category=span.category, trace_id=span.trace_id,
+                    span_id=span.span_id, parent_id=span.parent_id,
+                    **span.args, **args)
+
+    def record(self, name, start, end, category='job', pid=None, tid=None,
+               trace_id=None, span_id=None, parent_id=None, **args):
+        """Write a complete span, `start` and `end` are in microseconds of
+           the monotonic clock."""
+        if self.trace_file is None:
+            return
+        if trace_id is None:
+            parent = parse_traceparent(self.current_traceparent())
+            if parent is not None:
+                trace_id, parent_id = parent
+        pid = os.getpid() if pid is None else pid
+        self.trace_file.write({
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': round(start, 1), 'dur': round(max(0, end - start), 1),
+            'pid': pid, 'tid': pid if tid is None else tid,
+            'args': {'trace_id': trace_id, 'span_id': span_id or new_span_id(),
+                     'parent_id': parent_id, **args}})
+
+    def name_process(self, pid, name):
+        if self.trace_file is not None:
+            self.trace_file.write({'name': 'process_name', 'ph': 'M',
+                                   'pid': pid, 'args': {'name': name}})
+
+
+@functools.lru_cache(maxsize=None)
+def process_tracer(process_name):
+    """The tracer of this process, configured from the environment."""
+    return Tracer.from_environment(process_name)
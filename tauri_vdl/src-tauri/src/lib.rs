@@ -1,7 +1,7 @@
 use std::io::{BufRead, BufReader, Write};
-use std::process::{Command, Stdio};
+use std::process::{Child, ChildStdin, Command, Stdio};
 use std::sync::{Arc, Mutex};
-use tauri::Emitter;
+use tauri::{Emitter, Manager};
 
 // Learn more about Tauri commands at https://tauri.app/develop/calling-rust/
 #[tauri::command]
@@ -9,19 +9,35 @@ fn greet(name: &str) -> String {
     format!("Hello, {}! You've been greeted from Rust!", name)
 }
 
-#[tauri::command]
-async fn start_download(app: tauri::AppHandle, url: String, mode: String, resolution: u32) -> Result<(), String> {
-    println!("[RUST] 🚀 start_download command received");
-    println!("[RUST] 🔗 URL: {}", url);
-    println!("[RUST] 📦 Mode: {} | Resolution: {}p", mode, resolution);
-    
+/// Verbose tracing of the sidecar traffic, the sidecar reads the same
+/// variable from the inherited environment.
+fn debug_enabled() -> bool {
+    matches!(std::env::var("VDL_SIDECAR_DEBUG"), Ok(v) if !v.is_empty() && v != "0")
+}
+
+/// Long-lived Python sidecar (started with `--serve`) shared by all downloads.
+struct Sidecar {
+    child: Child,
+    stdin: ChildStdin,
+}
+
+#[derive(Default)]
+struct SidecarState {
+    sidecar: Mutex<Option<Sidecar>>,
+    // Held while a sidecar starts, so only one is started at a time. The
+    // sidecar itself isn't locked during the handshake.
+    starting: tauri::async_runtime::Mutex<()>,
+}
+
+fn spawn_sidecar(app: &tauri::AppHandle) -> Result<Sidecar, String> {
     // Use absolute path to the sidecar
     let sidecar_path = "/home/yurix/Documentos/my-video-downloader/tauri_vdl/src_python/sidecar.py";
     println!("[RUST] 📁 Sidecar path: {}", sidecar_path);
-    println!("[RUST] 🔄 Spawning Python sidecar process...");
+    println!("[RUST] 🔄 Spawning long-lived Python sidecar process...");
 
     let mut child = Command::new("python3")
         .arg(sidecar_path)
+        .arg("--serve")
         .stdin(Stdio::piped())
         .stdout(Stdio::piped())
         .stderr(Stdio::piped())
@@ -30,46 +46,48 @@ async fn start_download(app: tauri::AppHandle, url: String, mode: String, resolu
             eprintln!("[RUST] ❌ Failed to spawn Python: {}", e);
             format!("Failed to spawn Python: {}", e)
         })?;
-    
+
     println!("[RUST] ✅ Python sidecar spawned successfully (PID: {:?})", child.id());
 
-    // Take ownership of stdin and wrap it for thread-safe sharing
     let stdin = child.stdin.take().ok_or("Failed to get stdin")?;
-    let stdin = Arc::new(Mutex::new(stdin));
-
-    // Send download command to sidecar
-    println!("[RUST] 📤 Sending download command to sidecar via stdin...");
-    {
-        let mut stdin_lock = stdin.lock().map_err(|e| e.to_string())?;
-        let cmd = serde_json::json!({
-            "method": "start_download",
-            "params": { "url": url, "mode": mode, "resolution": resolution }
-        });
-        println!("[RUST] 📝 Command JSON: {}", cmd.to_string());
-        writeln!(&mut *stdin_lock, "{}", cmd.to_string())
-            .map_err(|e| {
-                eprintln!("[RUST] ❌ Failed to write to stdin: {}", e);
-                format!("Failed to write to stdin: {}", e)
-            })?;
-        stdin_lock.flush().map_err(|e| {
-            eprintln!("[RUST] ❌ Failed to flush stdin: {}", e);
-            format!("Failed to flush stdin: {}", e)
-        })?;
-        println!("[RUST] ✅ Command sent and flushed to sidecar");
+    let stdout = child.stdout.take().ok_or("Failed to get stdout")?;
+    let mut reader = BufReader::new(stdout);
+
+    // Wait for the readiness handshake, yt-dlp is imported and warmed up
+    // before the sidecar answers
+    println!("[RUST] ⏳ Waiting for sidecar handshake...");
+    let mut line = String::new();
+    loop {
+        line.clear();
+        let read = reader.read_line(&mut line).map_err(|e| e.to_string())?;
+        if read == 0 {
+            let _ = child.kill();
+            let _ = child.wait();
+            return Err("Sidecar exited before it was ready".into());
+        }
+        if let Ok(msg) = serde_json::from_str::<serde_json::Value>(&line) {
+            if msg.get("event").and_then(|e| e.as_str()) == Some("ready") {
+                println!("[RUST] 🤝 Sidecar ready: {:?}", msg.get("data"));
+                break;
+            }
+        }
+        eprintln!("[RUST:STDOUT] ⚠️ Unexpected line before handshake: {}", line.trim_end());
     }
 
-    // Read stdout in a separate thread and emit events
-    let stdout = child.stdout.take().ok_or("Failed to get stdout")?;
+    // Read stdout in a separate thread and emit events of all jobs
     let app_clone = app.clone();
-    
     println!("[RUST] 🧵 Starting stdout reader thread...");
     std::thread::spawn(move || {
         println!("[RUST:STDOUT] 👂 Listening for sidecar output...");
-        let reader = BufReader::new(stdout);
+        let debug = debug_enabled();
         for line in reader.lines().flatten() {
-            println!("[RUST:STDOUT] 📥 Raw line received: {}", line);
+            if debug {
+                println!("[RUST:STDOUT] 📥 Raw line received: {}", line);
+            }
             if let Ok(msg) = serde_json::from_str::<serde_json::Value>(&line) {
-                println!("[RUST:STDOUT] 📡 Emitting 'sidecar-event' to frontend: {:?}", msg.get("event").unwrap_or(&serde_json::Value::Null));
+                if debug {
+                    println!("[RUST:STDOUT] 📡 Emitting 'sidecar-event' to frontend: {:?}", msg.get("event").unwrap_or(&serde_json::Value::Null));
+                }
                 let _ = app_clone.emit("sidecar-event", msg);
             } else {
                 eprintln!("[RUST:STDOUT] ⚠️ Failed to parse JSON: {}", line);
@@ -91,13 +109,102 @@ async fn start_download(app: tauri::AppHandle, url: String, mode: String, resolu
         });
     }
 
-    println!("[RUST] ✅ Download process initialized successfully");
+    Ok(Sidecar { child, stdin })
+}
+
+fn sidecar_alive(state: &SidecarState) -> Result<bool, String> {
+    let mut guard = state.sidecar.lock().map_err(|e| e.to_string())?;
+    Ok(match guard.as_mut() {
+        Some(sidecar) => matches!(sidecar.child.try_wait(), Ok(None)),
+        None => false,
+    })
+}
+
+/// Start the sidecar unless it is running. The spawn and the handshake
+/// (yt-dlp is imported and warmed up) block, they run on a blocking thread.
+async fn ensure_sidecar(app: &tauri::AppHandle, state: &SidecarState) -> Result<(), String> {
+    let _starting = state.starting.lock().await;
+    if sidecar_alive(state)? {
+        return Ok(());
+    }
+    let app_clone = app.clone();
+    let sidecar = tauri::async_runtime::spawn_blocking(move || spawn_sidecar(&app_clone))
+        .await
+        .map_err(|e| e.to_string())??;
+    let mut guard = state.sidecar.lock().map_err(|e| e.to_string())?;
+    if let Some(mut old) = guard.replace(sidecar) {
+        let _ = old.child.kill();
+        let _ = old.child.wait();
+    }
+    Ok(())
+}
+
+async fn send_to_sidecar(
+    app: &tauri::AppHandle,
+    state: &SidecarState,
+    cmd: &serde_json::Value,
+) -> Result<(), String> {
+    // Restart the sidecar if it is gone
+    ensure_sidecar(app, state).await?;
+    let mut guard = state.sidecar.lock().map_err(|e| e.to_string())?;
+    let sidecar = guard.as_mut().ok_or("Sidecar not running")?;
+    if debug_enabled() {
+        println!("[RUST] 📝 Command JSON: {}", cmd.to_string());
+    }
+    let result = writeln!(sidecar.stdin, "{}", cmd.to_string())
+        .and_then(|_| sidecar.stdin.flush());
+    if let Err(e) = result {
+        eprintln!("[RUST] ❌ Failed to write to sidecar: {}", e);
+        // Drop the broken sidecar, the next command starts a new one
+        if let Some(mut sidecar) = guard.take() {
+            let _ = sidecar.child.kill();
+            let _ = sidecar.child.wait();
+        }
+        return Err(format!("Failed to write to sidecar: {}", e));
+    }
+    Ok(())
+}
+
+#[tauri::command]
+async fn start_download(
+    app: tauri::AppHandle,
+    state: tauri::State<'_, SidecarState>,
+    job_id: String,
+    url: String,
+    mode: String,
+    resolution: u32,
+) -> Result<(), String> {
+    println!("[RUST] 🚀 start_download command received (job: {})", job_id);
+    println!("[RUST] 🔗 URL: {}", url);
+    println!("[RUST] 📦 Mode: {} | Resolution: {}p", mode, resolution);
+
+    let cmd = serde_json::json!({
+        "method": "start_download",
+        "id": job_id,
+        "params": { "url": url, "mode": mode, "resolution": resolution }
+    });
+    send_to_sidecar(&app, &state, &cmd).await?;
+
+    println!("[RUST] ✅ Download job submitted to sidecar");
     Ok(())
 }
 
 #[cfg_attr(mobile, tauri::mobile_entry_point)]
 pub fn run() {
     tauri::Builder::default()
+        .manage(SidecarState::default())
+        .setup(|app| {
+            // Start the sidecar with the app, the first download doesn't
+            // wait for the warm-up
+            let handle = app.handle().clone();
+            tauri::async_runtime::spawn(async move {
+                let state = handle.state::<SidecarState>();
+                if let Err(e) = ensure_sidecar(&handle, &state).await {
+                    eprintln!("[RUST] ❌ Failed to start sidecar: {}", e);
+                }
+            });
+            Ok(())
+        })
         .plugin(tauri_plugin_opener::init())
         .plugin(tauri_plugin_shell::init())
         .invoke_handler(tauri::generate_handler![greet, start_download])
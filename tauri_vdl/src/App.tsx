@@ -21,16 +21,19 @@ function App() {
   const [mode, setMode] = useState<"video" | "audio">("video");
   const [resolution, setResolution] = useState(1080);
   const unlistenRef = useRef<(() => void) | null>(null);
+  // The sidecar is shared by all downloads, events are tagged with the job id
+  const jobIdRef = useRef<string | null>(null);
+  const lastSeqRef = useRef(0);
 
   useEffect(() => {
     console.log("[REACT] ⚡ App mounted, setting up sidecar event listener...");
     const setupListener = async () => {
-      unlistenRef.current = await listen<any>("sidecar-event", (event) => {
-        const msg = event.payload;
-        console.log("[REACT] 📩 Sidecar event received:", JSON.stringify(msg, null, 2));
+      const handleEvent = (msg: any) => {
         if (msg.event === "progress") {
-          console.log(`[REACT] 📊 Progress: ${(msg.data.progress * 100).toFixed(1)}% | Speed: ${msg.data.speed} B/s`);
           setProgress(msg.data);
+        } else if (msg.event === "batch") {
+          // Coalesced progress/pulse events of the sidecar
+          msg.data.events.forEach(handleEvent);
         } else if (msg.event === "finished") {
           console.log(`[REACT] ✅ Finished! Success: ${msg.data.success}`);
           setStatus(msg.data.success ? "finished" : "error");
@@ -43,10 +46,24 @@ function App() {
         } else if (msg.event === "download_finished") {
           console.log(`[REACT] 📁 File saved: ${msg.data.filename}`);
         } else if (msg.event === "pulse") {
-          console.log("[REACT] 💓 Pulse received (alive signal)");
+          // Nothing to show, the job is alive
         } else {
           console.log("[REACT] ❓ Unknown event type:", msg.event);
         }
+      };
+      unlistenRef.current = await listen<any>("sidecar-event", (event) => {
+        const msg = event.payload;
+        if (msg.job !== undefined && msg.job !== jobIdRef.current) {
+          return;
+        }
+        // Sequence numbers increase by one per message of a job
+        if (msg.seq !== undefined) {
+          if (msg.seq !== lastSeqRef.current + 1) {
+            console.warn(`[REACT] ⚠️ Lost ${msg.seq - lastSeqRef.current - 1} sidecar message(s)`);
+          }
+          lastSeqRef.current = msg.seq;
+        }
+        handleEvent(msg);
       });
       console.log("[REACT] ✅ Sidecar listener registered successfully");
     };
@@ -70,11 +87,14 @@ function App() {
     console.log("[REACT] 📍 Status changed: idle → downloading");
     setErrorMessage("");
     setProgress(null);
+    const jobId = crypto.randomUUID();
+    jobIdRef.current = jobId;
+    lastSeqRef.current = 0;
 
     try {
       console.log("[REACT] 📡 Invoking Rust 'start_download' command...");
-      await invoke("start_download", { url, mode, resolution });
-      console.log("[REACT] ✅ Rust command invoked successfully (sidecar spawned)");
+      await invoke("start_download", { jobId, url, mode, resolution });
+      console.log("[REACT] ✅ Rust command invoked successfully (job submitted)");
     } catch (e: any) {
       console.error("[REACT] ❌ Failed to invoke Rust command:", e);
       setErrorMessage(e.toString() || "Failed to start download");
@@ -1,6 +1,11 @@
 import sys
 import json
 import os
+import select
+import signal
+import socket
+import threading
+import time
 import traceback
 
 # Mock gi only if not available (e.g. on Windows or headless without libs)
@@ -19,37 +24,134 @@ except ImportError:
 original_src = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "src"))
 sys.path.insert(0, original_src)
 
+from video_downloader.downloader.network import install_connection_reuse
 from video_downloader.downloader.yt_dlp_slave import YoutubeDLSlave
+from video_downloader.util import split_urls
+from video_downloader.util.metrics import (MetricsRegistry, MetricsServer,
+                                           classify_error)
+
+# Version of the long-lived (``--serve``) protocol announced in the handshake
+PROTOCOL_VERSION = 1
+# Minimum interval in seconds between two coalesced messages of a job
+EVENT_INTERVAL = 0.1
+# Verbose tracing to stderr, enabled with ``--debug`` or VDL_SIDECAR_DEBUG=1
+DEBUG = os.environ.get("VDL_SIDECAR_DEBUG", "") not in ("", "0")
+# Buckets for the peak memory of job processes (in bytes)
+RSS_BUCKETS = tuple(2**20 * mib for mib in (64, 128, 256, 512, 1024, 2048))
+
+
+def trace(message):
+    if DEBUG:
+        print(message, file=sys.stderr, flush=True)
+
 
 class TauriHandler:
-    def __init__(self):
-        self.url = ""
+    """Reports the progress of one job as JSON lines on stdout.
+
+    ``progress`` and ``pulse`` arrive once per yt-dlp callback. They are
+    coalesced and written at most every ``interval`` seconds: the latest
+    progress wins and pulses are counted. When both are pending they go out
+    as a single ``batch`` message. Other events flush the pending ones first,
+    so the order is preserved. Every message carries a sequence number,
+    incremented by one per line and job, to detect lost messages.
+    """
+
+    def __init__(self, job_id=None, interval=EVENT_INTERVAL):
+        self.job_id = job_id
+        self.urls = []
         self.mode = "video"
         self.resolution = 1080
         self.prefer_mpeg = False
         self.automatic_subtitles = []
         self.download_dir = os.path.expanduser("~/Downloads")
-        print(f"[PYTHON] ⚡ TauriHandler initialized | download_dir: {self.download_dir}", file=sys.stderr, flush=True)
+        # Fragments of HLS/DASH downloads loaded at once (yt-dlp default)
+        self.concurrent_fragments = 1
+        self._interval = interval
+        self._seq = 0
+        self._lock = threading.RLock()
+        self._pending = {}  # event -> data of coalesced events
+        self._last_flush = float("-inf")
+        self._flush_timer = None
+        trace("[PYTHON] ⚡ TauriHandler initialized | "
+              f"download_dir: {self.download_dir}")
 
     def emit(self, event, data):
-        print(f"[PYTHON] 📤 Emitting event: {event} | data: {data}", file=sys.stderr, flush=True)
-        print(json.dumps({"event": event, "data": data}), flush=True)
+        with self._lock:
+            self._flush_pending()
+            self._write(event, data)
+
+    def flush(self):
+        with self._lock:
+            self._flush_pending()
+
+    @property
+    def seq(self):
+        """Sequence number of the last message."""
+        return self._seq
 
-    def get_url(self): return self.url
+    def _write(self, event, data):
+        self._seq += 1
+        message = {"event": event, "data": data, "seq": self._seq}
+        if self.job_id is not None:
+            message["job"] = self.job_id
+        if DEBUG:
+            trace(f"[PYTHON] 📤 Emitting event: {event} | data: {data}")
+        print(json.dumps(message), flush=True)
+
+    def _coalesce(self, event, data):
+        with self._lock:
+            self._pending[event] = data
+            delay = self._last_flush + self._interval - time.monotonic()
+            if delay <= 0:
+                self._flush_pending()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _flush_pending(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._last_flush = time.monotonic()
+        if len(pending) == 1:
+            (event, data), = pending.items()
+            self._write(event, data)
+        else:
+            self._write("batch", {"events": [
+                {"event": event, "data": data}
+                for event, data in pending.items()]})
+
+    def get_urls(self): return self.urls
     def get_mode(self): return self.mode
     def get_resolution(self): return self.resolution
     def get_prefer_mpeg(self): return self.prefer_mpeg
     def get_automatic_subtitles(self): return self.automatic_subtitles
     def get_download_dir(self): return self.download_dir
+    def get_concurrent_fragments(self): return self.concurrent_fragments
+    # Previews stay in the temporary directory of the job
+    def get_preview_dir(self): return ""
+    # No keyring, cookies are only shared by the URLs of a job
+    def get_session_key(self): return ""
+    def get_remember_credentials(self): return False
 
     def on_pulse(self):
-        print("[PYTHON] 💓 Pulse (keep-alive)", file=sys.stderr, flush=True)
-        self.emit("pulse", {})
-    
+        if DEBUG:
+            trace("[PYTHON] 💓 Pulse (keep-alive)")
+        with self._lock:
+            count = self._pending.get("pulse", {}).get("count", 0)
+            self._coalesce("pulse", {"count": count + 1})
+
     def on_progress(self, filename, progress, bytes_, bytes_total, eta, speed):
-        pct = progress * 100 if progress else 0
-        print(f"[PYTHON] 📊 Progress: {pct:.1f}% | {bytes_}/{bytes_total} bytes | Speed: {speed} B/s | ETA: {eta}s", file=sys.stderr, flush=True)
-        self.emit("progress", {
+        if DEBUG:
+            pct = progress * 100 if progress else 0
+            trace(f"[PYTHON] 📊 Progress: {pct:.1f}% | "
+                  f"{bytes_}/{bytes_total} bytes | Speed: {speed} B/s | "
+                  f"ETA: {eta}s")
+        self._coalesce("progress", {
             "filename": filename,
             "progress": progress,
             "bytes": bytes_,
@@ -59,23 +161,37 @@ class TauriHandler:
         })
 
     def on_download_start(self, index, count, title):
-        print(f"[PYTHON] 🎬 Download starting: '{title}' ({index}/{count})", file=sys.stderr, flush=True)
+        trace(f"[PYTHON] 🎬 Download starting: '{title}' ({index}/{count})")
         self.emit("download_start", {"index": index, "count": count, "title": title})
 
     def on_download_finished(self, filename):
-        print(f"[PYTHON] ✅ Download finished: {filename}", file=sys.stderr, flush=True)
+        trace(f"[PYTHON] ✅ Download finished: {filename}")
         self.emit("download_finished", {"filename": filename})
 
     def on_download_lock(self, name):
-        print(f"[PYTHON] 🔒 Download lock acquired: {name}", file=sys.stderr, flush=True)
+        trace(f"[PYTHON] 🔒 Download lock acquired: {name}")
         return True
     
     def on_download_thumbnail(self, path):
-        print(f"[PYTHON] 🖼️ Thumbnail: {path}", file=sys.stderr, flush=True)
+        trace(f"[PYTHON] 🖼️ Thumbnail: {path}")
         self.emit("thumbnail", {"path": path})
     
+    def on_phase_start(self, index, phase, timestamp):
+        self.emit("phase_start", {"index": index, "phase": phase,
+                                  "timestamp": timestamp})
+
+    def on_phase_end(self, index, phase, timestamp, bytes_):
+        self.emit("phase_end", {"index": index, "phase": phase,
+                                "timestamp": timestamp, "bytes": bytes_})
+
+    def on_retry(self, reason, error_class):
+        self.emit("retry", {"reason": reason, "error_class": error_class})
+
+    def on_connection_stats(self, index, stats):
+        self.emit("connection_stats", {"index": index, "stats": stats})
+
     def on_finished(self, success):
-        print(f"[PYTHON] 🏁 Finished! Success: {success}", file=sys.stderr, flush=True)
+        trace(f"[PYTHON] 🏁 Finished! Success: {success}")
         self.emit("finished", {"success": success})
     
     def on_error(self, msg):
@@ -84,46 +200,569 @@ class TauriHandler:
         print(f"[PYTHON] ❌ ERROR: {msg}", file=sys.stderr, flush=True)
         self.emit("error", {"message": msg})
 
-def main():
-    print("[PYTHON] 🚀 Sidecar starting...", file=sys.stderr, flush=True)
+
+def configure_handler(handler, params):
+    # "url" can hold several URLs separated by whitespace
+    handler.urls = params.get("urls") or split_urls(params.get("url") or "")
+    handler.mode = params.get("mode", "video")
+    handler.resolution = params.get("resolution", 1080)
+    handler.download_dir = params.get("download_dir", handler.download_dir)
+    handler.concurrent_fragments = params.get(
+        "concurrent_fragments", handler.concurrent_fragments)
+
+    trace("[PYTHON] 🔧 Download config:")
+    trace(f"[PYTHON]    URLs: {' '.join(handler.urls)}")
+    trace(f"[PYTHON]    Mode: {handler.mode}")
+    trace(f"[PYTHON]    Resolution: {handler.resolution}p")
+    trace(f"[PYTHON]    Output dir: {handler.download_dir}")
+
+
+def run_download(handler):
+    """Run the slave for the configured handler.
+
+    Returns ``True`` on success.
+    """
+    trace("[PYTHON] 🎬 Starting YoutubeDLSlave...")
+    try:
+        YoutubeDLSlave(handler)
+        trace("[PYTHON] ✅ YoutubeDLSlave completed")
+    except Exception as e:
+        print(f"[PYTHON] ❌ YoutubeDLSlave error: {e}", file=sys.stderr,
+              flush=True)
+        print(f"[PYTHON] 📜 Traceback: {traceback.format_exc()}",
+              file=sys.stderr, flush=True)
+        handler.on_error(str(e))
+        return False
+    finally:
+        handler.flush()
+    return True
+
+
+def warm_up():
+    """Import the lazily loaded parts of yt-dlp once, before any job runs."""
+    import yt_dlp
+    import yt_dlp.postprocessor  # noqa: F401
+    yt_dlp.extractor.gen_extractor_classes()
+
+
+class SidecarMetrics:
+    """Metrics of the jobs run by `SidecarServer` in OpenMetrics format.
+
+    Fed from the events the jobs write (phases, retries, errors) and from
+    their processes (memory). Jobs that run inline (no ``os.fork``) only
+    count as started and finished.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self._lock = threading.Lock()
+        self._pids = {}  # job id -> pid of running jobs
+        self._phase_starts = {}  # (job id, playlist index, phase) -> time
+        r = self.registry
+        r.gauge("vdl_jobs_active", "Download jobs that are running.",
+                callback=lambda: {(): len(self._pids)})
+        self.jobs_started = r.counter(
+            "vdl_jobs_started", "Download jobs that were started.")
+        self.jobs_finished = r.counter(
+            "vdl_jobs_finished", "Download jobs that finished, by result.",
+            labels=["result"])
+        self.errors = r.counter(
+            "vdl_job_errors", "Errors reported by download jobs, by class.",
+            labels=["error_class"])
+        self.retries = r.counter(
+            "vdl_retries", "Retries of requests, fragments or logins.",
+            labels=["reason"])
+        self.downloaded_bytes = r.counter(
+            "vdl_downloaded_bytes", "Bytes of finished transfers.",
+            unit="bytes")
+        self.downloaded_files = r.counter(
+            "vdl_downloaded_files", "Files moved to the download folder.")
+        self.connection_setups = r.counter(
+            "vdl_connection_setups",
+            "DNS lookups, connections and TLS handshakes of jobs, by kind "
+            "(dns_cache_hits and tls_resumed were avoided or shortened).",
+            labels=["kind"])
+        self.connection_setup_seconds = r.counter(
+            "vdl_connection_setup_seconds",
+            "Time jobs spent setting up connections, by stage.",
+            labels=["stage"], unit="seconds")
+        self.phase_duration = r.histogram(
+            "vdl_phase_duration_seconds", "Duration of the phases of jobs.",
+            labels=["phase"], unit="seconds")
+        r.gauge("vdl_worker_resident_memory_bytes",
+                "Resident memory of the running job processes.",
+                unit="bytes", callback=self._read_rss)
+        self.worker_peak_rss = r.histogram(
+            "vdl_worker_peak_resident_memory_bytes",
+            "Peak resident memory of finished job processes.",
+            unit="bytes", buckets=RSS_BUCKETS)
+
+    def _read_rss(self):
+        with self._lock:
+            pids = list(self._pids.values())
+        total = 0
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except (OSError, ValueError):
+                pass
+        return {(): total}
+
+    def job_started(self, job_id, pid=None):
+        self.jobs_started.inc()
+        if pid is not None:
+            with self._lock:
+                self._pids[job_id] = pid
+
+    def job_finished(self, job_id, success, cancelled=False, peak_rss=None):
+        with self._lock:
+            self._pids.pop(job_id, None)
+            for key in [k for k in self._phase_starts if k[0] == job_id]:
+                del self._phase_starts[key]
+        result = ("cancelled" if cancelled else
+                  "success" if success else "failure")
+        self.jobs_finished.inc(result=result)
+        if peak_rss is not None:
+            self.worker_peak_rss.observe(peak_rss)
+
+    def observe_line(self, job_id, line):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return
+        if isinstance(message, dict):
+            self.observe_event(job_id, message.get("event"),
+                               message.get("data") or {})
+
+    def observe_event(self, job_id, event, data):
+        if event == "batch":
+            for e in data.get("events", []):
+                self.observe_event(job_id, e.get("event"), e.get("data") or {})
+        elif event == "phase_start":
+            with self._lock:
+                self._phase_starts[job_id, data["index"], data["phase"]] = (
+                    data["timestamp"])
+        elif event == "phase_end":
+            with self._lock:
+                start = self._phase_starts.pop(
+                    (job_id, data["index"], data["phase"]), None)
+            if start is not None:
+                self.phase_duration.observe(max(0, data["timestamp"] - start),
+                                            phase=data["phase"])
+            if data["phase"] == "download" and data.get("bytes", -1) > 0:
+                self.downloaded_bytes.inc(data["bytes"])
+            elif data["phase"] == "move":
+                self.downloaded_files.inc()
+        elif event == "connection_stats":
+            stats = data.get("stats", {})
+            for kind in ["dns_lookups", "dns_cache_hits", "connections",
+                         "tls_handshakes", "tls_resumed"]:
+                if stats.get(kind):
+                    self.connection_setups.inc(stats[kind], kind=kind)
+            for stage, name in [("dns", "dns_seconds"),
+                                ("connect", "connect_seconds"),
+                                ("tls", "tls_seconds")]:
+                if stats.get(name):
+                    self.connection_setup_seconds.inc(stats[name], stage=stage)
+        elif event == "retry":
+            self.retries.inc(reason=data.get("reason", "request"))
+        elif event == "error":
+            self.errors.inc(
+                error_class=classify_error(data.get("message", "")))
+
+
+class ForkServer:
+    """Forks the job processes of `SidecarServer`.
+
+    A forked process only keeps the thread that called ``os.fork``, locks
+    held by other threads (the output forwarders, the metrics server or the
+    timers of `TauriHandler`) stay locked forever in the child. The fork
+    server is forked from the warmed up process while it has no other
+    thread, stays single-threaded and forks the jobs on request. It hands
+    back the pid and the read end of the output pipe of every job (over a
+    Unix socket) and reports their exit (over a pipe).
+    """
+
+    def __init__(self):
+        if threading.active_count() != 1:
+            raise RuntimeError("the fork server must start before any thread")
+        self._control, child_control = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        exits_read, exits_write = os.pipe()
+        self.pid = os.fork()
+        if self.pid == 0:
+            self._control.close()
+            os.close(exits_read)
+            self._serve(child_control, exits_write)
+        child_control.close()
+        os.close(exits_write)
+        self._control_lock = threading.Lock()
+        self._exits = {}  # job id -> (exit code, peak rss) of finished jobs
+        self._closed = False
+        self._exits_changed = threading.Condition()
+        threading.Thread(target=self._read_exits, args=(exits_read,),
+                         daemon=True).start()
+
+    def start_job(self, job_id, params):
+        """Returns the pid of the new job and the read end of its output."""
+        request = json.dumps({"job": job_id, "params": params}).encode()
+        with self._control_lock:
+            self._control.send(request)
+            reply, fds, _, _ = socket.recv_fds(self._control, 4096, 1)
+        if not reply:
+            raise RuntimeError("fork server exited")
+        reply = json.loads(reply)
+        if "error" in reply:
+            raise OSError(reply["error"])
+        return reply["pid"], fds[0]
+
+    def wait(self, job_id):
+        """Returns the exit code and the peak resident memory (in bytes) of
+           the job."""
+        with self._exits_changed:
+            self._exits_changed.wait_for(
+                lambda: job_id in self._exits or self._closed)
+            return self._exits.pop(job_id, (1, None))
+
+    def _read_exits(self, exits_read):
+        with open(exits_read, "r", encoding="utf-8") as pipe:
+            for line in pipe:
+                message = json.loads(line)
+                with self._exits_changed:
+                    self._exits[message["job"]] = (message["exit_code"],
+                                                   message["peak_rss"])
+                    self._exits_changed.notify_all()
+        # The fork server is gone, the remaining jobs are lost
+        with self._exits_changed:
+            self._closed = True
+            self._exits_changed.notify_all()
+
+    @staticmethod
+    def _serve(control, exits_write):
+        exit_code = 1
+        try:
+            with open(os.devnull, "r+") as devnull:
+                os.dup2(devnull.fileno(), 0)
+                os.dup2(devnull.fileno(), 1)
+            # Wakes up `select` when a job exits
+            wakeup_read, wakeup_write = os.pipe()
+            os.set_blocking(wakeup_read, False)
+            os.set_blocking(wakeup_write, False)
+            signal.set_wakeup_fd(wakeup_write)
+            signal.signal(signal.SIGCHLD, lambda *_: None)
+            jobs = {}  # pid -> job id
+            with open(exits_write, "w", encoding="utf-8") as exits:
+                while True:
+                    readable, _, _ = select.select(
+                        [control, wakeup_read], [], [])
+                    if wakeup_read in readable:
+                        try:
+                            while os.read(wakeup_read, 4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                    while jobs:
+                        pid, status, rusage = os.wait4(-1, os.WNOHANG)
+                        if pid == 0:
+                            break
+                        exits.write(json.dumps({
+                            "job": jobs.pop(pid),
+                            "exit_code": os.waitstatus_to_exitcode(status),
+                            # Kilobytes on Linux
+                            "peak_rss": rusage.ru_maxrss * 1024}) + "\n")
+                        exits.flush()
+                    if control not in readable:
+                        continue
+                    request = control.recv(2**20)
+                    if not request:
+                        # The server exited
+                        break
+                    request = json.loads(request)
+                    try:
+                        read_fd, write_fd = os.pipe()
+                    except OSError as e:
+                        control.send(json.dumps({"error": str(e)}).encode())
+                        continue
+                    try:
+                        pid = os.fork()
+                    except OSError as e:
+                        os.close(read_fd)
+                        os.close(write_fd)
+                        control.send(json.dumps({"error": str(e)}).encode())
+                        continue
+                    if pid == 0:
+                        control.close()
+                        exits.close()
+                        os.close(read_fd)
+                        signal.set_wakeup_fd(-1)
+                        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                        os.close(wakeup_read)
+                        os.close(wakeup_write)
+                        handler = TauriHandler(request["job"])
+                        configure_handler(handler, request["params"])
+                        SidecarServer._run_child(handler, write_fd)
+                    os.close(write_fd)
+                    jobs[pid] = request["job"]
+                    socket.send_fds(
+                        control, [json.dumps({"pid": pid}).encode()],
+                        [read_fd])
+                    os.close(read_fd)
+            for pid in jobs:
+                try:
+                    os.killpg(pid, signal.SIGTERM)
+                except OSError:
+                    pass
+            exit_code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(exit_code)
+
+
+class SidecarServer:
+    """Long-lived sidecar serving every download of the frontend.
+
+    The process imports and warms up yt-dlp once and announces itself with a
+    ``ready`` event. Each ``start_download`` request carries a job id and runs
+    in a child forked from the warmed process (through `ForkServer`), so jobs
+    don't share the working directory (``YoutubeDLSlave`` uses ``os.chdir``)
+    and can be cancelled by killing their process group. The server never
+    connects itself, the connection reuse of `install_connection_reuse` only
+    covers one job (the caches a child fills die with it), unless jobs run
+    inline without ``os.fork``. The output of every job is forwarded line by
+    line, tagged with its job id, and followed by a ``finished`` event that
+    continues the sequence numbers of the job.
+    With `metrics` (`SidecarMetrics`) the forwarded events are also counted.
+    """
+
+    def __init__(self, output=None, metrics=None, metrics_port=None):
+        self._output = output or sys.stdout
+        self._output_lock = threading.Lock()
+        self._jobs = {}  # job id -> pid
+        self._cancelled = set()
+        self._jobs_changed = threading.Condition()
+        self._fork_server = None
+        self.metrics = metrics
+        # Requested port of the metrics server, the actual one once it runs
+        self.metrics_port = metrics_port
+
+    def send(self, message):
+        self._write_line(json.dumps(message) + "\n")
+
+    def _write_line(self, line):
+        with self._output_lock:
+            self._output.write(line)
+            self._output.flush()
+
+    def serve(self, input_file=None):
+        # Once for the process, forked jobs inherit the patches
+        install_connection_reuse()
+        warm_up()
+        if hasattr(os, "fork"):
+            # Before any thread is started
+            self._fork_server = ForkServer()
+        if self.metrics and self.metrics_port is not None:
+            # Local HTTP endpoint for scrapers, see `SidecarMetrics`
+            metrics_server = MetricsServer(self.metrics.registry,
+                                           self.metrics_port).start()
+            self.metrics_port = metrics_server.port
+            trace("[PYTHON] 📈 Metrics on "
+                  f"http://127.0.0.1:{metrics_server.port}/metrics")
+        self.send({"event": "ready",
+                   "data": {"pid": os.getpid(), "protocol": PROTOCOL_VERSION,
+                            "metrics_port": self.metrics_port}})
+        trace("[PYTHON] 👂 Serving jobs from stdin...")
+        for line in input_file or sys.stdin:
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+            except json.JSONDecodeError as e:
+                self.send({"error": f"Invalid JSON: {e}"})
+                continue
+            try:
+                self.handle_request(req)
+            except Exception:
+                print("[PYTHON] ❌ Unexpected error: "
+                      f"{traceback.format_exc()}", file=sys.stderr,
+                      flush=True)
+                self.send({"error": traceback.format_exc(),
+                           "id": req.get("id")})
+        trace("[PYTHON] 🔚 Stdin closed, waiting for running jobs")
+        self.join()
+
+    def handle_request(self, req):
+        method = req.get("method")
+        params = req.get("params", {})
+        job_id = req.get("id")
+        if method == "ping":
+            self.send({"pong": True, "id": job_id})
+        elif method == "start_download":
+            if job_id is None:
+                raise ValueError("start_download requires an id")
+            self.start_job(str(job_id), params)
+        elif method == "cancel":
+            self.cancel_job(str(params.get("job", job_id)))
+        else:
+            self.send({"error": f"Unknown method: {method}", "id": job_id})
+
+    def start_job(self, job_id, params):
+        with self._jobs_changed:
+            if job_id in self._jobs:
+                raise ValueError(f"job already running: {job_id}")
+        handler = TauriHandler(job_id)
+        configure_handler(handler, params)
+        if self._fork_server is None:
+            # No way to isolate jobs, run them one after another
+            if self.metrics:
+                self.metrics.job_started(job_id)
+            success = run_download(handler)
+            if self.metrics:
+                self.metrics.job_finished(job_id, success)
+            self.send({"event": "finished", "job": job_id,
+                       "data": {"success": success},
+                       "seq": handler.seq + 1})
+            return
+        pid, read_fd = self._fork_server.start_job(job_id, params)
+        with self._jobs_changed:
+            self._jobs[job_id] = pid
+        if self.metrics:
+            self.metrics.job_started(job_id, pid)
+        threading.Thread(target=self._watch_job, args=(job_id, pid, read_fd),
+                         daemon=True).start()
+
+    @staticmethod
+    def _run_child(handler, write_fd):
+        exit_code = 1
+        try:
+            # Own process group to kill remaining children (e.g. ffmpeg)
+            os.setpgrp()
+            signal.signal(signal.SIGTERM, lambda *_: sys.exit(1))
+            with open(os.devnull, "r") as devnull:
+                os.dup2(devnull.fileno(), 0)
+            os.dup2(write_fd, 1)
+            os.close(write_fd)
+            # Fresh stream objects for the redirected file descriptors
+            sys.stdin = open(0, "r", closefd=False)
+            sys.stdout = open(1, "w", closefd=False)
+            sys.stderr = open(2, "w", closefd=False)
+            exit_code = 0 if run_download(handler) else 1
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                try:
+                    stream.flush()
+                except Exception:
+                    pass
+            # Skip cleanup handlers inherited from the server process
+            os._exit(exit_code)
+
+    def _watch_job(self, job_id, pid, read_fd):
+        last_seq = 0
+
+        def forward():
+            nonlocal last_seq
+            with open(read_fd, "r", encoding="utf-8",
+                      errors="replace") as pipe:
+                for line in pipe:
+                    if line.strip():
+                        try:
+                            last_seq = json.loads(line).get("seq", last_seq)
+                        except (ValueError, AttributeError):
+                            pass
+                        self._write_line(
+                            line if line.endswith("\n") else line + "\n")
+                        if self.metrics:
+                            self.metrics.observe_line(job_id, line)
+        reader = threading.Thread(target=forward, daemon=True)
+        reader.start()
+        exit_code, peak_rss = self._fork_server.wait(job_id)
+        # Kill remaining children identified by process group, they might keep
+        # the pipe open
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+        reader.join()
+        success = exit_code == 0
+        trace(f"[PYTHON] 🏁 Job {job_id} finished (success: {success})")
+        if self.metrics:
+            with self._jobs_changed:
+                cancelled = job_id in self._cancelled
+            self.metrics.job_finished(job_id, success, cancelled, peak_rss)
+        # Continues the sequence of the job, the child doesn't send one
+        self.send({"event": "finished", "job": job_id,
+                   "data": {"success": success}, "seq": last_seq + 1})
+        with self._jobs_changed:
+            del self._jobs[job_id]
+            self._cancelled.discard(job_id)
+            self._jobs_changed.notify_all()
+
+    def cancel_job(self, job_id):
+        with self._jobs_changed:
+            pid = self._jobs.get(job_id)
+            if pid is not None:
+                self._cancelled.add(job_id)
+        if pid is None:
+            self.send({"error": f"Unknown job: {job_id}", "id": job_id})
+            return
+        try:
+            os.killpg(pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+    def join(self):
+        with self._jobs_changed:
+            self._jobs_changed.wait_for(lambda: not self._jobs)
+
+
+def main(argv=None):
+    global DEBUG
+    argv = sys.argv[1:] if argv is None else argv
+    if "--debug" in argv:
+        DEBUG = True
+    trace("[PYTHON] 🚀 Sidecar starting...")
+    if "--serve" in argv:
+        metrics_port = os.environ.get("VDL_METRICS_PORT")
+        if "--metrics-port" in argv:
+            metrics_port = argv[argv.index("--metrics-port") + 1]
+        metrics = None
+        if metrics_port:
+            metrics = SidecarMetrics()
+            metrics_port = int(metrics_port)
+        else:
+            metrics_port = None
+        SidecarServer(metrics=metrics, metrics_port=metrics_port).serve()
+        return
+
+    install_connection_reuse()
     handler = TauriHandler()
-    
-    print("[PYTHON] 👂 Listening for commands on stdin...", file=sys.stderr, flush=True)
+
+    trace("[PYTHON] 👂 Listening for commands on stdin...")
     # Listen for commands from Tauri (stdin)
     for line in sys.stdin:
-        print(f"[PYTHON] 📥 Received command: {line.strip()}", file=sys.stderr, flush=True)
+        trace(f"[PYTHON] 📥 Received command: {line.strip()}")
         try:
             req = json.loads(line)
             method = req.get("method")
             params = req.get("params", {})
-            print(f"[PYTHON] 📋 Method: {method} | Params: {params}", file=sys.stderr, flush=True)
+            trace(f"[PYTHON] 📋 Method: {method} | Params: {params}")
             
             if method == "start_download":
-                handler.url = params.get("url")
-                handler.mode = params.get("mode", "video")
-                handler.resolution = params.get("resolution", 1080)
-                handler.download_dir = params.get("download_dir", handler.download_dir)
-                
-                print(f"[PYTHON] 🔧 Download config:", file=sys.stderr, flush=True)
-                print(f"[PYTHON]    URL: {handler.url}", file=sys.stderr, flush=True)
-                print(f"[PYTHON]    Mode: {handler.mode}", file=sys.stderr, flush=True)
-                print(f"[PYTHON]    Resolution: {handler.resolution}p", file=sys.stderr, flush=True)
-                print(f"[PYTHON]    Output dir: {handler.download_dir}", file=sys.stderr, flush=True)
-                
-                # Run the slave
-                print("[PYTHON] 🎬 Starting YoutubeDLSlave...", file=sys.stderr, flush=True)
-                try:
-                    YoutubeDLSlave(handler)
-                    print("[PYTHON] ✅ YoutubeDLSlave completed", file=sys.stderr, flush=True)
-                except Exception as e:
-                    print(f"[PYTHON] ❌ YoutubeDLSlave error: {e}", file=sys.stderr, flush=True)
-                    print(f"[PYTHON] 📜 Traceback: {traceback.format_exc()}", file=sys.stderr, flush=True)
-                    handler.on_error(str(e))
+                configure_handler(handler, params)
+                run_download(handler)
             elif method == "ping":
-                print("[PYTHON] 🏓 Ping received, sending pong", file=sys.stderr, flush=True)
+                trace("[PYTHON] 🏓 Ping received, sending pong")
                 print(json.dumps({"pong": True}), flush=True)
             else:
-                print(f"[PYTHON] ❓ Unknown method: {method}", file=sys.stderr, flush=True)
+                trace(f"[PYTHON] ❓ Unknown method: {method}")
                 
         except json.JSONDecodeError as e:
             print(f"[PYTHON] ❌ JSON parse error: {e}", file=sys.stderr, flush=True)
@@ -132,8 +771,8 @@ def main():
             print(f"[PYTHON] ❌ Unexpected error: {traceback.format_exc()}", file=sys.stderr, flush=True)
             print(json.dumps({"error": traceback.format_exc()}), flush=True)
     
-    print("[PYTHON] 🔚 Stdin closed, sidecar exiting", file=sys.stderr, flush=True)
+    trace("[PYTHON] 🔚 Stdin closed, sidecar exiting")
 
 if __name__ == "__main__":
-    print("[PYTHON] ⚡ __main__ entry point", file=sys.stderr, flush=True)
+    trace("[PYTHON] ⚡ __main__ entry point")
     main()
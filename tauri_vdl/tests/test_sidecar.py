@@ -50,3 +50,178 @@ def test_sidecar_handler_emit():
     output = json.loads(f.getvalue().strip())
     assert output["event"] == "test_event"
     assert output["data"] == {"foo": "bar"}
+
+
+def test_sidecar_serve_handshake_and_jobs():
+    sidecar_path = os.path.abspath(os.path.join(
+        os.path.dirname(__file__), "..", "src_python", "sidecar.py"))
+    process = subprocess.Popen(
+        [sys.executable, sidecar_path, "--serve"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    # The handshake arrives before any request is sent
+    ready = json.loads(process.stdout.readline())
+    assert ready["event"] == "ready"
+    assert ready["data"]["pid"] == process.pid
+
+    # Port 9 (discard) is closed, both jobs fail without network access
+    requests = [
+        {"method": "ping", "id": "p"},
+        {"method": "start_download", "id": "a",
+         "params": {"url": "http://127.0.0.1:9/a"}},
+        {"method": "start_download", "id": "b",
+         "params": {"url": "http://127.0.0.1:9/b"}},
+    ]
+    stdout, _ = process.communicate(
+        input="".join(json.dumps(r) + "\n" for r in requests), timeout=30)
+    results = [json.loads(line) for line in stdout.splitlines()
+               if line.strip()]
+
+    assert {"pong": True, "id": "p"} in results
+    finished = {r["job"]: r["data"]["success"] for r in results
+                if r.get("event") == "finished"}
+    assert finished == {"a": False, "b": False}
+    # "finished" is the last message of each job, in sequence
+    for job in "ab":
+        seqs = [r["seq"] for r in results if r.get("job") == job]
+        assert seqs == list(range(1, len(seqs) + 1))
+        assert [r for r in results if r.get("job") == job][-1][
+            "event"] == "finished"
+    errors = [r for r in results if r.get("event") == "error"]
+    assert {r["job"] for r in errors} == {"a", "b"}
+
+
+def test_handler_coalesces_progress_and_pulses():
+    from tauri_vdl.src_python.sidecar import TauriHandler
+    import io
+    from contextlib import redirect_stdout
+    handler = TauriHandler(job_id="j", interval=60)
+    f = io.StringIO()
+    with redirect_stdout(f):
+        for i in range(1000):
+            handler.on_progress("video.mp4", i / 1000, i, 1000, 1, 1)
+            handler.on_pulse()
+        handler.on_download_finished("video.mp4")
+    results = [json.loads(line) for line in f.getvalue().splitlines()]
+
+    # First progress goes out directly, everything else within the interval
+    # is merged and flushed before the next regular event
+    assert [r["event"] for r in results] == [
+        "progress", "batch", "download_finished"]
+    assert [r["seq"] for r in results] == [1, 2, 3]
+    assert all(r["job"] == "j" for r in results)
+    batch = {e["event"]: e["data"] for e in results[1]["data"]["events"]}
+    assert batch["progress"]["bytes"] == 999
+    assert batch["pulse"]["count"] == 1000
+
+
+def test_handler_flushes_pending_events_after_interval():
+    from tauri_vdl.src_python.sidecar import TauriHandler
+    import io
+    from contextlib import redirect_stdout
+    handler = TauriHandler(interval=0.05)
+    f = io.StringIO()
+    with redirect_stdout(f):
+        handler.on_progress("video.mp4", 0.1, 1, 10, 1, 1)
+        handler.on_progress("video.mp4", 0.2, 2, 10, 1, 1)
+        time.sleep(0.5)
+    results = [json.loads(line) for line in f.getvalue().splitlines()]
+    assert [r["data"]["bytes"] for r in results] == [1, 2]
+    assert [r["seq"] for r in results] == [1, 2]
+
+
+def test_metrics_count_job_events():
+    from tauri_vdl.src_python.sidecar import SidecarMetrics
+    metrics = SidecarMetrics()
+    metrics.job_started("j")
+    for event in [
+        {"event": "phase_start", "data": {
+            "index": 0, "phase": "download", "timestamp": 1.0}},
+        {"event": "batch", "data": {"events": [
+            {"event": "pulse", "data": {"count": 3}},
+            {"event": "retry", "data": {"reason": "fragment"}}]}},
+        {"event": "phase_end", "data": {
+            "index": 0, "phase": "download", "timestamp": 3.5,
+            "bytes": 4096}},
+        {"event": "error", "data": {
+            "message": "ERROR: Unable to download webpage: "
+                       "HTTP Error 404: Not Found"}},
+        {"event": "connection_stats", "data": {"index": 0, "stats": {
+            "dns_lookups": 1, "dns_cache_hits": 4, "dns_seconds": 0.5,
+            "connections": 2, "connect_seconds": 0.25,
+            "tls_handshakes": 2, "tls_resumed": 1, "tls_seconds": 0.75}}},
+    ]:
+        metrics.observe_line("j", json.dumps(event))
+    metrics.job_finished("j", False)
+
+    text = metrics.registry.render()
+    assert text.endswith("# EOF\n")
+    lines = text.splitlines()
+    assert 'vdl_jobs_finished_total{result="failure"} 1' in lines
+    assert "vdl_downloaded_bytes_total 4096" in lines
+    assert 'vdl_retries_total{reason="fragment"} 1' in lines
+    assert 'vdl_job_errors_total{error_class="http_404"} 1' in lines
+    assert ('vdl_phase_duration_seconds_bucket{phase="download",le="5.0"} 1'
+            in lines)
+    assert ('vdl_phase_duration_seconds_bucket{phase="download",le="1.0"} 0'
+            in lines)
+    assert 'vdl_phase_duration_seconds_sum{phase="download"} 2.5' in lines
+    assert "vdl_jobs_active 0" in lines
+    assert 'vdl_connection_setups_total{kind="dns_cache_hits"} 4' in lines
+    assert 'vdl_connection_setups_total{kind="tls_resumed"} 1' in lines
+    assert 'vdl_connection_setup_seconds_total{stage="tls"} 0.75' in lines
+
+
+def test_sidecar_serve_exposes_metrics():
+    import urllib.request
+    sidecar_path = os.path.abspath(os.path.join(
+        os.path.dirname(__file__), "..", "src_python", "sidecar.py"))
+    process = subprocess.Popen(
+        [sys.executable, sidecar_path, "--serve", "--metrics-port", "0"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    try:
+        ready = json.loads(process.stdout.readline())
+        port = ready["data"]["metrics_port"]
+        assert port
+        process.stdin.write(json.dumps({
+            "method": "start_download", "id": "a",
+            "params": {"url": "http://127.0.0.1:9/a"}}) + "\n")
+        process.stdin.flush()
+        for line in process.stdout:
+            if json.loads(line).get("event") == "finished":
+                break
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics",
+                                    timeout=10) as response:
+            assert response.headers["Content-Type"].startswith(
+                "application/openmetrics-text")
+            lines = response.read().decode().splitlines()
+        assert "vdl_jobs_started_total 1" in lines
+        assert 'vdl_jobs_finished_total{result="failure"} 1' in lines
+        assert any(line.startswith("vdl_job_errors_total{") for line in lines)
+        assert any(line.startswith(
+            "vdl_worker_peak_resident_memory_bytes_count 1")
+            for line in lines)
+    finally:
+        process.stdin.close()
+        process.wait(timeout=30)
+
+
+def test_fork_server_requires_single_thread():
+    import threading
+    from tauri_vdl.src_python.sidecar import ForkServer
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait)
+    thread.start()
+    try:
+        with pytest.raises(RuntimeError):
+            ForkServer()
+    finally:
+        stop.set()
+        thread.join()
@@ -1,6 +1,7 @@
 import os
 import sys
 import gi
+import pytest
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 
@@ -27,3 +28,18 @@ def pytest_sessionstart(session):
     schema_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
     if os.path.exists(os.path.join(schema_dir, "gschemas.compiled")):
         os.environ["GSETTINGS_SCHEMA_DIR"] = schema_dir
+
+
+class Clock:
+    """Fake of `time.monotonic` and `time.time`, returns `now`."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
@@ -0,0 +1,158 @@
+import pytest
+from video_downloader.app import download_manager as download_manager_module
+from video_downloader.app.download_manager import DownloadManager
+from video_downloader.app.parallelism import ParallelismController
+
+
+class FakeDownloader:
+    running = []
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def start(self):
+        self.running.append(self)
+
+    def cancel(self):
+        self.running.remove(self)
+        self.handler.on_finished(False)
+
+    def destroy(self):
+        if self in self.running:
+            self.running.remove(self)
+
+
+class Handler:
+    def __init__(self, manager=None):
+        self.manager = manager
+        self.finished = []
+        self.queued = []
+        self.retries = []
+        self.queued_jobs_when_finished = []
+
+    def on_finished(self, success):
+        self.finished.append(success)
+        if self.manager is not None:
+            self.queued_jobs_when_finished.append(self.manager.queued_jobs)
+
+    def get_url(self):
+        return "https://example.com/video"
+
+    def on_retry(self, reason, error_class):
+        self.retries.append((reason, error_class))
+
+
+@pytest.fixture
+def running(monkeypatch):
+    monkeypatch.setattr(download_manager_module.downloader, "Downloader",
+                        FakeDownloader)
+    monkeypatch.setattr(FakeDownloader, "running", [])
+    return FakeDownloader.running
+
+
+def test_download_manager_limits_active_jobs(running, monkeypatch):
+    idle_callbacks = []
+    monkeypatch.setattr(download_manager_module.GLib, "idle_add",
+                        lambda func, *args: idle_callbacks.append(
+                            (func, args)))
+    manager = DownloadManager(max_active_jobs=2)
+    handlers = [Handler(manager) for _ in range(5)]
+    jobs = [manager.create_job(h, h.queued.append) for h in handlers]
+    for job in jobs:
+        job.start()
+    assert [d.handler for d in running] == jobs[:2]
+    assert (manager.active_jobs, manager.queued_jobs) == (2, 3)
+    assert [h.queued for h in handlers] == [[], [], [True], [True], [True]]
+    # Requests of the worker go to the handler of the job
+    assert jobs[0].get_url() == "https://example.com/video"
+    # Finished jobs free their worker for the next job in the queue
+    running.pop(0).handler.on_finished(True)
+    assert handlers[0].finished == [True]
+    # The handler is notified after the next job left the queue
+    assert handlers[0].queued_jobs_when_finished == [2]
+    assert [d.handler for d in running] == [jobs[1], jobs[2]]
+    assert handlers[2].queued == [True, False]
+    # Cancelled jobs leave the queue without starting a worker
+    jobs[4].cancel()
+    assert handlers[4].queued == [True, False]
+    # Not within the cancel request of the handler
+    assert handlers[4].finished == []
+    for func, args in idle_callbacks:
+        func(*args)
+    assert handlers[4].finished == [False]
+    jobs[1].cancel()
+    assert [d.handler for d in running] == [jobs[2], jobs[3]]
+    assert manager.queued_jobs == 0
+    manager.close()
+    assert running == []
+
+
+def test_parallelism_controller_aimd(clock):
+    queued = [2]
+    controller = ParallelismController(
+        items=1, fragments=1, queued_items=lambda: queued[0], interval=5,
+        clock=clock)
+
+    def progress(now, speed, key="a"):
+        clock.now = now
+        controller.progress(key, speed)
+    progress(0, 1000)
+    # Increases once per interval while the throughput improves, items
+    # only while jobs wait for a worker
+    progress(5, 1000)
+    assert (controller.items, controller.fragments) == (2, 1)
+    progress(10, 2000)
+    assert (controller.items, controller.fragments) == (2, 1)
+    progress(15, 2000)
+    assert (controller.items, controller.fragments) == (3, 1)
+    queued[0] = 0
+    progress(15, 2000, key="b")
+    progress(20, 2000, key="b")
+    assert (controller.items, controller.fragments) == (3, 2)
+    # Overload halves both limits, once per interval
+    controller.error("a", "http_503")
+    assert (controller.items, controller.fragments) == (1, 1)
+    assert controller.decisions[-1].reason == "http_503"
+    controller.items = controller.fragments = 4
+    clock.now = 21
+    controller.error("a", "http_429")
+    controller.error("a", "unavailable")
+    assert (controller.items, controller.fragments) == (4, 4)
+    clock.now = 25
+    controller.error("a", "http_429")
+    assert (controller.items, controller.fragments) == (2, 2)
+    assert [d.reason for d in controller.decisions] == [
+        "increase", "increase", "increase", "http_503", "http_429"]
+
+
+def test_parallelism_controller_latency(clock):
+    controller = ParallelismController(items=4, fragments=4, interval=5,
+                                       clock=clock)
+    for start, latency in [(0, 1), (10, 3)]:
+        clock.now = start
+        controller.item_started("a")
+        clock.now = start + latency
+        controller.progress("a", 1000)
+        clock.now = start + 5
+        controller.progress("a", 1000)
+    assert (controller.items, controller.fragments) == (2, 2)
+    assert controller.decisions[-1].reason == "latency"
+
+
+def test_download_manager_adaptive(running):
+    manager = DownloadManager(max_active_jobs=1, adaptive=True)
+    handlers = [Handler() for _ in range(3)]
+    jobs = [manager.create_job(h) for h in handlers]
+    for job in jobs:
+        job.start()
+    assert len(running) == 1
+    assert jobs[0].get_concurrent_fragments() == 1
+    controller = manager.controller
+    controller.items = 2
+    controller._callback()
+    assert manager.max_active_jobs == 2 and len(running) == 2
+    # Errors of the worker reach the handler and the controller
+    jobs[0].on_retry("fragment", "http_429")
+    assert handlers[0].retries == [("fragment", "http_429")]
+    assert manager.max_active_jobs == 1
+    manager.close()
@@ -79,3 +79,89 @@ def test_model_resolutions_content():
     assert 1080 in model.resolutions
     assert 720 in model.resolutions
     assert "1080p" in model.resolutions[1080]
+
+
+def test_model_collects_download_timings(tmp_path):
+    import json
+    handler = MockHandler()
+    model = Model(handler)
+    model.download_folder = str(tmp_path)
+    model.state = "prepare"
+    assert model.state == "download"
+    model.on_phase_start(-1, "probe", 10.0)
+    model.on_phase_end(-1, "probe", 10.5, -1)
+    model.on_download_start(0, 1, "Title")
+    model.on_phase_start(0, "download", 11.0)
+    model.on_phase_end(0, "download", 13.0, 1000)
+    model.on_phase_start(0, "postprocess", 13.0)
+
+    timings = model.get_download_timings()
+    assert [(p["phase"], p["title"], p["duration"], p["bytes"])
+            for p in timings["phases"]] == [
+        ("probe", None, 0.5, -1),
+        ("download", "Title", 2.0, 1000),
+        ("postprocess", "Title", None, -1)]
+    assert timings["totals"]["download"] == {
+        "count": 1, "duration": 2.0, "bytes": 1000}
+    model.export_download_timings(tmp_path / "timings.json")
+    assert json.loads((tmp_path / "timings.json").read_text()) == timings
+    model.destroy()
+
+
+def test_model_appends_to_list_models(tmp_path):
+    from video_downloader.util import list_model_strings
+    handler = MockHandler()
+    model = Model(handler)
+    model.download_folder = str(tmp_path)
+    model.state = "prepare"
+    model.on_download_start(0, 2, "A")
+    model.on_download_finished("A.mp4")
+    changes = []
+    model.download_titles.connect(
+        "items-changed", lambda _, *change: changes.append(change))
+    model.on_download_start(1, 2, "B")
+    assert changes == [(1, 0, 1)]
+    assert list_model_strings(model.download_titles) == ["A", "B"]
+    assert list_model_strings(model.finished_download_filenames) == ["A.mp4"]
+    model.state = "success"
+    model.state = "start"
+    model.state = "prepare"
+    assert model.download_titles.get_n_items() == 0
+    assert model.finished_download_filenames.get_n_items() == 0
+    model.destroy()
+
+
+def test_model_coalesces_progress(tmp_path):
+    handler = MockHandler()
+    model = Model(handler)
+    model.download_folder = str(tmp_path)
+    model.state = "prepare"
+    snapshots = []
+    notified = []
+    model.connect("progress-changed", lambda _, p: snapshots.append(p))
+    model.connect("notify::download-bytes",
+                  lambda *_: notified.append(model.download_bytes))
+    for i in range(100):
+        model.on_progress("video.mp4", i / 100, i, 100, 1, 1000)
+    assert snapshots == []
+    context = GLib.MainContext.default()
+    while not snapshots:
+        context.iteration(True)
+    assert [p.bytes_ for p in snapshots] == [99]
+    assert notified == [99]
+    assert model.download_progress == 0.99
+    model.destroy()
+
+
+def test_model_accepts_multiple_urls():
+    model = Model(MockHandler())
+    download_action = model.actions.lookup_action("download")
+    model.url = " https://example.com/a\nhttps://example.com/b "
+    assert model.urls == ["https://example.com/a", "https://example.com/b"]
+    assert download_action.get_enabled()
+    model.urls = ["https://example.com/c"]
+    assert model.url == "https://example.com/c"
+    model.url = " \n"
+    assert model.urls == []
+    assert not download_action.get_enabled()
+    model.destroy()
@@ -0,0 +1,112 @@
+import socket
+
+import pytest
+from video_downloader.downloader import network
+from video_downloader.downloader.network import (ConnectionStats, DnsCache,
+                                                 TlsSessionCache)
+
+
+def test_dns_cache_expires_and_evicts(clock):
+    lookups = []
+
+    def resolve(host, port, *args, **kwargs):
+        lookups.append(host)
+        if host == "invalid":
+            raise socket.gaierror("not found")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (host, port))]
+    stats = ConnectionStats()
+    cache = DnsCache(resolve, ttl=60, max_size=2, stats=stats, clock=clock)
+    result = cache.getaddrinfo("a", 443, type=socket.SOCK_STREAM)
+    assert cache.getaddrinfo("a", 443, type=socket.SOCK_STREAM) == result
+    # Arguments are part of the key
+    cache.getaddrinfo("a", 80, type=socket.SOCK_STREAM)
+    assert lookups == ["a", "a"]
+    # Failures are not cached
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            cache.getaddrinfo("invalid", 443)
+    assert lookups == ["a", "a", "invalid", "invalid"]
+    clock.now = 60
+    cache.getaddrinfo("a", 443, type=socket.SOCK_STREAM)
+    cache.getaddrinfo("b", 443)
+    # Least recently used entry ("a", 80) was evicted
+    cache.getaddrinfo("a", 80, type=socket.SOCK_STREAM)
+    assert lookups[4:] == ["a", "b", "a"]
+    values = stats.take()
+    assert (values["dns_lookups"], values["dns_cache_hits"]) == (5, 1)
+    assert stats.take()["dns_lookups"] == 0
+
+
+class FakeContext:
+    pass
+
+
+class FakeSocket:
+    def __init__(self, session):
+        self.session = session
+
+
+def test_tls_session_cache_prefers_latest_session():
+    cache = TlsSessionCache(max_size=1)
+    context, other_context = FakeContext(), FakeContext()
+    assert cache.get(context, "a") is None
+    sock = FakeSocket("handshake")
+    cache.put(context, "a", sock)
+    # TLS 1.3 tickets arrive later, the open socket has the newer session
+    sock.session = "ticket"
+    assert cache.get(context, "a") == "ticket"
+    assert cache.get(other_context, "a") is None
+    # Sessions stay usable after the socket is gone
+    del sock
+    assert cache.get(context, "a") == "ticket"
+    cache.put(context, "b", FakeSocket("b"))
+    assert cache.get(context, "a") is None
+
+
+def test_yt_dlp_internals_exist():
+    # The patches are skipped without them, connections aren't reused
+    common = pytest.importorskip("yt_dlp.networking.common")
+    _urllib = pytest.importorskip("yt_dlp.networking._urllib")
+    assert [name for name in network.REQUEST_HANDLER_METHODS
+            if not hasattr(common.RequestHandler, name)] == []
+    handler = _urllib.UrllibRH(logger=None)
+    try:
+        assert [name for name in network.REQUEST_HANDLER_ATTRIBUTES
+                if not hasattr(handler, name)] == []
+    finally:
+        handler.close()
+    try:
+        from yt_dlp.networking import _requests
+    except ImportError:
+        return
+    assert [name for name in network.REQUESTS_HANDLER_METHODS
+            if not hasattr(_requests.RequestsRH, name)] == []
+    adapter = _requests.RequestsHTTPAdapter(ssl_context=None)
+    assert [name for name in network.REQUESTS_ADAPTER_ATTRIBUTES
+            if not hasattr(adapter, name)] == []
+
+
+def test_ssl_context_sharing_falls_back(monkeypatch):
+    common = pytest.importorskip("yt_dlp.networking.common")
+    created = []
+
+    def make_sslcontext(self, legacy_ssl_support=None):
+        created.append(legacy_ssl_support)
+        return object()
+    monkeypatch.setattr(common.RequestHandler, "_make_sslcontext",
+                        make_sslcontext)
+    monkeypatch.setattr(network, "_ssl_contexts", {})
+    network._share_ssl_contexts()
+
+    class Handler:
+        verify = True
+        legacy_ssl_support = False
+        prefer_system_certs = False
+        _client_cert = {}
+
+    make = common.RequestHandler._make_sslcontext
+    assert make(Handler()) is make(Handler())
+    # Attributes of another version of yt-dlp, contexts aren't shared
+    del Handler._client_cert
+    assert make(Handler()) is not make(Handler())
+    assert created == [False, False, False]
@@ -21,6 +21,20 @@ def test_get_version_returns_string():
     assert version != ""
 
 
+def test_get_version_detects_once(monkeypatch):
+    calls = []
+
+    def detect_version():
+        calls.append(None)
+        return "1.2.3"
+    # Undetected, restored after the test
+    monkeypatch.setattr(video_downloader, "__version__", None, raising=False)
+    monkeypatch.setattr(video_downloader, "_detect_version", detect_version)
+    assert video_downloader.get_version() == "1.2.3"
+    assert video_downloader.get_version() == "1.2.3"
+    assert len(calls) == 1
+
+
 def test_legacy_modules_remain_importable():
     for name in [
         "about_dialog",
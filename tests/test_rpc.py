@@ -1,6 +1,10 @@
+import collections
 import json
 import io
 import pytest
+from video_downloader import downloader as downloader_module
+from video_downloader.downloader import STDERR_LOG_LINES, Downloader
+from video_downloader.util.framing import LineReader
 from video_downloader.util.rpc import RpcClient, handle_rpc_request, rpc_response
 
 class MockInterface:
@@ -41,3 +45,69 @@ def test_rpc_client_output():
     sent_request = json.loads(output.read())
     assert sent_request["method"] == "test_method"
     assert sent_request["args"] == ["arg1", 2]
+
+
+def test_rpc_client_sends_trace_context():
+    output = io.StringIO()
+    contexts = iter(["00-%s-%s-01" % ("a" * 32, "b" * 16), None])
+    client = RpcClient(output, trace_context=lambda: next(contexts))
+    client.first()
+    client.second()
+
+    first, second = map(json.loads, output.getvalue().splitlines())
+    assert first["trace"] == "00-%s-%s-01" % ("a" * 32, "b" * 16)
+    assert "trace" not in second
+    assert handle_rpc_request(MockInterface, MockInterface(), json.dumps(
+        {"method": "add", "args": [1, 2], "trace": first["trace"]})) == 3
+
+
+class _FakeStderr:
+    encoding = "utf-8"
+
+    def __init__(self, chunks):
+        self.buffer = self
+        self._chunks = list(chunks)
+
+    def read(self):
+        return self._chunks.pop(0) if self._chunks else b""
+
+
+class _FakeProcess:
+    trace_id = "f" * 32
+    log_stderr = cancelled = False
+    last_pulse = 0
+
+    def __init__(self, chunks):
+        self.stderr = _FakeStderr(chunks)
+        self.stderr_reader = LineReader()
+        self.stderr_log = collections.deque(maxlen=STDERR_LOG_LINES)
+
+
+def test_downloader_keeps_stderr_in_ring_buffer(monkeypatch):
+    logged = []
+    monkeypatch.setattr(downloader_module, "g_log",
+                        lambda *args: logged.append(args))
+
+    class Handler:
+        pulses = 0
+
+        def on_pulse(self):
+            self.pulses += 1
+    handler = Handler()
+    downloader = Downloader(handler)
+    lines = [b"[download] %d%%\r" % i for i in range(STDERR_LOG_LINES * 2)]
+    process = _FakeProcess(b"".join(lines[i:i + 10])
+                           for i in range(0, len(lines), 10))
+    downloader._process = process
+    downloader._stderr_log = process.stderr_log
+    while downloader._on_process_stderr(None, None, process):
+        pass
+    # Lines are only formatted for the log with debug logging enabled
+    assert logged == []
+    # Bursts of output pulse once
+    assert handler.pulses == 1
+    assert downloader.stderr_log == [
+        line.decode().rstrip("\r") for line in lines[-STDERR_LOG_LINES:]]
+    downloader.dump_stderr_log()
+    assert len(logged) == 1 and logged[0][0] == "yt-dlp"
+    assert logged[0][-1].endswith("[download] %d%%" % (len(lines) - 1))
@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("Cryptodome")
+
+from video_downloader.downloader.sessions import (  # noqa: E402
+    KEY_SIZE, Session, SessionStore, forget_all, session_host)
+
+KEY = bytes(KEY_SIZE)
+
+
+def test_session_host():
+    assert session_host("WWW.Example.com.") == "example.com"
+    assert session_host("m.example.com") == "m.example.com"
+    assert session_host(None) is None
+
+
+def test_session_store(tmp_path, clock):
+    store = SessionStore(str(tmp_path), KEY, max_age=10, clock=clock)
+    assert store.load("example.com") is None
+    session = Session("# Netscape HTTP Cookie File\n", "user", "secret")
+    store.save("example.com", session)
+    assert store.load("example.com") == session
+    # Encrypted, the host isn't part of the file name
+    (path,) = [p for p in tmp_path.iterdir() if p.suffix == ".session"]
+    assert b"secret" not in path.read_bytes()
+    assert "example" not in path.name
+    # The key isn't stored with the sessions
+    assert [p.suffix for p in tmp_path.iterdir()] == [".session"]
+    assert SessionStore(str(tmp_path), KEY, clock=clock).load(
+        "example.com") == session
+    # Other keys can't read them
+    other_key = bytes([1]) * KEY_SIZE
+    assert SessionStore(str(tmp_path), other_key, clock=clock).load(
+        "example.com") is None
+    # Files of other hosts are rejected
+    store.save("other.com", Session("#HttpOnly_.other.com\tTRUE\t/\t..."))
+    (other_path,) = [p for p in tmp_path.iterdir()
+                     if p.suffix == ".session" and p != path]
+    other_path.write_bytes(path.read_bytes())
+    assert store.load("other.com") is None
+    assert not other_path.exists()
+    # Empty sessions aren't kept
+    store.save("other.com", Session("# Netscape HTTP Cookie File\n"))
+    assert not other_path.exists()
+    # Expired sessions are discarded
+    store.save("example.com", session)
+    clock.now = 11
+    assert store.load("example.com") is None
+    assert not path.exists()
+
+
+def test_session_store_invalid_key(tmp_path):
+    with pytest.raises(ValueError):
+        SessionStore(str(tmp_path), bytes(KEY_SIZE - 1))
+
+
+def test_forget_all(tmp_path, clock):
+    directory = tmp_path / "sessions"
+    store = SessionStore(str(directory), KEY, clock=clock)
+    store.save("example.com", Session(username="user", password="secret"))
+    forget_all(str(directory))
+    assert not directory.exists()
+    # Nothing to forget
+    forget_all(str(directory))
+
+
+def test_session_store_truncated(tmp_path, clock):
+    store = SessionStore(str(tmp_path), KEY, clock=clock)
+    store.save("example.com", Session(username="user", password="secret"))
+    (path,) = [p for p in tmp_path.iterdir() if p.suffix == ".session"]
+    data = path.read_bytes()
+    for size in (0, 5, 27, len(data) - 1):
+        path.write_bytes(data[:size])
+        assert store.load("example.com") is None
+        assert not path.exists()
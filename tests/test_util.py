@@ -1,13 +1,149 @@
+import json
 import os
+import random
+import re
+import subprocess
+import time
 import pytest
-from video_downloader.util.path import expand_path, encode_filesystem_path
-from video_downloader.util.logging import StructuredLogger
+from video_downloader.util import path as path_module
+from video_downloader.util.path import (
+    XdgUserDirs, encode_filesystem_path, expand_path)
+from video_downloader.util.logging import AsyncFileSink, StructuredLogger
+from video_downloader.util.masking import SecretMasker
+from video_downloader.util.metrics import MetricsRegistry, classify_error
+from video_downloader.util import thumbnail as thumbnail_module
+from video_downloader.util.framing import LineReader
+from video_downloader.util.startup import StartupProfiler
+from video_downloader.util.thumbnail import ThumbnailLoader
+from video_downloader.util.trace import (
+    TraceFile, Tracer, format_traceparent, parse_traceparent)
 
 def test_expand_path_basic():
     path = "~/Downloads"
     expanded = expand_path(path)
     assert expanded == os.path.expanduser("~") + "/Downloads"
 
+
+def test_xdg_user_dirs_parse():
+    dirs = XdgUserDirs.parse(
+        '# comment\n'
+        'XDG_DOWNLOAD_DIR="$HOME/My \\"Downloads\\""\n'
+        'XDG_MUSIC_DIR="/srv/music"\n',
+        "/home/user")
+    assert dirs == {"DOWNLOAD": '/home/user/My "Downloads"',
+                    "MUSIC": "/srv/music"}
+    # Anything needing a shell is left to xdg-user-dir
+    assert XdgUserDirs.parse(
+        'XDG_MUSIC_DIR="$(pwd)/music"\n', "/home/user") is None
+    assert XdgUserDirs.parse("export FOO=1\n", "/home/user") is None
+
+
+def test_expand_path_xdg_without_subprocess(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    monkeypatch.delenv("XDG_MUSIC_DIR", raising=False)
+    (tmp_path / "user-dirs.dirs").write_text('XDG_DOWNLOAD_DIR="/data/dl"\n')
+
+    def check_output(*args, **kwargs):
+        raise AssertionError("xdg-user-dir must not be spawned")
+    monkeypatch.setattr(subprocess, "check_output", check_output)
+    monkeypatch.setattr(path_module, "_xdg_user_dirs", XdgUserDirs())
+
+    for _ in range(100):
+        assert expand_path("xdg-download/VideoDownloader") == (
+            "/data/dl/VideoDownloader")
+    assert expand_path("xdg-music") == os.path.expanduser("~")
+    assert expand_path("xdg-desktop") == os.path.expanduser("~/Desktop")
+
+
+def test_expand_path_xdg_falls_back_to_subprocess(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    (tmp_path / "user-dirs.dirs").write_text('XDG_DOWNLOAD_DIR="$(pwd)"\n')
+    calls = []
+
+    def check_output(args, **kwargs):
+        calls.append(args)
+        return "/from/xdg-user-dir\n"
+    monkeypatch.setattr(subprocess, "check_output", check_output)
+    monkeypatch.setattr(path_module, "_xdg_user_dirs", XdgUserDirs())
+
+    assert expand_path("xdg-download") == "/from/xdg-user-dir"
+    assert calls == [["xdg-user-dir", "DOWNLOAD"]]
+
+
+def test_xdg_user_dirs_invalidate_reloads_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path))
+    config = tmp_path / "user-dirs.dirs"
+    config.write_text('XDG_DOWNLOAD_DIR="/old"\n')
+    resolver = XdgUserDirs()
+    assert resolver.lookup("DOWNLOAD") == "/old"
+    config.write_text('XDG_DOWNLOAD_DIR="/new"\n')
+    # Cached until the file monitor reports the change
+    assert resolver.lookup("DOWNLOAD") == "/old"
+    resolver.invalidate()
+    assert resolver.lookup("DOWNLOAD") == "/new"
+
+
+def test_open_in_file_manager_reuses_proxies_and_falls_back(tmp_path,
+                                                            monkeypatch):
+    GLib = path_module.GLib
+
+    class Proxy:
+        def __init__(self, interface):
+            self.interface = interface
+
+        def call(self, method, parameters, flags, timeout, cancellable,
+                 callback):
+            calls.append((self.interface, method, parameters, timeout))
+            callback(self, None)
+
+        def call_with_unix_fd_list(self, method, parameters, flags, timeout,
+                                   fdlist, cancellable, callback):
+            self.call(method, parameters, flags, timeout, cancellable,
+                      callback)
+
+        def call_finish(self, result):
+            if self.interface == "org.freedesktop.portal.Documents":
+                return GLib.Variant("(ay)", (b"/run/user/1000/doc\0",))
+            return None
+
+        def call_with_unix_fd_list_finish(self, result):
+            raise GLib.Error("portal unavailable")
+
+    class DBusProxy:
+        @staticmethod
+        def new_for_bus(bus_type, flags, info, name, object_path, interface,
+                        cancellable, callback):
+            created.append(interface)
+            callback(None, Proxy(interface))
+
+        @staticmethod
+        def new_for_bus_finish(result):
+            return result
+
+    created = []
+    calls = []
+    gio = path_module.Gio
+    monkeypatch.setattr(path_module, "_dbus_proxies", {})
+    monkeypatch.setattr(path_module, "gobject_log", lambda obj, info=None: obj)
+    monkeypatch.setattr(gio, "DBusProxy", DBusProxy)
+    monkeypatch.setattr(gio.File, "new_for_path",
+                        lambda path: type("File", (), {
+                            "get_uri": lambda self: "file://" + path})())
+    (tmp_path / "video.mp4").write_bytes(b"")
+    for _ in range(2):
+        path_module.open_in_file_manager(str(tmp_path), ["video.mp4"])
+    assert created == ["org.freedesktop.portal.Documents",
+                       "org.freedesktop.portal.OpenURI",
+                       "org.freedesktop.FileManager1"]
+    assert [call[:2] for call in calls] == 2 * [
+        ("org.freedesktop.portal.Documents", "GetMountPoint"),
+        ("org.freedesktop.portal.OpenURI", "OpenDirectory"),
+        ("org.freedesktop.FileManager1", "ShowItems")]
+    assert calls[2][2].unpack() == (
+        ["file://" + str(tmp_path / "video.mp4")], "")
+    assert all(call[3] == path_module.DBUS_TIMEOUT for call in calls)
+
+
 def test_encode_filesystem_path():
     path = "tést_vídéo.mp4"
     encoded = encode_filesystem_path(path)
@@ -28,3 +164,301 @@ def test_logger_masking_token():
     # Token abc-123-def -> Token: ***
     assert "abc-123-def" not in masked
     assert "Token: ***" in masked
+
+
+def test_async_file_sink_writes_all_lines(tmp_path):
+    log_file = tmp_path / "session.log"
+    sink = AsyncFileSink(str(log_file))
+    for i in range(1000):
+        sink.write(f"line {i}\n")
+    sink.close()
+    lines = log_file.read_text().splitlines()
+    assert lines == [f"line {i}" for i in range(1000)]
+    # Writes after close are ignored
+    sink.write("late\n")
+    assert "late" not in log_file.read_text()
+
+
+def test_async_file_sink_rotates_by_size(tmp_path):
+    log_file = tmp_path / "session.log"
+    for _ in range(4):
+        sink = AsyncFileSink(str(log_file), max_bytes=100, backup_count=2)
+        sink.write("x" * 150 + "\n")
+        sink.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "session.log", "session.log.1", "session.log.2"]
+    assert log_file.stat().st_size == 0
+
+
+def test_async_file_sink_keeps_writing_after_failed_rotation(
+        tmp_path, monkeypatch):
+    def replace(src, dst):
+        raise OSError("busy")
+    monkeypatch.setattr(os, "replace", replace)
+    log_file = tmp_path / "session.log"
+    sink = AsyncFileSink(str(log_file), max_bytes=10, backup_count=1)
+    for i in range(3):
+        sink.write(f"line {i}\n")
+        # One batch per line, every write is followed by a failed rotation
+        while (not log_file.exists() or
+               len(log_file.read_text().splitlines()) <= i):
+            time.sleep(0.01)
+    sink.close()
+    assert log_file.read_text().splitlines() == [
+        "line 0", "line 1", "line 2"]
+
+
+def test_async_file_sink_reports_dropped_lines(tmp_path):
+    log_file = tmp_path / "session.log"
+    sink = AsyncFileSink(str(log_file), queue_size=1)
+    for _ in range(1000):
+        sink.write("x\n")
+    sink.close()
+    content = log_file.read_text()
+    assert "log messages dropped" in content
+    dropped = int(content.rsplit(": ", 1)[1].split()[0])
+    assert content.count("x\n") + dropped == 1000
+
+
+def test_secret_masker_masks_secrets_in_one_pass():
+    masker = SecretMasker(["hunter22", "hunter2222", "abc", None],
+                          keywords=False)
+    masked = masker.mask("user hunter2222 pass hunter22 id abc password=x")
+    # Longest secret wins, short values are ignored, keywords are disabled
+    assert masked == "user *** pass *** id abc password=x"
+
+
+def test_secret_masker_refreshes_secrets():
+    masker = SecretMasker(keywords=False)
+    assert masker.mask("old-secret new-secret") == "old-secret new-secret"
+    masker.set_secrets(["old-secret"])
+    assert masker.mask("old-secret new-secret") == "*** new-secret"
+    masker.set_secrets(["new-secret"])
+    assert masker.mask("old-secret new-secret") == "old-secret ***"
+
+
+def test_secret_masker_combines_secrets_and_keywords():
+    masker = SecretMasker(["alice@example.com"])
+    masked = masker.mask("Sign in as alice@example.com, Token=abc")
+    assert masked == "Sign in as ***, Token: ***"
+
+
+def test_startup_profiler_records_phases_and_modules(tmp_path, monkeypatch):
+    output = tmp_path / "startup.json"
+    monkeypatch.setenv("VIDEO_DOWNLOADER_PROFILE_STARTUP", str(output))
+    profiler = StartupProfiler.from_environment()
+    import colorsys  # noqa: F401  # not imported by anything else
+    profiler.mark("imports")
+    profiler.finish("present")
+    profiler.mark("ignored")
+    report = json.loads(output.read_text())
+    assert [p["phase"] for p in report["phases"]] == ["imports", "present"]
+    assert "colorsys" in report["phases"][0]["modules"]
+    assert report["total"] == pytest.approx(
+        sum(p["duration"] for p in report["phases"]))
+
+
+def test_startup_profiler_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("VIDEO_DOWNLOADER_PROFILE_STARTUP", raising=False)
+    profiler = StartupProfiler.from_environment()
+    profiler.mark("imports")
+    profiler.finish("present")
+    assert not profiler.enabled
+    assert profiler.phases == []
+
+
+def test_metrics_registry_renders_openmetrics():
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs", "Jobs.", labels=["result"])
+    counter.inc(result='say "hi"\n')
+    counter.inc(2, result="ok")
+    histogram = registry.histogram(
+        "duration_seconds", "Durations.", unit="seconds", buckets=[1, 10])
+    histogram.observe(0.5)
+    histogram.observe(5)
+    registry.gauge("active", "Active.", callback=lambda: {(): 3})
+    assert registry.render().splitlines() == [
+        "# TYPE jobs counter",
+        "# HELP jobs Jobs.",
+        'jobs_total{result="ok"} 2',
+        'jobs_total{result="say \\"hi\\"\\n"} 1',
+        "# TYPE duration_seconds histogram",
+        "# UNIT duration_seconds seconds",
+        "# HELP duration_seconds Durations.",
+        'duration_seconds_bucket{le="1.0"} 1',
+        'duration_seconds_bucket{le="10.0"} 2',
+        'duration_seconds_bucket{le="+Inf"} 2',
+        "duration_seconds_count 2",
+        "duration_seconds_sum 5.5",
+        "# TYPE active gauge",
+        "# HELP active Active.",
+        "active 3",
+        "# EOF",
+    ]
+    with pytest.raises(ValueError):
+        counter.inc(-1, result="ok")
+
+
+def test_classify_error():
+    assert classify_error("ERROR: HTTP Error 403: Forbidden") == "http_403"
+    assert classify_error("ERROR: Unsupported URL: x") == "unsupported_url"
+    assert classify_error(
+        "ERROR: Failed to create download folder") == "filesystem"
+    assert classify_error("something odd") == "other"
+
+
+def test_traceparent_round_trip():
+    value = format_traceparent("a" * 32, "b" * 16)
+    assert value == "00-%s-%s-01" % ("a" * 32, "b" * 16)
+    assert parse_traceparent(value) == ("a" * 32, "b" * 16)
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+
+def test_tracer_writes_chrome_trace(tmp_path):
+    path = str(tmp_path / "trace.json")
+    gui = Tracer("gui", TraceFile(path))
+    job = gui.start_span("job", trace_id="a" * 32)
+    worker = Tracer("worker", TraceFile(path),
+                    parse_traceparent(job.traceparent))
+    phase = worker.start_span("download", category="phase")
+    worker.record("ffmpeg", 0, 10, category="subprocess", pid=1234)
+    phase.end(bytes=42)
+    job.end()
+    with open(path) as f:
+        # The closing bracket is left out, like by interrupted processes
+        events = json.loads(f.read().rstrip().rstrip(",") + "]")
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    assert [e["args"]["name"] for e in events if e["ph"] == "M"] == [
+        "gui", "worker"]
+    assert {e["args"]["trace_id"] for e in spans.values()} == {"a" * 32}
+    assert spans["download"]["args"]["parent_id"] == job.span_id
+    assert spans["download"]["args"]["bytes"] == 42
+    assert spans["ffmpeg"]["args"]["parent_id"] == phase.span_id
+    assert spans["ffmpeg"]["pid"] == 1234
+
+
+def test_thumbnail_loader_drops_stale_decodes(tmp_path, monkeypatch):
+    pending = []
+
+    class Executor:
+        def submit(self, func, *args):
+            pending.append((func, args))
+
+    class Texture:
+        def __init__(self, path):
+            self.path = path
+
+    monkeypatch.setattr(thumbnail_module, "_get_decode_executor", Executor)
+    monkeypatch.setattr(thumbnail_module.Gdk.Texture, "new_for_pixbuf",
+                        Texture)
+    monkeypatch.setattr(thumbnail_module.GLib, "idle_add",
+                        lambda func, *args: func(*args))
+    paths = []
+    for name in ["first.jpg", "second.jpg", "third.jpg"]:
+        (tmp_path / name).write_bytes(b"")
+        paths.append(str(tmp_path / name))
+    decoded = []
+    monkeypatch.setattr(thumbnail_module.GdkPixbuf.Pixbuf,
+                        "new_from_file_at_size",
+                        lambda path, w, h: decoded.append(path) or path)
+    loader = ThumbnailLoader(20, 10)
+    shown = []
+    loader.load(paths[0], shown.append)
+    loader.load(paths[1], shown.append)
+    # Decoded out of order, the older result must not replace the newer one
+    pending[1][0](*pending[1][1])
+    pending[0][0](*pending[0][1])
+    assert [texture.path for texture in shown] == [paths[1]]
+    # Requests that are already stale in the queue aren't decoded at all
+    assert decoded == [paths[1]]
+    loader.load(paths[2], shown.append)
+    loader.close()
+    pending[2][0](*pending[2][1])
+    assert len(shown) == 1
+
+
+def test_thumbnail_loader_deletes_owned_files(tmp_path, monkeypatch):
+    pending = []
+
+    class Executor:
+        def submit(self, func, *args):
+            pending.append((func, args))
+
+    monkeypatch.setattr(thumbnail_module, "_get_decode_executor", Executor)
+    monkeypatch.setattr(thumbnail_module.GdkPixbuf.Pixbuf,
+                        "new_from_file_at_size", lambda path, w, h: path)
+    monkeypatch.setattr(thumbnail_module.Gdk.Texture, "new_for_pixbuf",
+                        lambda pixbuf: None)
+    monkeypatch.setattr(thumbnail_module.GLib, "idle_add",
+                        lambda func, *args: func(*args))
+    paths = [tmp_path / name for name in ["first.jpg", "second.jpg"]]
+    for path in paths:
+        path.write_bytes(b"")
+    loader = ThumbnailLoader(20, 10)
+    shown = []
+    for path in paths:
+        loader.load(str(path), shown.append, delete=True)
+    # Files exist until they are decoded, or skipped as stale
+    assert all(path.exists() for path in paths)
+    for func, args in pending:
+        func(*args)
+    assert shown == [None]
+    assert not any(path.exists() for path in paths)
+
+
+def _random_stream(rng):
+    # Few distinct bytes, so that line endings and long lines are common
+    return bytes(rng.choice(b"ab\r\n") if rng.random() < 0.3 else ord("x")
+                 for _ in range(rng.randrange(200)))
+
+
+def _read_in_chunks(reader, stream, rng):
+    lines = []
+    pos = 0
+    while pos < len(stream):
+        size = rng.choice([1, 2, 3, rng.randrange(1, 50)])
+        lines.extend(reader.feed(stream[pos:pos + size]))
+        pos += size
+    return lines + reader.flush()
+
+
+def test_line_reader_matches_split_of_whole_stream():
+    rng = random.Random(0)
+    for _ in range(2000):
+        stream = _random_stream(rng)
+        *expected, last = re.split(rb"\r\n|\r|\n", stream)
+        if last:
+            expected.append(last)
+        assert _read_in_chunks(LineReader(), stream, rng) == expected, stream
+
+
+def test_line_reader_limits_line_size():
+    rng = random.Random(1)
+    for _ in range(2000):
+        stream = _random_stream(rng)
+        max_size = rng.randrange(8)
+        *lines, last = re.split(rb"\r\n|\r|\n", stream)
+        if last:
+            lines.append(last)
+        truncating = LineReader(max_size, truncate=True)
+        assert _read_in_chunks(truncating, stream, rng) == [
+            line[:max_size] for line in lines]
+        dropping = LineReader(max_size)
+        assert _read_in_chunks(dropping, stream, rng) == [
+            line for line in lines if len(line) <= max_size]
+        assert dropping.dropped_lines == sum(
+            len(line) > max_size for line in lines)
+
+
+def test_line_reader_buffers_only_unterminated_line():
+    reader = LineReader(max_line_size=10, truncate=True)
+    assert reader.feed(b"done\rpart") == [b"done"]
+    assert reader.pending == b"part"
+    # A huge line without line ending doesn't grow the buffer
+    for _ in range(1000):
+        assert reader.feed(b"y" * 1000) == []
+    assert reader.pending == b"partyyyyyy"
+    assert reader.feed(b"\r\nnext\r") == [b"partyyyyyy", b"next"]
+    assert reader.feed(b"\n") == []
+    assert reader.flush() == []